@@ -10,8 +10,7 @@
 
 import time
 import copy
-from threading import Thread
-from xarm.wrapper import XArmAPI
+from xarm.wrapper import XArmAPI, ArmGroup
 # We need reconstruct the Config.
 # The core points: Must ensure at the beginning
 # 1. zero point: zp
@@ -111,8 +110,13 @@ class Config:
 
     # Sleep Time
     photo_time = '1'
-    long_interval = '29'
-    short_interval = '3'
+
+    # Follow: the following arm starts after the leading arm has finished this number of actions of the stage,
+    # None means after the whole stage. Synchronized on motion completion, not on time.
+    short_follow = 1
+    # Stage 6 (xarm_f to basket 3): xarm_b starts when xarm_f is back at the high point,
+    # this replaces the old fixed 29s offset which was about the duration of that stage
+    long_follow = None
 
     # 5 stages of xarm planning
     stage0 = [zero_point, high_point]
@@ -217,6 +221,25 @@ class ProjectXarm(XArmAPI):
 
         return Config.quit
 
+    def run_action(self, action):
+        """
+        Run one action of a stage, used as the ArmGroup action.
+
+        Args:
+            action: int(gripper on/off), str(sleep seconds) or list(position)
+
+        Returns:
+            code: 0 means success
+        """
+        if isinstance(action, int):
+            quit = self.grip_object() if action else self.release_object()
+        elif isinstance(action, str):
+            time.sleep(int(action))
+            quit = Config.quit
+        else:
+            quit = self._set_point(action)
+        return -1 if quit else 0
+
     def action_handler(self, action_list):
         """
         Handle actions from action_list.
@@ -280,42 +303,45 @@ class BiXarm(object):
 
     xarm_b = ProjectXarm(Config.IP_b)
     xarm_f = ProjectXarm(Config.IP_f)
+    group = ArmGroup({'f': xarm_f, 'b': xarm_b})
 
-    def multi_threads(self, f_stage: list, b_stage: list, reverse=False, interval='0'):
-        def start_thread(stage, arm):
-            if stage:
-                thread = Thread(target=arm.action_handler, args=([stage, ]))
-                return thread
-            return None
-
-        t1 = start_thread(f_stage, self.xarm_f)
-        t2 = start_thread(b_stage, self.xarm_b)
-
-        if t1 and t2:
-            if reverse:
-                t2.start()
-                time.sleep(int(interval))
-                t1.start()
-            else:
-                t1.start()
-                time.sleep(int(interval))
-                t2.start()
-            # End
-            t1.join()
-            t2.join()
-
-        elif t1:
-            t1.start()
-            t1.join()
-        elif t2:
-            t2.start()
-            t2.join()
+    def multi_threads(self, f_stage: list, b_stage: list, reverse=False, follow=0):
+        """
+        Run f_stage on xarm_f and b_stage on xarm_b on the persistent workers of the ArmGroup and wait for both.
+
+        Args:
+            reverse: xarm_b leads and xarm_f follows if True
+            follow: the following arm starts after the leading arm has finished this number of actions,
+                0 means start together, None means after the whole stage of the leading arm
+
+        Returns:
+            Config.quit, the stage is skipped if Config.quit is already True
+        """
+        if Config.quit:
+            return Config.quit
+        leader, follower = ('b', 'f') if reverse else ('f', 'b')
+        stages = {'f': f_stage, 'b': b_stage}
+        tasks = [self.group.submit(leader, ProjectXarm.run_action, action) for action in stages[leader]]
+        after = None
+        if tasks and follow != 0:
+            after = tasks[-1] if follow is None or follow >= len(tasks) else tasks[follow - 1]
+        for i, action in enumerate(stages[follower]):
+            self.group.submit(follower, ProjectXarm.run_action, action, after=after if i == 0 else None)
+        if self.group.join() != 0:
+            Config.quit = True
+            print(f'ArmGroup aborted, error={self.group.error}, the following stages are skipped.')
+            # The queued actions are cancelled, clear the group error so the group is usable after the arms recover
+            self.group.reset()
+        return Config.quit
 
     def quick_start(self):
         print(f'xarm_f and xarm_b are quick starting. Execute stage0. From zero point to high point.')
         self.multi_threads(f_stage=Config.stage0, b_stage=Config.stage0)
 
     def quick_back(self):
+        if Config.quit:
+            print(f'xarm_f and xarm_b are not backing because of the failure, check the arms before moving them.')
+            return
         print(f'xarm_f and xarm_b are quick backing. Execute stage4. From high point to zero point.')
         self.multi_threads(f_stage=Config.stage4, b_stage=Config.stage4)
         self.xarm_b.reset()
@@ -323,7 +349,7 @@ class BiXarm(object):
 
     def baskets_planning(self, times):
         """
-        Using timestamps to realize synchronization of two arms.
+        Using timestamps to realize synchronization of two arms, the timestamps are ArmGroup barriers.
         - init = stage0
         - ex = stage1/stage1_r
         - bx(x = 1,2,3) = basket1, basket2, basket3
@@ -353,6 +379,8 @@ class BiXarm(object):
         self.multi_threads(f_stage=stage1, b_stage=[])
 
         for i in range(int(times)):
+            if Config.quit:
+                break
             # 2
             print(f'Execute %s timestamp 2.' % task)
             stage2, stage3 = get_stage_2_3(xarm='f', basket=0)
@@ -362,7 +390,7 @@ class BiXarm(object):
             print(f'Execute %s timestamp 3.' % task)
             stage1 = get_stage_1(rotation=1)
             stage2, stage3 = get_stage_2_3(xarm='b', basket=0)
-            self.multi_threads(f_stage=stage1, b_stage=stage2+stage3, reverse=True, interval=Config.short_interval)
+            self.multi_threads(f_stage=stage1, b_stage=stage2+stage3, reverse=True, follow=Config.short_follow)
 
             # 4
             print(f'Execute %s timestamp 4.' % task)
@@ -377,7 +405,7 @@ class BiXarm(object):
             # 6
             print(f'Execute %s timestamp 6.' % task)
             stage2, stage3 = get_stage_2_3(xarm='f', basket=2)
-            self.multi_threads(f_stage=stage2+stage3, b_stage=stage1, interval=Config.long_interval)
+            self.multi_threads(f_stage=stage2+stage3, b_stage=stage1, follow=Config.long_follow)
 
             # 7
             print(f'Execute %s timestamp 7.' % task)
@@ -424,6 +452,8 @@ class BiXarm(object):
         self.multi_threads(f_stage=stage1, b_stage=[])
 
         for i in range(int(times)):
+            if Config.quit:
+                break
             # 2
             print(f'Execute %s timestamp 2.' % task)
             stage2, stage3 = get_stage_2_3(xarm='f', basket=3)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Description: Control the arm with the asyncio interface (AsyncXArmAPI)
+"""
+
+import os
+import sys
+import asyncio
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
+
+from xarm.wrapper import AsyncXArmAPI
+
+
+#######################################################
+"""
+Just for test example
+"""
+if len(sys.argv) >= 2:
+    ip = sys.argv[1]
+else:
+    try:
+        from configparser import ConfigParser
+        parser = ConfigParser()
+        parser.read('../robot.conf')
+        ip = parser.get('xArm', 'ip')
+    except:
+        ip = input('Please input the xArm ip address:')
+        if not ip:
+            print('input error, exit')
+            sys.exit(1)
+########################################################
+
+
+async def main():
+    async with AsyncXArmAPI(ip) as arm:
+        await arm.clean_error()
+        await arm.motion_enable(True)
+        await arm.set_mode(0)
+        await arm.set_state(0)
+        await asyncio.sleep(0.5)
+
+        # the requests are sent concurrently and the responses are matched by the transaction id
+        (_, version), (_, state), (_, position) = await asyncio.gather(
+            arm.get_version(), arm.get_state(), arm.get_position())
+        print('version={}, state={}, position={}'.format(version, state, position))
+
+        code = await arm.set_position(300, 0, 300, 180, 0, 0, speed=100, wait=True)
+        print('set_position, code={}'.format(code))
+        code = await arm.move_gohome(wait=True)
+        print('move_gohome, code={}'.format(code))
+
+
+asyncio.run(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Description: Share the report data of one connection with other local processes
+    python3 3008-report_broker.py 192.168.1.185             # the broker, owns the connection
+    python3 3008-report_broker.py --sub xarm_report_xxx      # a subscriber, no connection to the arm
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
+
+from xarm.wrapper import XArmAPI, ReportSubscriber
+
+
+if len(sys.argv) >= 3 and sys.argv[1] == '--sub':
+    with ReportSubscriber(sys.argv[2]) as sub:
+        while True:
+            report = sub.wait(timeout=1)
+            if report is None:
+                print('no report, the broker may be stopped')
+                break
+            print('seq={}, state={}, angles={}'.format(report['seq'], report['state'], report['angles']))
+    sys.exit(0)
+
+
+#######################################################
+"""
+Just for test example
+"""
+if len(sys.argv) >= 2:
+    ip = sys.argv[1]
+else:
+    try:
+        from configparser import ConfigParser
+        parser = ConfigParser()
+        parser.read('../robot.conf')
+        ip = parser.get('xArm', 'ip')
+    except:
+        ip = input('Please input the xArm ip address:')
+        if not ip:
+            print('input error, exit')
+            sys.exit(1)
+########################################################
+
+
+arm = XArmAPI(ip)
+name = arm.start_report_broker()
+print('report broker started, run the subscribers with: --sub {}'.format(name))
+
+try:
+    while arm.connected:
+        time.sleep(1)
+except KeyboardInterrupt:
+    pass
+
+arm.disconnect()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Description: Record the report data to memory-mapped ring files and read the last second
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
+
+from xarm.wrapper import XArmAPI, ReportRecording
+
+
+#######################################################
+"""
+Just for test example
+"""
+if len(sys.argv) >= 2:
+    ip = sys.argv[1]
+else:
+    try:
+        from configparser import ConfigParser
+        parser = ConfigParser()
+        parser.read('../robot.conf')
+        ip = parser.get('xArm', 'ip')
+    except:
+        ip = input('Please input the xArm ip address:')
+        if not ip:
+            print('input error, exit')
+            sys.exit(1)
+########################################################
+
+
+path = os.path.join(os.path.expanduser('~'), 'xarm_record')
+arm = XArmAPI(ip, report_type='rich')
+arm.start_report_recorder(path, capacity=250 * 60)  # 1 minute at 250Hz
+
+try:
+    with ReportRecording(path) as rec:
+        for i in range(10):
+            time.sleep(1)
+            t = rec.last('time', 250)
+            if len(t) > 1:
+                print('frames={}, the last {} frames took {:.3f}s'.format(rec.count, len(t), t[-1] - t[0]))
+except KeyboardInterrupt:
+    pass
+
+arm.stop_report_recorder()
+arm.disconnect()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Description: Stream servo_j setpoints at a fixed rate
+"""
+
+import os
+import sys
+import math
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
+
+from xarm.wrapper import XArmAPI
+
+
+#######################################################
+"""
+Just for test example
+"""
+if len(sys.argv) >= 2:
+    ip = sys.argv[1]
+else:
+    try:
+        from configparser import ConfigParser
+        parser = ConfigParser()
+        parser.read('../robot.conf')
+        ip = parser.get('xArm', 'ip')
+    except:
+        ip = input('Please input the xArm ip address:')
+        if not ip:
+            print('input error, exit')
+            sys.exit(1)
+########################################################
+
+
+arm = XArmAPI(ip)
+arm.motion_enable(enable=True)
+arm.set_mode(0)
+arm.set_state(state=0)
+
+arm.reset(wait=True)
+
+arm.set_mode(1)
+arm.set_state(0)
+time.sleep(0.1)
+
+rate = 200
+
+
+def gen_setpoints(duration=10):
+    # swing joint1 +-20° around the home position
+    for i in range(int(duration * rate)):
+        yield [20 * math.sin(2 * math.pi * 0.2 * i / rate), 0, 0, 0, 0, 0, 0]
+
+
+stream = arm.servo_stream(rate=rate)
+code = stream.run(gen_setpoints())
+print('servo_stream, code={}, stats={}'.format(code, stream.stats))
+
+arm.disconnect()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Benchmark: the time to import the sdk in a fresh interpreter (what every short-lived process pays)
+
+Usage:
+    python bench_import_time.py [repeat]
+    python -X importtime -c "from xarm.wrapper import XArmAPI"  # the cost of each module
+"""
+
+import os
+import sys
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
+
+STATEMENTS = [
+    ('baseline (python only)', 'pass'),
+    ('import xarm', 'import xarm'),
+    ('from xarm.wrapper import AsyncXArmAPI', 'from xarm.wrapper import AsyncXArmAPI'),
+    ('from xarm.wrapper import XArmAPI', 'from xarm.wrapper import XArmAPI'),
+    ('import blockly tool', 'from xarm.tools.blockly import BlocklyTool'),
+]
+
+# 在子进程中计时, 只统计import语句本身
+_CODE = 'import time; t = time.perf_counter(); {}; print(time.perf_counter() - t)'
+
+
+def measure(statement, repeat=10):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    times = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', _CODE.format(statement)], env=env, cwd=ROOT)
+        times.append(float(out.decode('utf-8').strip().splitlines()[-1]))
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+def loaded_modules(statement):
+    code = '{}; import sys; print(len(sys.modules)); print(int(\'asyncio\' in sys.modules), int(\'xarm.tools.blockly\' in sys.modules))'
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    out = subprocess.check_output([sys.executable, '-c', code.format(statement)], env=env, cwd=ROOT)
+    lines = out.decode('utf-8').strip().splitlines()
+    return int(lines[-2]), lines[-1].split()
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print('python {}, repeat={}'.format(sys.version.split()[0], repeat))
+    print('{:<40} {:>10} {:>10} {:>8} {:>8} {:>8}'.format('statement', 'min(ms)', 'median(ms)', 'modules', 'asyncio', 'blockly'))
+    for name, statement in STATEMENTS:
+        best, median = measure(statement, repeat=repeat)
+        count, (has_asyncio, has_blockly) = loaded_modules(statement)
+        print('{:<40} {:>10.1f} {:>10.1f} {:>8} {:>8} {:>8}'.format(name, best * 1000, median * 1000, count, has_asyncio, has_blockly))
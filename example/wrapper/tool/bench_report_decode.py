@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Benchmark: decode the report data with per-field convert calls (before) and the precompiled layout (after)
+"""
+
+import os
+import sys
+import time
+import random
+import struct
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
+
+from xarm.core.utils import convert
+from xarm.core.utils.report_layout import get_report_layout
+
+
+def gen_rich_report(length=495):
+    data = bytearray(random.getrandbits(8) for _ in range(length))
+    data[0:4] = struct.pack('>I', length)
+    for i in range(7, 133 if length < 145 else 145, 4):
+        if i + 4 <= 87 or 91 <= i < 131 or 133 <= i:
+            data[i:i + 4] = struct.pack('<f', random.uniform(-3, 3))
+    return bytes(data)
+
+
+def decode_by_convert(rx_data):
+    # the way _handle_report_data decoded every field before
+    ret = [
+        rx_data[4] & 0x0F, rx_data[4] >> 4,
+        convert.bytes_to_u16(rx_data[5:7]),
+        convert.bytes_to_fp32s(rx_data[7:7 * 4 + 7], 7),
+        convert.bytes_to_fp32s(rx_data[35:6 * 4 + 35], 6),
+        convert.bytes_to_fp32s(rx_data[59:7 * 4 + 59], 7),
+        list(rx_data[87:91]),
+        convert.bytes_to_fp32s(rx_data[91:6 * 4 + 91], 6),
+        convert.bytes_to_fp32s(rx_data[115:4 * 4 + 115], 4),
+        list(rx_data[131:133]),
+        convert.bytes_to_fp32s(rx_data[133:3 * 4 + 133], 3),
+        list(rx_data[145:151]),
+        convert.bytes_to_fp32s(rx_data[181:201], 5),
+        convert.bytes_to_fp32s(rx_data[201:221], 5),
+        convert.bytes_to_fp32s(rx_data[221:229], 2),
+        [val for val in rx_data[229:245]],
+        list(struct.unpack('>7b', struct.pack('>7B', *rx_data[245:252]))),
+        convert.bytes_to_fp32s(rx_data[252:8 * 4 + 252], 8),
+        convert.bytes_to_u32(rx_data[284:288]),
+        convert.bytes_to_fp32s(rx_data[288:6 * 4 + 288], 6),
+        list(rx_data[312:317]),
+        convert.bytes_to_fp32s(rx_data[317:341], 6),
+        convert.bytes_to_u16s(rx_data[341:355], 7),
+        convert.bytes_to_fp32s(rx_data[355:383], 7),
+        list(rx_data[383:385]) + convert.bytes_to_u16s(rx_data[385:401], 8),
+        list(map(int, rx_data[401:433])),
+        convert.bytes_to_fp32s(rx_data[433:457], 6),
+        convert.bytes_to_fp32s(rx_data[457:481], 6),
+        rx_data[481],
+        convert.bytes_to_fp32s(rx_data[482:494], 3),
+        rx_data[494],
+    ]
+    return ret
+
+
+def decode_by_layout(rx_data):
+    layout = get_report_layout('rich', len(rx_data))
+    values = layout.unpack(rx_data)
+    state_mode = values[layout.state_mode]
+    ret = [
+        state_mode & 0x0F, state_mode >> 4,
+        values[layout.cmd_num],
+        list(values[layout.angles]),
+        list(values[layout.pose]),
+        list(values[layout.torque]),
+        list(values[layout.mtbrake_mtable_err_warn]),
+        list(values[layout.pose_offset]),
+        list(values[layout.tcp_load]),
+        list(values[layout.collis_teach_sens]),
+        list(values[layout.gravity_direction]),
+        list(values[layout.arm_info]),
+        list(values[layout.trs_msg]),
+        list(values[layout.p2p_msg]),
+        list(values[layout.rot_msg]),
+        list(values[layout.servo_codes]),
+        list(values[layout.temperatures]),
+        list(values[layout.speeds]),
+        values[layout.count],
+        list(values[layout.world_offset]),
+        list(values[layout.gpio_reset_enable] + values[layout.simulation_collision]),
+        list(values[layout.collision_tool_params]),
+        list(values[layout.voltages]),
+        list(values[layout.currents]),
+        list(values[layout.cgpio_states] + values[layout.cgpio_values]),
+        list(values[layout.cgpio_configs] + values[layout.cgpio_configs_ext]),
+        list(values[layout.ft_ext_force]),
+        list(values[layout.ft_raw_force]),
+        values[layout.iden_progress],
+        list(values[layout.pose_aa]),
+        values[layout.flags],
+    ]
+    return ret
+
+
+def same(a, b):
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return a == b or (a != a and b != b)  # nan
+
+
+def bench(func, frames, duration=2.0):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        for frame in frames:
+            func(frame)
+        count += len(frames)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    frames = [gen_rich_report() for _ in range(100)]
+    for frame in frames:
+        assert same(decode_by_convert(frame), decode_by_layout(frame)), 'decode result mismatch'
+    before = bench(decode_by_convert, frames)
+    after = bench(decode_by_layout, frames)
+    print('rich report (495 bytes)')
+    print('  convert: {:>10.0f} frames/s'.format(before))
+    print('  layout:  {:>10.0f} frames/s'.format(after))
+    print('  speedup: {:>10.1f}x'.format(after / before))
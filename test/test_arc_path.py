@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import math
+import unittest
+from xarm.x3.arc_path import compact_arc_path, _segment_error
+
+
+def _max_deviation(paths, points):
+    # 原始路径上每个点到压缩后折线的最近距离的最大值
+    result = 0
+    for path in paths:
+        result = max(result, min(_segment_error(a, path, b)[0] for a, b in zip(points, points[1:])))
+    return result
+
+
+class TestCompactArcPath(unittest.TestCase):
+    def test_quarter_arc_within_tolerance(self):
+        radius, step = 100, 0.1
+        count = int(math.pi / 2 * radius / step) + 1
+        paths = [[radius * math.cos(i * step / radius), radius * math.sin(i * step / radius), 300, math.pi, 0, 0]
+                 for i in range(count)]
+        for tolerance in (0.01, 0.1):
+            points = compact_arc_path(paths, tolerance=tolerance)
+            self.assertLess(len(points), len(paths))
+            self.assertLessEqual(_max_deviation(paths, points), tolerance + 1e-9)
+
+    def test_dense_line(self):
+        paths = [[i * 0.02, 0, 0, 0, 0, 0] for i in range(5001)]
+        points = compact_arc_path(paths)
+        self.assertEqual(len(points), 2)
+        self.assertEqual(points[-1][:6], [float(v) for v in paths[-1]])
+
+    def test_keep_user_radius_and_orientation(self):
+        paths = [[i, 0, 0, 0, 0, 0] for i in range(10)]
+        paths[5] = paths[5] + [2]
+        paths[8][5] = 0.5
+        points = compact_arc_path(paths)
+        self.assertIn([5, 0, 0, 0, 0, 0, 2], points)
+        self.assertTrue(any(point[5] == 0.5 for point in points))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import threading
+import unittest
+from xarm.x3.feedback_registry import FeedbackRegistry
+
+
+class TestFeedbackRegistry(unittest.TestCase):
+    def _bind_with_waiter(self, registry):
+        entry = registry.acquire(1)
+        t = threading.Thread(target=registry.bind, args=(registry.gen_key(), 2), daemon=True)
+        t.start()
+        t.join(1)
+        self.assertFalse(t.is_alive())
+        registry.release(entry)
+
+    def test_no_ttl(self):
+        registry = FeedbackRegistry(ttl=0)
+        self.assertIsNone(registry.ttl)
+        self._bind_with_waiter(registry)
+        self.assertEqual(registry.get_stats()['entries'], 1)
+
+    def test_tiny_ttl(self):
+        self._bind_with_waiter(FeedbackRegistry(ttl=1e-300))
+
+    def test_maxsize(self):
+        registry = FeedbackRegistry(maxsize=4, ttl=None)
+        for trans_id in range(10):
+            registry.bind(registry.gen_key(), trans_id + 1)
+        stats = registry.get_stats()
+        self.assertEqual(stats['entries'], 4)
+        self.assertEqual(stats['keys'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
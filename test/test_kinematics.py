@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import math
+import random
+import unittest
+from xarm.x3.code import APIState
+from xarm.x3.kinematics import KinematicsModel, numpy
+
+DH_PARAMS = [
+    0, 267, -math.pi / 2, 0,
+    0, 0, 0, 289.5,
+    0, 0, -math.pi / 2, 77.5,
+    0, 342.5, math.pi / 2, 0,
+    0, 0, math.pi / 2, 76,
+    0, 97, 0, 0,
+]
+TCP_OFFSET = [0, 0, 50, 0, 0, math.pi / 2]
+WORLD_OFFSET = [100, -50, 0, 0, 0, math.pi / 4]
+
+
+class _FakeArm(object):
+    axis = 6
+    device_type = 0
+
+    def __init__(self, ik_offset=0.0):
+        self._position_offset = TCP_OFFSET
+        self._world_offset = WORLD_OFFSET
+        self._model = KinematicsModel(DH_PARAMS, tcp_offset=TCP_OFFSET, world_offset=WORLD_OFFSET)
+        self._ik = {}
+        self._ik_offset = ik_offset
+
+    def get_dh_params(self):
+        return 0, DH_PARAMS + [0] * 4
+
+    def get_forward_kinematics_batch(self, angles_list, **kwargs):
+        results = []
+        for angles in angles_list:
+            pose = self._model.fk(angles)
+            self._ik[tuple(pose)] = list(angles)
+            results.append([0, pose])
+        return 0, results
+
+    def get_inverse_kinematics_batch(self, poses, **kwargs):
+        results = []
+        for pose in poses:
+            angles = self._ik[tuple(pose)]
+            results.append([0, [angles[0] + self._ik_offset] + angles[1:]])
+        return 0, results
+
+
+class TestKinematicsModel(unittest.TestCase):
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_fk_batch(self):
+        model = KinematicsModel(DH_PARAMS, tcp_offset=TCP_OFFSET, world_offset=WORLD_OFFSET)
+        rand = random.Random(0)
+        angles_list = [[rand.uniform(-math.pi, math.pi) for _ in range(6)] for _ in range(32)]
+        # 奇异位姿(pitch为±90°)
+        angles_list.append([0, 0, 0, 0, 0, 0])
+        angles_list.append([0, math.pi / 2, 0, 0, -math.pi / 2, 0])
+        for pose, angles in zip(model.fk_batch(angles_list), angles_list):
+            expected = model.fk(angles)
+            for i in range(3):
+                self.assertAlmostEqual(pose[i], expected[i], places=6)
+            for i in range(3, 6):
+                diff = math.atan2(math.sin(pose[i] - expected[i]), math.cos(pose[i] - expected[i]))
+                self.assertAlmostEqual(diff, 0, places=6)
+
+    def test_from_arm(self):
+        code, model = KinematicsModel.from_arm(_FakeArm())
+        self.assertEqual(code, 0)
+        self.assertEqual(model.axis, 6)
+        self.assertFalse(model.modified)
+        self.assertEqual(model.scale, 1.0)
+
+    def test_from_arm_ik_mismatch(self):
+        code, _ = KinematicsModel.from_arm(_FakeArm(ik_offset=0.1))
+        self.assertEqual(code, APIState.KINEMATICS_MISMATCH)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import threading
+import unittest
+from xarm.core.wrapper.tool_bus import ToolBusScheduler
+
+HOST_ID = 9
+READ = [0x01, 0x03, 0x00, 0x10, 0x00, 0x01]
+WRITE = [0x01, 0x06, 0x00, 0x10, 0x00, 0x01]
+
+
+class _Slave(object):
+    def __init__(self):
+        self.value = 0
+
+    def read(self, delay=0.0):
+        def func(cmd):
+            value = self.value
+            time.sleep(delay)
+            return [0, 0, value]
+        return func
+
+    def write(self, value):
+        def func(cmd):
+            self.value = value
+            return [0, 0]
+        return func
+
+
+class TestToolBusScheduler(unittest.TestCase):
+    def test_coalesce_reads(self):
+        scheduler = ToolBusScheduler(coalesce_window=1)
+        slave = _Slave()
+        self.assertEqual(scheduler.request(None, READ, HOST_ID, False, slave.read()), [0, 0, 0])
+        slave.value = 1
+        self.assertEqual(scheduler.request(None, READ, HOST_ID, False, slave.read()), [0, 0, 0])
+        self.assertEqual(scheduler.get_stats()['coalesced'], 1)
+
+    def test_read_after_write_is_not_stale(self):
+        scheduler = ToolBusScheduler(coalesce_window=1)
+        slave = _Slave()
+        results = {}
+
+        def _read():
+            results['before'] = scheduler.request(None, READ, HOST_ID, False, slave.read(0.1))
+
+        t = threading.Thread(target=_read)
+        t.start()
+        time.sleep(0.02)
+        # 写请求在读请求执行过程中发起, 读完成之后才获得总线
+        self.assertEqual(scheduler.request(None, WRITE, HOST_ID, False, slave.write(1)), [0, 0])
+        t.join()
+        self.assertEqual(results['before'], [0, 0, 0])
+        self.assertEqual(scheduler.request(None, READ, HOST_ID, False, slave.read()), [0, 0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
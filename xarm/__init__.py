@@ -1,2 +1,23 @@
-from .wrapper import XArmAPI
+import sys
 from .version import __version__
+
+# PEP 562: 只在第一次访问时导入, import xarm/xarm.version不再加载整个SDK
+_LAZY_ATTRS = {
+    'XArmAPI': '.wrapper',
+    'AsyncXArmAPI': '.wrapper',
+    'ArmGroup': '.wrapper',
+}
+
+if sys.version_info < (3, 7):
+    from .wrapper import XArmAPI, AsyncXArmAPI, ArmGroup
+else:
+    def __getattr__(name):
+        if name not in _LAZY_ATTRS:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+        import importlib
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY_ATTRS))
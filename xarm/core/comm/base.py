@@ -9,16 +9,18 @@
 import time
 import queue
 import socket
+import struct
 import select
 import threading
 from ..utils.log import logger
-from ..utils import convert
 
 
 class RxParse(object):
     def __init__(self, rx_que, fb_que=None):
         self.rx_que = rx_que
         self.fb_que = fb_que
+        # 设置后, 非反馈帧直接交给handler处理(流水线模式按事务ID分发), 不再进入rx_que
+        self.handler = None
 
     def flush(self, fromid=-1, toid=-1):
         pass
@@ -28,10 +30,87 @@ class RxParse(object):
             if not self.fb_que:
                 return
             self.fb_que.put(data)
+        elif not is_report and self.handler is not None:
+            self.handler(data)
         else:
             self.rx_que.put(data)
 
 
+class RxBuffer(object):
+    """
+    接收缓冲区: 预分配的bytearray, 通过recv_into直接写入, 按帧取出
+    只在缓冲区写满时把未取出的(不完整帧)数据搬到开头, 避免每帧都拷贝整个缓冲区
+    """
+    _U16 = struct.Struct('>H')
+    _U32 = struct.Struct('>I')
+
+    def __init__(self, size=65536):
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        self._start = 0
+        self._end = 0
+
+    def _reserve(self, size):
+        # make sure there are at least `size` bytes free at the end
+        if len(self._buf) - self._end >= size:
+            return
+        length = self._end - self._start
+        if length + size > len(self._buf):
+            # a frame larger than the buffer, grow it
+            new_size = len(self._buf)
+            while length + size > new_size:
+                new_size *= 2
+            buf = bytearray(new_size)
+            buf[:length] = self._view[self._start:self._end]
+            self._view.release()
+            self._buf = buf
+            self._view = memoryview(self._buf)
+        elif length:
+            self._buf[:length] = bytes(self._view[self._start:self._end])
+        self._start = 0
+        self._end = length
+
+    def recv_into(self, recv_into, size=1):
+        """
+        :param recv_into: socket.recv_into
+        :param size: minimum free space required, the read may return more if available
+        :return: the number of bytes read
+        """
+        self._reserve(size)
+        num = recv_into(self._view[self._end:])
+        self._end += num
+        return num
+
+    def extend(self, data):
+        self._reserve(len(data))
+        self._buf[self._end:self._end + len(data)] = data
+        self._end += len(data)
+
+    def u16(self, offset=0):
+        return self._U16.unpack_from(self._buf, self._start + offset)[0]
+
+    def u32(self, offset=0):
+        return self._U32.unpack_from(self._buf, self._start + offset)[0]
+
+    def skip(self, size):
+        self._start += size
+        if self._start >= self._end:
+            self._start = self._end = 0
+
+    def pop(self, size):
+        # 拷贝一次, 返回的bytes由调用者持有, 缓冲区可以继续复用
+        data = bytes(self._view[self._start:self._start + size])
+        self.skip(size)
+        return data
+
+
 class Port(threading.Thread):
     def __init__(self, rxque_max, fb_que=None):
         super(Port, self).__init__()
@@ -43,11 +122,13 @@ class Port(threading.Thread):
         self.com = None
         self.rx_parse = RxParse(self.rx_que, self.fb_que)
         self.com_read = None
+        self.com_recv_into = None
         self.com_write = None
         self.port_type = ''
         self.buffer_size = 1
         self.heartbeat_thread = None
         self.alive = True
+        self.rx_dropped = 0  # 上报端口来不及处理而丢弃的帧数
 
     @property
     def connected(self):
@@ -72,6 +153,9 @@ class Port(threading.Thread):
         except:
             pass
 
+    def set_rx_handler(self, handler=None):
+        self.rx_parse.handler = handler
+
     def flush(self, fromid=-1, toid=-1):
         if not self.connected:
             return -1
@@ -141,26 +225,18 @@ class Port(threading.Thread):
         failed_read_count = 0
         timeout_count = 0
         size = 0
-        data_num = 0
-        buffer = b''
+        rx_buffer = RxBuffer(max(self.buffer_size, 1024) * 8)
         size_is_not_confirm = False
 
-        data_prev_us = 0
-        data_curr_us = 0
-        data_max_interval_us = 0
-        data_over_us = 205 * 1000  # over 205ms, cnts++
-        data_over_cnts = 0
-
-        recv_prev_us = 0
-        recv_curr_us = 0
-        recv_max_interval_us = 0
-        recv_over_us = 300 * 1000  # over 300ms, cnts++
-        recv_over_cnts = 0
-
         try:
             while self.connected and self.alive:
                 try:
-                    data = self.com_read(4 - data_num if size == 0 else (size - data_num))
+                    if self.com_recv_into:
+                        num = rx_buffer.recv_into(self.com_recv_into, 4 if size == 0 else size)
+                    else:
+                        data = self.com_read(4 - len(rx_buffer) if size == 0 else max(size - len(rx_buffer), 1))
+                        rx_buffer.extend(data)
+                        num = len(data)
                 except socket.timeout:
                     timeout_count += 1
                     if timeout_count > 3:
@@ -168,80 +244,45 @@ class Port(threading.Thread):
                         logger.error('[{}] socket read timeout'.format(self.port_type))
                         break
                     continue
-                else:
-                    if len(data) == 0:
-                        failed_read_count += 1
-                        if failed_read_count > 5:
-                            self._connected = False
-                            logger.error('[{}] socket read failed, len=0'.format(self.port_type))
-                            break
-                        time.sleep(0.1)
-                        continue
-                    data_num += len(data)
-                    buffer += data
+                if num == 0:
+                    failed_read_count += 1
+                    if failed_read_count > 5:
+                        self._connected = False
+                        logger.error('[{}] socket read failed, len=0'.format(self.port_type))
+                        break
+                    time.sleep(0.1)
+                    continue
+                timeout_count = 0
+                failed_read_count = 0
+                is_error = False
+                while True:
                     if size == 0:
-                        if data_num != 4:
-                            continue
-                        size = convert.bytes_to_u32(buffer[0:4])
+                        if len(rx_buffer) < 4:
+                            break
+                        size = rx_buffer.u32()
                         if size == 233:
                             size_is_not_confirm = True
                             size = 245
                         logger.info('report_data_size: {}, size_is_not_confirm={}'.format(size, size_is_not_confirm))
-                    else:
-                        if data_num < size:
+                    if len(rx_buffer) < size:
+                        break
+                    if size_is_not_confirm:
+                        size_is_not_confirm = False
+                        if rx_buffer.u32(233) == 233:
+                            size = 233
+                            rx_buffer.skip(233)
                             continue
-                        if size_is_not_confirm:
-                            size_is_not_confirm = True
-                            if convert.bytes_to_u32(buffer[233:237]) == 233:
-                                size = 233
-                                buffer = buffer[233:]
-                                continue
-
-                        if convert.bytes_to_u32(buffer[0:4]) != size:
-                            logger.error('report data error, close, length={}, size={}'.format(convert.bytes_to_u32(buffer[0:4]), size))
-                            break
+                    if rx_buffer.u32() != size:
+                        logger.error('report data error, close, length={}, size={}'.format(rx_buffer.u32(), size))
+                        is_error = True
+                        break
 
-                        # # buffer[494:502]
-                        # data_curr_us = convert.bytes_to_u64(buffer[-8:])
-                        # recv_curr_us = time.monotonic() * 1000000
-                        #
-                        # if data_prev_us != 0 and recv_prev_us != 0:
-                        #     data_interval_us = data_curr_us - data_prev_us
-                        #     data_over_cnts += 1 if data_interval_us > data_over_us else 0
-                        #
-                        #     recv_interval_us = recv_curr_us - recv_prev_us
-                        #     recv_over_cnts += 1 if recv_interval_us > recv_over_us else 0
-                        #
-                        #     print_flag = False
-                        #
-                        #     if data_interval_us > data_max_interval_us:
-                        #         data_max_interval_us = data_interval_us
-                        #         print_flag = True
-                        #     elif data_interval_us > data_over_us:
-                        #         print_flag = True
-                        #
-                        #     if recv_interval_us > recv_max_interval_us:
-                        #         recv_max_interval_us = recv_interval_us
-                        #         print_flag = True
-                        #     elif recv_interval_us > recv_over_us:
-                        #         print_flag = True
-                        #
-                        #     if print_flag:
-                        #         print('[RECV] Di={}, Dmax={}, Dcnts={}, Ri={}, Rmax={}, Rcnts={}'.format(
-                        #             data_interval_us / 1000, data_max_interval_us / 1000, data_over_cnts,
-                        #             recv_interval_us / 1000, recv_max_interval_us / 1000, recv_over_cnts
-                        #         ))
-                        # data_prev_us = data_curr_us
-                        # recv_prev_us = recv_curr_us
-
-                        if self.rx_que.qsize() > 1:
-                            self.rx_que.get()
-                        self.rx_parse.put(buffer, True)
-                        buffer = b''
-                        data_num = 0
-
-                    timeout_count = 0
-                    failed_read_count = 0
+                    if self.rx_que.qsize() > 1:
+                        self.rx_que.get()
+                        self.rx_dropped += 1
+                    self.rx_parse.put(rx_buffer.pop(size), True)
+                if is_error:
+                    break
         except Exception as e:
             if self.alive:
                 logger.error('[{}] recv error: {}'.format(self.port_type, e))
@@ -257,14 +298,20 @@ class Port(threading.Thread):
         is_main_serial = self.port_type == 'main-serial'
         try:
             failed_read_count = 0
-            buffer = b''
+            rx_buffer = RxBuffer(max(self.buffer_size, 1024) * 64)
+            length = 6
             while self.connected and self.alive:
                 if is_main_tcp:
                     try:
-                        rx_data = self.com_read(self.buffer_size)
+                        if self.com_recv_into:
+                            num = rx_buffer.recv_into(self.com_recv_into, length)
+                        else:
+                            rx_data = self.com_read(self.buffer_size)
+                            rx_buffer.extend(rx_data)
+                            num = len(rx_data)
                     except socket.timeout:
                         continue
-                    if len(rx_data) == 0:
+                    if num == 0:
                         failed_read_count += 1
                         if failed_read_count > 5:
                             self._connected = False
@@ -272,16 +319,14 @@ class Port(threading.Thread):
                             break
                         time.sleep(0.1)
                         continue
-                    buffer += rx_data
                     while True:
-                        if len(buffer) < 6:
+                        length = 6
+                        if len(rx_buffer) < length:
                             break
-                        length = convert.bytes_to_u16(buffer[4:6]) + 6
-                        if len(buffer) < length:
+                        length = rx_buffer.u16(4) + 6
+                        if len(rx_buffer) < length:
                             break
-                        rx_data = buffer[:length]
-                        buffer = buffer[length:]
-                        self.rx_parse.put(rx_data)
+                        self.rx_parse.put(rx_buffer.pop(length))
                 elif is_main_serial:
                     rx_data = self.com_read(self.com.in_waiting or self.buffer_size)
                     self.rx_parse.put(rx_data)
@@ -10,6 +10,36 @@
 
 import struct
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_FP32 = struct.Struct('<f')
+_NUM32 = {'>l': struct.Struct('>l'), '<l': struct.Struct('<l'), '>i': struct.Struct('>i'), '<i': struct.Struct('<i')}
+_structs = {}
+
+
+def _get_struct(fmt, n):
+    """批量打包/解包用的结构体, 按(格式, 个数)缓存, 例如('<f', 6) -> Struct('<6f')"""
+    key = (fmt, n)
+    st = _structs.get(key, None)
+    if st is None:
+        st = struct.Struct('{}{}{}'.format(fmt[0], n, fmt[1]))
+        _structs[key] = st
+    return st
+
+
+def _to_buffer(data):
+    # the response of UxbusCmd is a list of int, bytes/bytearray/memoryview can be used directly
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return data
+    return bytes(data)
+
+
+def _is_ndarray(data):
+    return numpy is not None and isinstance(data, numpy.ndarray)
+
 
 def fp32_to_bytes(data, is_big_endian=False):
     """小端字节序"""
@@ -24,37 +54,29 @@ def int32_to_bytes(data, is_big_endian=False):
 def int32s_to_bytes(data, n):
     """小端字节序"""
     assert n > 0
-    ret = int32_to_bytes(data[0])
-    for i in range(1, n):
-        ret += int32_to_bytes(data[i])
-    return ret
+    if _is_ndarray(data):
+        return data[:n].astype('<i4').tobytes()
+    return _get_struct('<i', n).pack(*data[:n])
 
 
 def bytes_to_fp32(data):
     """小端字节序"""
-    byte = bytes([data[0]])
-    byte += bytes([data[1]])
-    byte += bytes([data[2]])
-    byte += bytes([data[3]])
-    ret = struct.unpack('<f', byte)
-    return ret[0]
+    return _FP32.unpack_from(_to_buffer(data[:4]))[0]
 
 
 def fp32s_to_bytes(data, n):
-    """小端字节序"""
+    """小端字节序, data可以是list/tuple或numpy数组"""
     assert n > 0
-    ret = fp32_to_bytes(data[0])
-    for i in range(1, n):
-        ret += fp32_to_bytes(data[i])
-    return ret
+    if _is_ndarray(data):
+        return data[:n].astype('<f4').tobytes()
+    return _get_struct('<f', n).pack(*data[:n])
 
 
-def bytes_to_fp32s(data, n):
-    """小端字节序"""
-    ret = [0] * n
-    for i in range(n):
-        ret[i] = bytes_to_fp32(data[i * 4:i * 4 + 4])
-    return ret
+def bytes_to_fp32s(data, n, as_array=False):
+    """小端字节序, as_array为True且安装了numpy时返回numpy数组"""
+    if as_array and numpy is not None:
+        return numpy.frombuffer(_to_buffer(data[:n * 4]), dtype='<f4').astype(float)
+    return list(_get_struct('<f', n).unpack_from(_to_buffer(data[:n * 4])))
 
 
 def u16_to_bytes(data):
@@ -66,12 +88,15 @@ def u16_to_bytes(data):
 
 def u16s_to_bytes(data, num):
     """大端字节序"""
-    bts = b''
-    if num != 0:
-        bts = u16_to_bytes(data[0])
-        for i in range(1, num):
-            bts += u16_to_bytes(data[i])
-    return bts
+    if num == 0:
+        return b''
+    if _is_ndarray(data):
+        return data[:num].astype('>u2').tobytes()
+    try:
+        return _get_struct('>H', num).pack(*data[:num])
+    except struct.error:
+        # 与u16_to_bytes保持一致, 超出范围(如负数)的值按65536取模
+        return _get_struct('>H', num).pack(*[val % 65536 for val in data[:num]])
 
 
 def bytes_to_u16(data):
@@ -80,20 +105,16 @@ def bytes_to_u16(data):
     return data_u16
 
 
-def bytes_to_u16s(data, n):
-    """大端字节序"""
-    ret = [0] * n
-    for i in range(n):
-        ret[i] = bytes_to_u16(data[i * 2: i * 2 + 2])
-    return ret
+def bytes_to_u16s(data, n, as_array=False):
+    """大端字节序, as_array为True且安装了numpy时返回numpy数组"""
+    if as_array and numpy is not None:
+        return numpy.frombuffer(_to_buffer(data[:n * 2]), dtype='>u2').astype(int)
+    return list(_get_struct('>H', n).unpack_from(_to_buffer(data[:n * 2])))
 
 
 def bytes_to_16s(data, n):
     """大端字节序"""
-    ret = [0] * n
-    for i in range(n):
-        ret[i] = struct.unpack('>h', bytes(data[i * 2: i * 2 + 2]))[0]
-    return ret
+    return list(_get_struct('>h', n).unpack_from(_to_buffer(data[:n * 2])))
 
 
 def bytes_to_u32(data):
@@ -108,12 +129,8 @@ def bytes_to_u64(data):
 
 
 def bytes_to_num32(data, fmt='>l'):
-    byte = bytes([data[0]])
-    byte += bytes([data[1]])
-    byte += bytes([data[2]])
-    byte += bytes([data[3]])
-    ret = struct.unpack(fmt, byte)
-    return ret[0]
+    st = _NUM32.get(fmt, None) or struct.Struct(fmt)
+    return st.unpack_from(_to_buffer(data[:4]))[0]
 
 
 def bytes_to_long_big(data):
@@ -11,9 +11,8 @@ import functools
 import sys
 import os
 
+# 没有写入日志文件, 不在导入时创建目录
 log_path = os.path.join(os.path.expanduser('~'), '.UFACTORY', 'log', 'xarm', 'sdk')
-if not os.path.exists(log_path):
-    os.makedirs(log_path)
 
 logging.VERBOSE = 5
 logging.addLevelName(logging.VERBOSE, 'VERBOSE')
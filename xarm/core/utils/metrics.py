@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+运行指标: 直方图/计数器/状态量(读取时调用函数获取)
+默认关闭, 关闭时调用方只判断enabled, 不做任何计时
+快照可以导出为dict/JSON/Prometheus文本格式, 也可以启动一个HTTP服务(/metrics, /metrics.json)
+"""
+
+import json
+import time
+import bisect
+import threading
+from .log import logger
+
+# 单位: 秒, 从50us到10s
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram(object):
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # 按桶估算, 返回所在桶的上界(最后一个桶返回最大值)
+        if self.count == 0:
+            return None
+        target = q * self.count
+        total = 0
+        for i, n in enumerate(self.counts):
+            total += n
+            if total >= target and n > 0:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': [[self.bounds[i] if i < len(self.bounds) else '+Inf', n] for i, n in enumerate(self.counts)],
+        }
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics(object):
+    def __init__(self, enabled=False, prefix='xarm'):
+        """
+        :param enabled: collect the histograms and counters or not
+        :param prefix: the prefix of the metric names in the Prometheus text
+        """
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> {label: Histogram}
+        self._counters = {}  # name -> {label: count}
+        self._gauges = {}  # name -> (func, label_name, help)
+        self._help = {}
+        self._label_names = {}
+        self._server = None
+
+    def describe(self, name, help_text, label_name='label'):
+        self._help[name] = help_text
+        self._label_names[name] = label_name
+
+    def observe(self, name, value, label=''):
+        with self._lock:
+            hists = self._histograms.get(name, None)
+            if hists is None:
+                hists = self._histograms[name] = {}
+            hist = hists.get(label, None)
+            if hist is None:
+                hist = hists[label] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name, label='', n=1):
+        with self._lock:
+            counters = self._counters.get(name, None)
+            if counters is None:
+                counters = self._counters[name] = {}
+            counters[label] = counters.get(label, 0) + n
+
+    def register_gauge(self, name, func, help_text='', label_name='label'):
+        """
+        :param func: called when taking the snapshot, return a number or {label: number}
+        """
+        self._gauges[name] = func
+        self.describe(name, help_text, label_name)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def _read_gauges(self):
+        gauges = {}
+        for name, func in list(self._gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            if not isinstance(value, dict):
+                value = {'': value}
+            gauges[name] = {k: v for k, v in value.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+        return gauges
+
+    def snapshot(self):
+        with self._lock:
+            histograms = {name: {label: hist.to_dict() for label, hist in hists.items()}
+                          for name, hists in self._histograms.items()}
+            counters = {name: dict(counters) for name, counters in self._counters.items()}
+        return {
+            'enabled': self.enabled,
+            'time': time.time(),
+            'histograms': histograms,
+            'counters': counters,
+            'gauges': self._read_gauges(),
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = []
+
+        def _labels(name, label, extra=''):
+            items = []
+            if label != '':
+                items.append('{}="{}"'.format(self._label_names.get(name, 'label'), _escape_label(label)))
+            if extra:
+                items.append(extra)
+            return '{{{}}}'.format(','.join(items)) if items else ''
+
+        def _header(name, full_name, metric_type):
+            if name in self._help and self._help[name]:
+                lines.append('# HELP {} {}'.format(full_name, self._help[name]))
+            lines.append('# TYPE {} {}'.format(full_name, metric_type))
+
+        for name, hists in sorted(snapshot['histograms'].items()):
+            full_name = '{}_{}'.format(self.prefix, name)
+            _header(name, full_name, 'histogram')
+            for label, hist in sorted(hists.items()):
+                total = 0
+                for le, n in hist['buckets']:
+                    total += n
+                    lines.append('{}_bucket{} {}'.format(full_name, _labels(name, label, 'le="{}"'.format(le)), total))
+                lines.append('{}_sum{} {}'.format(full_name, _labels(name, label), hist['sum']))
+                lines.append('{}_count{} {}'.format(full_name, _labels(name, label), hist['count']))
+        for name, counters in sorted(snapshot['counters'].items()):
+            full_name = '{}_{}'.format(self.prefix, name)
+            _header(name, full_name, 'counter')
+            for label, n in sorted(counters.items()):
+                lines.append('{}{} {}'.format(full_name, _labels(name, label), n))
+        for name, gauges in sorted(snapshot['gauges'].items()):
+            full_name = '{}_{}'.format(self.prefix, name)
+            _header(name, full_name, 'gauge')
+            for label, value in sorted(gauges.items()):
+                lines.append('{}{} {}'.format(full_name, _labels(name, label), value))
+        return '\n'.join(lines) + '\n'
+
+    def start_server(self, port=9120, host='127.0.0.1'):
+        """
+        Start a HTTP server in a daemon thread
+            /metrics: the Prometheus text format
+            /metrics.json: the JSON snapshot
+        :return: the (host, port) the server listening on
+        """
+        if self._server is not None:
+            return self._server.server_address
+        # 只有启动服务时才导入http.server
+        from http import server
+        metrics = self
+
+        class _Handler(server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                if path in ('/metrics', '/'):
+                    body, content_type = metrics.to_prometheus(), 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/metrics.json':
+                    body, content_type = metrics.to_json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt, *args):
+                logger.debug('metrics server: ' + fmt % args)
+
+        server_class = getattr(server, 'ThreadingHTTPServer', server.HTTPServer)
+        self._server = server_class((host, port), _Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info('metrics server start, http://{}:{}/metrics'.format(*self._server.server_address[:2]))
+        return self._server.server_address
+
+    def stop_server(self):
+        if self._server is None:
+            return
+        server, self._server = self._server, None
+        server.shutdown()
+        server.server_close()
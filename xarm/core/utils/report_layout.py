@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+上报数据的预编译结构体布局
+浮点数为小端字节序, u16/u32为大端字节序, 所以每种布局编译成两个struct.Struct,
+小端的一个解析浮点数和字节, 大端的一个解析整数, 其余位置用pad跳过
+"""
+
+import struct
+
+# (name, type, count)
+#   f: float32(小端), B: u8, b: int8, H: u16(大端), I: u32(大端), x: 跳过
+REPORT_NORMAL_FIELDS = [
+    ('length', 'I', 1),
+    ('state_mode', 'B', 1),
+    ('cmd_num', 'H', 1),
+    ('angles', 'f', 7),
+    ('pose', 'f', 6),
+    ('torque', 'f', 7),
+    ('mtbrake_mtable_err_warn', 'B', 4),
+    ('pose_offset', 'f', 6),
+    ('tcp_load', 'f', 4),
+    ('collis_teach_sens', 'B', 2),
+    ('gravity_direction', 'f', 3),
+]
+
+REPORT_RICH_FIELDS = REPORT_NORMAL_FIELDS + [
+    ('arm_info', 'B', 6),
+    ('version', 'x', 30),
+    ('trs_msg', 'f', 5),
+    ('p2p_msg', 'f', 5),
+    ('rot_msg', 'f', 2),
+    ('servo_codes', 'B', 16),
+    ('temperatures', 'b', 7),
+    ('speeds', 'f', 8),
+    ('count', 'I', 1),
+    ('world_offset', 'f', 6),
+    ('gpio_reset_enable', 'B', 2),
+    ('simulation_collision', 'B', 3),
+    ('collision_tool_params', 'f', 6),
+    ('voltages', 'H', 7),
+    ('currents', 'f', 7),
+    ('cgpio_states', 'B', 2),
+    ('cgpio_values', 'H', 8),
+    ('cgpio_configs', 'B', 16),
+    ('cgpio_configs_ext', 'B', 16),
+    ('ft_ext_force', 'f', 6),
+    ('ft_raw_force', 'f', 6),
+    ('iden_progress', 'B', 1),
+    ('pose_aa', 'f', 3),
+    ('flags', 'B', 1),
+]
+
+REPORT_REAL_FIELDS = [
+    ('length', 'I', 1),
+    ('state_mode', 'B', 1),
+    ('cmd_num', 'H', 1),
+    ('angles', 'f', 7),
+    ('pose', 'f', 6),
+    ('torque', 'f', 7),
+    ('ft_ext_force', 'f', 6),
+    ('ft_raw_force', 'f', 6),
+]
+
+REPORT_NORMAL_OLD_FIELDS = [
+    ('length', 'I', 1),
+    ('state_mtbrake_mtable_err_warn', 'B', 5),
+    ('angles', 'f', 7),
+    ('pose', 'f', 6),
+    ('cmd_num', 'H', 1),
+    ('pose_offset', 'f', 6),
+]
+
+REPORT_RICH_OLD_FIELDS = REPORT_NORMAL_OLD_FIELDS + [
+    ('arm_info', 'B', 6),
+    ('version', 'x', 30),
+    ('trs_msg', 'f', 5),
+    ('p2p_msg', 'f', 5),
+    ('rot_msg', 'f', 2),
+    ('sv3_msg', 'H', 8),
+]
+
+_TYPE_SIZE = {'f': 4, 'B': 1, 'b': 1, 'H': 2, 'I': 4, 'x': 1}
+_BIG_ENDIAN_TYPES = ('H', 'I')
+
+
+class ReportLayout(object):
+    """
+    一种上报类型在某个长度下的布局
+    unpack返回扁平的tuple, 字段名作为属性保存该字段在tuple中的位置:
+        count为1的字段是int下标, 其余是slice
+    超出数据长度的字段不会被解析, 对应属性为None
+    is_complete: 必需的字段(required及之前的字段)都在数据长度内
+    """
+    def __init__(self, fields, length, required=None):
+        le_fmt = '<'
+        be_fmt = '>'
+        le_names = []
+        be_names = []
+        offset = 0
+        for name, tp, count in fields:
+            size = _TYPE_SIZE[tp] * count
+            if offset + size > length:
+                break
+            if tp == 'x':
+                le_fmt += '{}x'.format(size)
+                be_fmt += '{}x'.format(size)
+            elif tp in _BIG_ENDIAN_TYPES:
+                le_fmt += '{}x'.format(size)
+                be_fmt += '{}{}'.format(count, tp)
+                be_names.append((name, count))
+            else:
+                le_fmt += '{}{}'.format(count, tp)
+                be_fmt += '{}x'.format(size)
+                le_names.append((name, count))
+            offset += size
+        self.size = offset
+        self._le = struct.Struct(le_fmt)
+        self._be = struct.Struct(be_fmt) if be_names else None
+        for name, _, _ in fields:
+            setattr(self, name, None)
+        index = 0
+        for name, count in le_names + be_names:
+            setattr(self, name, index if count == 1 else slice(index, index + count))
+            index += count
+        self.is_complete = required is None or getattr(self, required) is not None
+
+    def unpack(self, data):
+        if self._be is None:
+            return self._le.unpack_from(data)
+        return self._le.unpack_from(data) + self._be.unpack_from(data)
+
+
+_REPORT_FIELDS = {
+    'normal': REPORT_NORMAL_FIELDS,
+    'rich': REPORT_RICH_FIELDS,
+    'real': REPORT_REAL_FIELDS,
+    'normal_old': REPORT_NORMAL_OLD_FIELDS,
+    'rich_old': REPORT_RICH_OLD_FIELDS,
+}
+# 每种上报类型必需的最后一个字段, 之后的字段由处理函数按长度判断
+_REQUIRED_FIELDS = {
+    'normal': 'collis_teach_sens',
+    'rich': 'servo_codes',
+    'real': 'torque',
+    'normal_old': 'pose_offset',
+    'rich_old': 'rot_msg',
+}
+_layout_cache = {}
+
+
+def get_report_layout(report_type, length):
+    """
+    :param report_type: 'normal'/'rich'/'real'/'normal_old'/'rich_old'
+    :param length: the length of the report data
+    :return: ReportLayout, compiled once per (report_type, length)
+    """
+    key = (report_type, length)
+    layout = _layout_cache.get(key, None)
+    if layout is None:
+        layout = ReportLayout(_REPORT_FIELDS[report_type], length, required=_REQUIRED_FIELDS[report_type])
+        _layout_cache[key] = layout
+    return layout
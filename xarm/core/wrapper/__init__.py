@@ -6,6 +6,17 @@
 #
 # Author: Vinman <vinman.wen@ufactory.cc>
 
-
+import sys
 from .uxbus_cmd_ser import UxbusCmdSer
 from .uxbus_cmd_tcp import UxbusCmdTcp
+
+# uxbus_cmd_async依赖asyncio(导入较慢), 只在第一次访问AsyncUxbusCmdTcp时导入
+if sys.version_info < (3, 7):
+    from .uxbus_cmd_async import AsyncUxbusCmdTcp
+else:
+    def __getattr__(name):
+        if name != 'AsyncUxbusCmdTcp':
+            raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+        from .uxbus_cmd_async import AsyncUxbusCmdTcp
+        globals()[name] = AsyncUxbusCmdTcp
+        return AsyncUxbusCmdTcp
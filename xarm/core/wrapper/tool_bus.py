@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+末端RS-485(工具Modbus)事务调度
+所有经过tgpio_set_modbus的事务(夹爪/RobotIQ/BIO夹爪/滑轨/用户透传)先经过调度器, 同一时间只有一个事务占用总线,
+等待中的事务按(优先级, 截止时间, 先后顺序)获得总线, 超过截止时间还没有获得总线的事务直接返回超时, 不再发送
+相同的读请求(非透传, 功能码0x01~0x04)如果正在执行或者在coalesce_window内刚完成, 直接共用结果,
+每个从站有一个写计数, 写请求完成时加1并清除该从站已完成的读结果, 读请求只保存/共用与开始时写计数相同的结果,
+所以写请求完成之后发起的读请求不会拿到写之前读到的值
+503端口只用于透传(与原来的透传接口一致), 打开route_low后只有低优先级的透传事务经过503端口发送
+"""
+
+import time
+import heapq
+import threading
+from ..config.x_config import XCONF
+
+TOOL_BUS_PRIORITY_HIGH = 0  # 写指令(夹爪/滑轨运动等)
+TOOL_BUS_PRIORITY_NORMAL = 1  # 读
+TOOL_BUS_PRIORITY_LOW = 2  # 滑轨状态读取等后台轮询
+
+_READ_FUNCTIONS = (0x01, 0x02, 0x03, 0x04)
+_PRIORITY_NAMES = ('high', 'normal', 'low')
+
+
+class _Pending(object):
+    def __init__(self, generation):
+        self.event = threading.Event()
+        self.result = None
+        self.generation = generation
+
+
+class _Context(object):
+    def __init__(self, local, priority, deadline):
+        self._local = local
+        self._value = (priority, deadline)
+        self._last = None
+
+    def __enter__(self):
+        self._last = getattr(self._local, 'context', None)
+        self._local.context = self._value
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._local.context = self._last
+
+
+class ToolBusScheduler(object):
+    def __init__(self, coalesce_window=0.01):
+        """
+        :param coalesce_window: the completed read is shared with the same reads issued in the window (unit: second),
+            0 means only the reads in progress are shared
+        """
+        self.coalesce_window = coalesce_window
+        self.route_low = False
+        self._router = None
+        self._cond = threading.Condition()
+        self._busy = False
+        self._heap = []
+        self._seq = 0
+        self._inflight = {}
+        self._recent = {}
+        self._generations = {}  # (host_id, slave_id) -> 写计数
+        self._local = threading.local()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._cond:
+            self._stats = {
+                'requests': [0, 0, 0],
+                'coalesced': 0,
+                'expired': 0,
+                'routed': 0,
+                'max_wait': [0.0, 0.0, 0.0],
+            }
+
+    def get_stats(self):
+        """
+        :return: dict
+            requests/max_wait: {'high', 'normal', 'low'}, the number of transactions sent and the maximum time
+                waited for the bus (unit: second) of each priority
+            coalesced: the number of reads answered by a shared result
+            expired: the number of transactions dropped because the deadline passed before the bus was granted
+            routed: the number of low priority transparent transmission transactions sent over the 503 port
+        """
+        with self._cond:
+            return {
+                'requests': dict(zip(_PRIORITY_NAMES, self._stats['requests'])),
+                'max_wait': dict(zip(_PRIORITY_NAMES, self._stats['max_wait'])),
+                'coalesced': self._stats['coalesced'],
+                'expired': self._stats['expired'],
+                'routed': self._stats['routed'],
+                'waiting': len(self._heap),
+            }
+
+    def set_router(self, router):
+        """
+        :param router: router() returns the UxbusCmd to send the low priority transparent transmission transactions,
+            None to use the default
+        """
+        self._router = router
+
+    def context(self, priority=None, timeout=None):
+        """
+        Set the priority/deadline of the transactions issued by the current thread in the with block
+
+        :param priority: TOOL_BUS_PRIORITY_HIGH/TOOL_BUS_PRIORITY_NORMAL/TOOL_BUS_PRIORITY_LOW or 'high'/'normal'/'low',
+            default is None (high for the writes, low for the reads of the linear track, normal for the others)
+        :param timeout: the transaction must be granted the bus in timeout seconds, default is None (no deadline)
+        """
+        if isinstance(priority, str):
+            priority = _PRIORITY_NAMES.index(priority)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        return _Context(self._local, priority, deadline)
+
+    @staticmethod
+    def classify(modbus_t, host_id, is_transparent_transmission):
+        if is_transparent_transmission or len(modbus_t) < 2:
+            return TOOL_BUS_PRIORITY_NORMAL
+        if modbus_t[1] not in _READ_FUNCTIONS:
+            return TOOL_BUS_PRIORITY_HIGH
+        return TOOL_BUS_PRIORITY_LOW if host_id == XCONF.LINEER_TRACK_HOST_ID else TOOL_BUS_PRIORITY_NORMAL
+
+    def request(self, cmd, modbus_t, host_id, is_transparent_transmission, func):
+        """
+        :param cmd: the UxbusCmd which issued the transaction
+        :param func: func(cmd) sends the transaction and returns the response list
+        """
+        priority, deadline = getattr(self._local, 'context', None) or (None, None)
+        if priority is None:
+            priority = self.classify(modbus_t, host_id, is_transparent_transmission)
+        priority = min(max(int(priority), TOOL_BUS_PRIORITY_HIGH), TOOL_BUS_PRIORITY_LOW)
+        is_read = not is_transparent_transmission and len(modbus_t) >= 2 and modbus_t[1] in _READ_FUNCTIONS
+        is_write = not is_read and not is_transparent_transmission and len(modbus_t) >= 1
+        slave = (host_id, bytes(modbus_t[:1]))
+        key = (host_id, bytes(modbus_t)) if is_read else None
+        pending = None
+        own = None
+        generation = 0
+        with self._cond:
+            if key is not None:
+                generation = self._generations.get(slave, 0)
+                recent = self._recent.get(key)
+                if recent is not None and recent[2] == generation \
+                        and time.monotonic() - recent[0] <= self.coalesce_window:
+                    self._stats['coalesced'] += 1
+                    return list(recent[1])
+                pending = self._inflight.get(key)
+                if pending is not None and pending.generation != generation:
+                    # 正在执行的读请求在上一次写完成之前开始, 不能共用
+                    pending = None
+                if pending is None:
+                    own = self._inflight[key] = _Pending(generation)
+            elif is_write:
+                self._clear_recent(slave)
+        if pending is not None:
+            pending.event.wait()
+            if pending.result is not None:
+                with self._cond:
+                    self._stats['coalesced'] += 1
+                return list(pending.result)
+            return self.request(cmd, modbus_t, host_id, is_transparent_transmission, func)
+
+        result = None
+        try:
+            if not self._acquire(priority, deadline):
+                result = [XCONF.UxbusState.ERR_TOUT] * (7 + 1)
+                return list(result)
+            try:
+                target = cmd
+                if is_transparent_transmission and priority == TOOL_BUS_PRIORITY_LOW \
+                        and self.route_low and self._router is not None:
+                    target = self._router() or cmd
+                    if target is not cmd:
+                        with self._cond:
+                            self._stats['routed'] += 1
+                result = func(target)
+            finally:
+                if is_write:
+                    # 写请求完成, 之前开始的读请求的结果不再保存/共用
+                    with self._cond:
+                        self._generations[slave] = self._generations.get(slave, 0) + 1
+                        self._clear_recent(slave)
+                self._release()
+            return list(result)
+        finally:
+            if own is not None:
+                with self._cond:
+                    if self._inflight.get(key) is own:
+                        self._inflight.pop(key)
+                    if result is not None and result[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE] \
+                            and self._generations.get(slave, 0) == generation:
+                        self._recent[key] = (time.monotonic(), list(result), generation)
+                        if len(self._recent) > 64:
+                            self._recent.pop(next(iter(self._recent)))
+                own.result = result if result is not None and result[0] != XCONF.UxbusState.ERR_TOUT else None
+                own.event.set()
+
+    def _clear_recent(self, slave):
+        # must be called with the lock held
+        for k in [k for k in self._recent if k[0] == slave[0] and k[1][:1] == slave[1]]:
+            self._recent.pop(k)
+
+    def _acquire(self, priority, deadline):
+        start = time.monotonic()
+        with self._cond:
+            self._seq += 1
+            ticket = (priority, deadline if deadline is not None else float('inf'), self._seq)
+            heapq.heappush(self._heap, ticket)
+            while self._busy or self._heap[0] != ticket:
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._heap.remove(ticket)
+                        heapq.heapify(self._heap)
+                        self._stats['expired'] += 1
+                        self._cond.notify_all()
+                        return False
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            heapq.heappop(self._heap)
+            self._busy = True
+            self._stats['requests'][priority] += 1
+            self._stats['max_wait'][priority] = max(self._stats['max_wait'][priority], time.monotonic() - start)
+            return True
+
+    def _release(self):
+        with self._cond:
+            self._busy = False
+            self._cond.notify_all()
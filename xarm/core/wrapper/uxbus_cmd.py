@@ -40,7 +40,10 @@ class UxbusCmd(object):
         self._last_comm_time = time.monotonic()
         self._last_modbus_comm_time = time.monotonic()
         self._feedback_type = 0
+        self._pipeline = False
         self._set_feedback_key_tranid = set_feedback_key_tranid
+        self.tool_bus = None  # ToolBusScheduler, 由Base设置, 与503端口共用
+        self.metrics = None  # Metrics, 由Base设置
 
     @property
     def last_comm_time(self):
@@ -78,11 +81,15 @@ class UxbusCmd(object):
     def recv_modbus_response(self, t_unit_id, t_trans_id, num, timeout, t_prot_id=-1, ret_raw=False):
         raise NotImplementedError
 
+    def _discard_response(self, trans_id):
+        # 不等待回复的请求, 子类可以在这里释放为该事务ID保留的资源
+        pass
+
     @lock_require
     def set_nu8(self, funcode, datas, num, timeout=None, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
         need_set_fb = feedback_type != 0 and (self._feedback_type & feedback_type) != feedback_type
         if feedback_key and need_set_fb:
-            self._set_feedback_type_no_lock(self._feedback_type | feedback_type)
+            self._send_feedback_type_no_lock(self._feedback_type | feedback_type)
 
         trans_id = self._get_trans_id()
         if feedback_key and self._set_feedback_key_tranid:
@@ -90,8 +97,10 @@ class UxbusCmd(object):
         ret = self.send_modbus_request(funcode, datas, num)
         if ret == -1:
             return [XCONF.UxbusState.ERR_NOTTCP]
+        if feedback_key and need_set_fb and self._pipeline:
+            self._send_feedback_type_no_lock(self._feedback_type)
         ret = self.recv_modbus_response(funcode, ret, 0, self._S_TOUT if timeout is None else timeout)
-        if feedback_key and need_set_fb:
+        if feedback_key and need_set_fb and not self._pipeline:
             self._set_feedback_type_no_lock(self._feedback_type)
         return ret
 
@@ -133,7 +142,7 @@ class UxbusCmd(object):
     def set_nfp32(self, funcode, datas, num, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
         need_set_fb = feedback_type != 0 and (self._feedback_type & feedback_type) != feedback_type
         if feedback_key and need_set_fb:
-            self._set_feedback_type_no_lock(self._feedback_type | feedback_type)
+            self._send_feedback_type_no_lock(self._feedback_type | feedback_type)
 
         trans_id = self._get_trans_id()
         if feedback_key and self._set_feedback_key_tranid:
@@ -142,16 +151,31 @@ class UxbusCmd(object):
         ret = self.send_modbus_request(funcode, hexdata, num * 4)
         if ret == -1:
             return [XCONF.UxbusState.ERR_NOTTCP]
+        if feedback_key and need_set_fb and self._pipeline:
+            self._send_feedback_type_no_lock(self._feedback_type)
         ret = self.recv_modbus_response(funcode, ret, 0, self._S_TOUT)
-        if feedback_key and need_set_fb:
+        if feedback_key and need_set_fb and not self._pipeline:
             self._set_feedback_type_no_lock(self._feedback_type)
         return ret
 
+    @lock_require
+    def set_nfp32_no_wait(self, funcode, datas, num):
+        """
+        只发送不等待回复(fire-and-forget), 用于高频的servo_j/servo_cartesian目标点流
+        回复会在下一次请求发送前被清掉(流水线模式下直接丢弃)
+        """
+        hexdata = convert.fp32s_to_bytes(datas, num)
+        ret = self.send_modbus_request(funcode, hexdata, num * 4)
+        if ret == -1:
+            return [XCONF.UxbusState.ERR_NOTTCP]
+        self._discard_response(ret)
+        return [0]
+
     @lock_require
     def set_nfp32_with_bytes(self, funcode, datas, num, additional_bytes, rx_len=0, timeout=None, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
         need_set_fb = feedback_type != 0 and (self._feedback_type & feedback_type) != feedback_type
         if feedback_key and need_set_fb:
-            self._set_feedback_type_no_lock(self._feedback_type | feedback_type)
+            self._send_feedback_type_no_lock(self._feedback_type | feedback_type)
 
         trans_id = self._get_trans_id()
         if feedback_key and self._set_feedback_key_tranid:
@@ -161,8 +185,10 @@ class UxbusCmd(object):
         ret = self.send_modbus_request(funcode, hexdata, num * 4 + len(additional_bytes))
         if ret == -1:
             return [XCONF.UxbusState.ERR_NOTTCP]
+        if feedback_key and need_set_fb and self._pipeline:
+            self._send_feedback_type_no_lock(self._feedback_type)
         ret = self.recv_modbus_response(funcode, ret, rx_len, self._S_TOUT if timeout is None else timeout)
-        if feedback_key and need_set_fb:
+        if feedback_key and need_set_fb and not self._pipeline:
             self._set_feedback_type_no_lock(self._feedback_type)
         return ret
 
@@ -170,7 +196,7 @@ class UxbusCmd(object):
     def set_nint32(self, funcode, datas, num, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
         need_set_fb = feedback_type != 0 and (self._feedback_type & feedback_type) != feedback_type
         if feedback_key and need_set_fb:
-            self._set_feedback_type_no_lock(self._feedback_type | feedback_type)
+            self._send_feedback_type_no_lock(self._feedback_type | feedback_type)
 
         trans_id = self._get_trans_id()
         if feedback_key and self._set_feedback_key_tranid:
@@ -179,8 +205,10 @@ class UxbusCmd(object):
         ret = self.send_modbus_request(funcode, hexdata, num * 4)
         if ret == -1:
             return [XCONF.UxbusState.ERR_NOTTCP]
+        if feedback_key and need_set_fb and self._pipeline:
+            self._send_feedback_type_no_lock(self._feedback_type)
         ret = self.recv_modbus_response(funcode, ret, 0, self._S_TOUT)
-        if feedback_key and need_set_fb:
+        if feedback_key and need_set_fb and not self._pipeline:
             self._set_feedback_type_no_lock(self._feedback_type)
         return ret
 
@@ -226,6 +254,21 @@ class UxbusCmd(object):
             return [XCONF.UxbusState.ERR_NOTTCP] * 2
         return self.recv_modbus_response(funcode, ret, 1, self._G_TOUT)
 
+    def swop_nfp32_batch(self, funcode, datas_list, txn, rxn, window=8):
+        """
+        批量请求, 串口是一问一答, 逐个请求(tcp连接时多个请求同时在途, 见UxbusCmdTcp)
+        :param window: the maximum number of requests in flight (only for tcp)
+        :return: [[code, value1, ..., value_rxn], ...]
+        """
+        return [self.swop_nfp32(funcode, datas, txn, rxn) for datas in datas_list]
+
+    def is_nfp32_batch(self, funcode, datas_list, txn, window=8):
+        """
+        :param window: the maximum number of requests in flight (only for tcp)
+        :return: [[code, value], ...]
+        """
+        return [self.is_nfp32(funcode, datas, txn) for datas in datas_list]
+
     def get_version(self):
         return self.get_nu8(XCONF.UxbusReg.GET_VERSION, 40)
 
@@ -421,6 +464,18 @@ class UxbusCmd(object):
             byte_data = bytes([coord, int(is_axis_angle), only_check_type, int(motion_type)])
         return self.set_nfp32_with_bytes(XCONF.UxbusReg.MOVE_LINE, txdata, 10, byte_data, 3, timeout=10, feedback_key=feedback_key)
 
+    def move_line_common_batch(self, items, coord=0, is_axis_angle=False, only_check_type=0, window=8):
+        """
+        批量发送直线运动指令, 串口是一问一答, 逐个请求(tcp连接时多个请求同时在途, 见UxbusCmdTcp)
+        :param items: [(mvpose, mvvelo, mvacc, mvtime, radius), ...]
+        :param coord/is_axis_angle/only_check_type: same as move_line_common
+        :param window: the maximum number of requests in flight (only for tcp)
+        :return: [ret, ...], same as move_line_common
+        """
+        return [self.move_line_common(mvpose, mvvelo, mvacc, mvtime, radius, coord=coord, is_axis_angle=is_axis_angle,
+                                      only_check_type=only_check_type)
+                for mvpose, mvvelo, mvacc, mvtime, radius in items]
+
     def move_line_aa(self, mvpose, mvvelo, mvacc, mvtime, mvcoord, relative, only_check_type=0, motion_type=0):
         float_data = [mvpose[i] for i in range(6)]
         float_data += [mvvelo, mvacc, mvtime]
@@ -516,14 +571,18 @@ class UxbusCmd(object):
             byte_data = bytes([only_check_type])
             return self.set_nfp32_with_bytes(XCONF.UxbusReg.MOVE_HOME, txdata, 3, byte_data, 3, timeout=10, feedback_key=feedback_key)
 
-    def move_servoj(self, mvjoint, mvvelo, mvacc, mvtime):
+    def move_servoj(self, mvjoint, mvvelo, mvacc, mvtime, no_wait=False):
         txdata = [mvjoint[i] for i in range(7)]
         txdata += [mvvelo, mvacc, mvtime]
+        if no_wait:
+            return self.set_nfp32_no_wait(XCONF.UxbusReg.MOVE_SERVOJ, txdata, 10)
         return self.set_nfp32(XCONF.UxbusReg.MOVE_SERVOJ, txdata, 10)
 
-    def move_servo_cartesian(self, mvpose, mvvelo, mvacc, mvtime):
+    def move_servo_cartesian(self, mvpose, mvvelo, mvacc, mvtime, no_wait=False):
         txdata = [mvpose[i] for i in range(6)]
         txdata += [mvvelo, mvacc, mvtime]
+        if no_wait:
+            return self.set_nfp32_no_wait(XCONF.UxbusReg.MOVE_SERVO_CART, txdata, 9)
         return self.set_nfp32(XCONF.UxbusReg.MOVE_SERVO_CART, txdata, 9)
 
     # # This interface is no longer supported
@@ -637,6 +696,18 @@ class UxbusCmd(object):
     def is_tcp_limit(self, pose):
         return self.is_nfp32(XCONF.UxbusReg.IS_TCP_LIMIT, pose, 6)
 
+    def get_ik_batch(self, poses, window=8):
+        return self.swop_nfp32_batch(XCONF.UxbusReg.GET_IK, poses, 6, 7, window=window)
+
+    def get_fk_batch(self, angles_list, window=8):
+        return self.swop_nfp32_batch(XCONF.UxbusReg.GET_FK, angles_list, 7, 6, window=window)
+
+    def is_joint_limit_batch(self, joints, window=8):
+        return self.is_nfp32_batch(XCONF.UxbusReg.IS_JOINT_LIMIT, joints, 7, window=window)
+
+    def is_tcp_limit_batch(self, poses, window=8):
+        return self.is_nfp32_batch(XCONF.UxbusReg.IS_TCP_LIMIT, poses, 6, window=window)
+
     @lock_require
     def gripper_addr_w16(self, addr, value):
         return self.tgpio_addr_w16(addr, value, bid=XCONF.GRIPPER_ID)
@@ -791,8 +862,16 @@ class UxbusCmd(object):
                 return self.tgpio_addr_w16(XCONF.ServoConf.SOFT_REBOOT, 1)
         return ret[:2]
 
-    @lock_require
     def tgpio_set_modbus(self, modbus_t, len_t, host_id=XCONF.TGPIO_HOST_ID, limit_sec=0.0, is_transparent_transmission=False):
+        if self.tool_bus is None:
+            return self._tgpio_set_modbus(modbus_t, len_t, host_id=host_id, limit_sec=limit_sec,
+                                          is_transparent_transmission=is_transparent_transmission)
+        return self.tool_bus.request(self, modbus_t, host_id, is_transparent_transmission,
+                                     lambda cmd: cmd._tgpio_set_modbus(modbus_t, len_t, host_id=host_id, limit_sec=limit_sec,
+                                                                       is_transparent_transmission=is_transparent_transmission))
+
+    @lock_require
+    def _tgpio_set_modbus(self, modbus_t, len_t, host_id=XCONF.TGPIO_HOST_ID, limit_sec=0.0, is_transparent_transmission=False):
         txdata = bytes([host_id])
         txdata += bytes(modbus_t)
         if limit_sec > 0:
@@ -990,6 +1069,16 @@ class UxbusCmd(object):
         return [ret[0], convert.bytes_to_long_big(ret[1:5])]
         # return [ret[0], convert.bytes_to_long_big(ret[1:5])[0]]
 
+    def servo_addr_r_batch(self, items, window=8):
+        """
+        读取多个伺服寄存器, 串口是一问一答, 逐个读取
+        :param items: [(axis, addr, width), ...], width is 16 or 32
+        :param window: the maximum number of requests in flight (only for tcp)
+        :return: [[code, value], ...]
+        """
+        return [self.servo_addr_r32(axis, addr) if width == 32 else self.servo_addr_r16(axis, addr)
+                for axis, addr, width in items]
+
     # -----------------------------------------------------
     # controler gpio
     # -----------------------------------------------------
@@ -1331,6 +1420,17 @@ class UxbusCmd(object):
             return [XCONF.UxbusState.ERR_NOTTCP]
         return self.recv_modbus_response(XCONF.UxbusReg.SET_FEEDBACK_TYPE, ret, 0, self._S_TOUT)
 
+    def _send_feedback_type_no_lock(self, feedback_type):
+        # 流水线模式下等待回复时会释放lock, 临时修改反馈类型/指令/恢复反馈类型三个请求在持有lock期间连续发送,
+        # 其它线程的请求不会插在中间, 反馈类型的回复直接丢弃
+        if not self._pipeline:
+            return self._set_feedback_type_no_lock(feedback_type)
+        ret = self.send_modbus_request(XCONF.UxbusReg.SET_FEEDBACK_TYPE, [feedback_type], 1)
+        if ret == -1:
+            return [XCONF.UxbusState.ERR_NOTTCP]
+        self._discard_response(ret)
+        return [0]
+
     @lock_require
     def set_feedback_type(self, feedback_type):
         ret = self._set_feedback_type_no_lock(feedback_type)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import asyncio
+from ..utils import convert
+from ..utils.log import logger
+from ..config.x_config import XCONF
+from .uxbus_cmd_tcp import UxbusCmdTcp, TRANSACTION_ID_MAX, debug_log_datas
+
+
+class AsyncUxbusCmdTcp(UxbusCmdTcp):
+    """
+    基于asyncio streams的502端口命令通道
+    只重写了基本读写接口(set_nu8/get_nu8/set_nfp32/...), UxbusCmd中基于这些接口的命令会直接返回协程,
+        如: code, state = await arm_cmd.get_state()
+    多个请求可以同时await, 回复由接收任务按事务ID分发
+    自己直接调用send_modbus_request/recv_modbus_response的命令不支持, 返回ERR_NOTTCP
+    """
+    def __init__(self, reader, writer, feedback_callback=None):
+        super(AsyncUxbusCmdTcp, self).__init__(None)
+        self._reader = reader
+        self._writer = writer
+        self._feedback_callback = feedback_callback
+        self._futures = {}
+        self._recv_task = None
+        self._connected = True
+
+    @property
+    def connected(self):
+        return self._connected
+
+    def start(self):
+        if self._recv_task is None:
+            self._recv_task = asyncio.ensure_future(self._recv_loop())
+
+    async def close(self):
+        self._connected = False
+        if self._recv_task is not None:
+            self._recv_task.cancel()
+            try:
+                await self._recv_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._recv_task = None
+        try:
+            self._writer.close()
+            await self._writer.wait_closed()
+        except Exception:
+            pass
+
+    async def _recv_loop(self):
+        try:
+            while True:
+                header = await self._reader.readexactly(6)
+                length = convert.bytes_to_u16(header[4:6])
+                rx_data = header + await self._reader.readexactly(length)
+                if len(rx_data) > 6 and rx_data[6] == 0xFF:
+                    # 运动反馈帧(事务ID与请求共用), 不是请求的回复
+                    if self._feedback_callback:
+                        self._feedback_callback(rx_data)
+                    continue
+                future = self._futures.pop(convert.bytes_to_u16(rx_data[0:2]), None)
+                if future is not None and not future.done():
+                    future.set_result(rx_data)
+        except asyncio.CancelledError:
+            pass
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            logger.error('async control connection closed: {}'.format(e))
+        finally:
+            self._connected = False
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_result(None)
+            self._futures.clear()
+
+    def send_modbus_request(self, unit_id, pdu_data, pdu_len, prot_id=-1, t_id=None, flush=True):
+        # 同步收发接口在asyncio通道上不可用
+        return -1
+
+    def _send(self, unit_id, pdu_data, pdu_len):
+        if not self._connected:
+            return -1
+        trans_id = self._transaction_id
+        self._transaction_id = self._transaction_id % TRANSACTION_ID_MAX + 1
+        send_data = convert.u16_to_bytes(trans_id)
+        send_data += convert.u16_to_bytes(self._protocol_identifier)
+        send_data += convert.u16_to_bytes(pdu_len + 1)
+        send_data += bytes([unit_id])
+        if pdu_len > 0:
+            send_data += bytes(pdu_data[:pdu_len])
+        # register before write, the response may arrive before drain returns
+        self._futures[trans_id] = asyncio.get_running_loop().create_future()
+        if self._debug:
+            debug_log_datas(send_data, label='send({})'.format(unit_id))
+        try:
+            self._writer.write(send_data)
+        except Exception:
+            self._futures.pop(trans_id, None)
+            return -1
+        return trans_id
+
+    async def _request(self, unit_id, pdu_data, pdu_len, num, timeout):
+        trans_id = self._send(unit_id, pdu_data, pdu_len)
+        if trans_id == -1:
+            return [XCONF.UxbusState.ERR_NOTTCP] * (num + 1)
+        ret = [0] * (num + 1)
+        ret[0] = XCONF.UxbusState.ERR_TOUT
+        future = self._futures.get(trans_id)
+        try:
+            await self._writer.drain()
+            rx_data = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return ret
+        except (ConnectionError, OSError):
+            ret[0] = XCONF.UxbusState.ERR_NOTTCP
+            return ret
+        finally:
+            self._futures.pop(trans_id, None)
+        if rx_data is None:
+            ret[0] = XCONF.UxbusState.ERR_NOTTCP
+            return ret
+        self._last_comm_time = time.monotonic()
+        if self._debug:
+            debug_log_datas(rx_data, label='recv({})'.format(unit_id))
+        code = self.check_protocol_header(rx_data, trans_id, self._protocol_identifier, unit_id)
+        if code != 0:
+            ret[0] = code
+            return ret
+        return self._parse_modbus_response(rx_data, ret, self._protocol_identifier)
+
+    async def set_nu8(self, funcode, datas, num, timeout=None, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
+        return await self._request(funcode, datas, num, 0, self._S_TOUT if timeout is None else timeout)
+
+    async def getset_nu8(self, funcode, datas, num_send, num_get):
+        return await self._request(funcode, datas, num_send, num_get, self._S_TOUT)
+
+    async def get_nu8(self, funcode, num):
+        return await self._request(funcode, 0, 0, num, self._G_TOUT)
+
+    async def set_nu16(self, funcode, datas, num):
+        return await self._request(funcode, convert.u16s_to_bytes(datas, num), num * 2, 0, self._S_TOUT)
+
+    async def get_nu16(self, funcode, num):
+        ret = await self._request(funcode, 0, 0, num * 2, self._G_TOUT)
+        data = [0] * (1 + num)
+        data[0] = ret[0]
+        data[1:num + 1] = convert.bytes_to_u16s(ret[1:num * 2 + 1], num)
+        return data
+
+    async def set_nfp32(self, funcode, datas, num, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
+        return await self._request(funcode, convert.fp32s_to_bytes(datas, num), num * 4, 0, self._S_TOUT)
+
+    async def set_nfp32_no_wait(self, funcode, datas, num):
+        trans_id = self._send(funcode, convert.fp32s_to_bytes(datas, num), num * 4)
+        if trans_id == -1:
+            return [XCONF.UxbusState.ERR_NOTTCP]
+        self._futures.pop(trans_id, None)
+        try:
+            await self._writer.drain()
+        except (ConnectionError, OSError):
+            return [XCONF.UxbusState.ERR_NOTTCP]
+        return [0]
+
+    async def set_nfp32_with_bytes(self, funcode, datas, num, additional_bytes, rx_len=0, timeout=None, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
+        hexdata = convert.fp32s_to_bytes(datas, num) + additional_bytes
+        return await self._request(funcode, hexdata, len(hexdata), rx_len, self._S_TOUT if timeout is None else timeout)
+
+    async def set_nint32(self, funcode, datas, num, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
+        return await self._request(funcode, convert.int32s_to_bytes(datas, num), num * 4, 0, self._S_TOUT)
+
+    async def get_nfp32(self, funcode, num, timeout=None):
+        ret = await self._request(funcode, 0, 0, num * 4, timeout if timeout is not None else self._G_TOUT)
+        data = [0] * (1 + num)
+        data[0] = ret[0]
+        data[1:num + 1] = convert.bytes_to_fp32s(ret[1:num * 4 + 1], num)
+        return data
+
+    async def get_nfp32_with_datas(self, funcode, datas, num_send, num_get, timeout=None):
+        ret = await self._request(funcode, datas, num_send, num_get * 4, timeout if timeout is not None else self._G_TOUT)
+        data = [0] * (1 + num_get)
+        data[0] = ret[0]
+        data[1:num_get + 1] = convert.bytes_to_fp32s(ret[1:num_get * 4 + 1], num_get)
+        return data
+
+    async def swop_nfp32(self, funcode, datas, txn, rxn):
+        ret = await self._request(funcode, convert.fp32s_to_bytes(datas, txn), txn * 4, rxn * 4, self._G_TOUT)
+        data = [0] * (1 + rxn)
+        data[0] = ret[0]
+        data[1:rxn + 1] = convert.bytes_to_fp32s(ret[1:rxn * 4 + 1], rxn)
+        return data
+
+    async def is_nfp32(self, funcode, datas, txn):
+        return await self._request(funcode, convert.fp32s_to_bytes(datas, txn), txn * 4, 1, self._G_TOUT)
@@ -10,7 +10,10 @@
 
 import time
 import struct
+import collections
+import threading
 from ..utils import convert
+from ..utils.log import logger
 from .uxbus_cmd import UxbusCmd, lock_require
 from ..config.x_config import XCONF
 
@@ -18,6 +21,15 @@ STANDARD_MODBUS_TCP_PROTOCOL = 0x00
 PRIVATE_MODBUS_TCP_PROTOCOL = 0x02
 TRANSACTION_ID_MAX = 65535    # cmd序号 最大值
 
+_FUNCODE_NAMES = None
+
+
+def _funcode_name(funcode):
+    global _FUNCODE_NAMES
+    if _FUNCODE_NAMES is None:
+        _FUNCODE_NAMES = {v: k for k, v in vars(XCONF.UxbusReg).items() if isinstance(v, int) and not k.startswith('_')}
+    return _FUNCODE_NAMES.get(funcode, str(funcode))
+
 
 def debug_log_datas(datas, label=''):
     print('{}:'.format(label), end=' ')
@@ -28,14 +40,34 @@ def debug_log_datas(datas, label=''):
     print()
 
 
+class PipelineFuture(object):
+    """
+    流水线模式下一个事务ID对应的回复
+    条件变量与UxbusCmd.lock共用同一把锁, 等待期间释放lock, 其它线程可以继续发送请求
+    """
+    def __init__(self, lock):
+        self.cond = threading.Condition(lock)
+        self.data = None
+
+    def set_result(self, data):
+        # must be called with the lock held
+        self.data = data
+        self.cond.notify()
+
+
 class UxbusCmdTcp(UxbusCmd):
-    def __init__(self, arm_port, set_feedback_key_tranid=None):
+    def __init__(self, arm_port, set_feedback_key_tranid=None, pipeline=False):
         super(UxbusCmdTcp, self).__init__(set_feedback_key_tranid=set_feedback_key_tranid)
         self.arm_port = arm_port
         self._has_err_warn = False
         self._last_comm_time = time.monotonic()
         self._transaction_id = 1
         self._protocol_identifier = PRIVATE_MODBUS_TCP_PROTOCOL
+        self._pipeline = False
+        self._pipeline_futures = {}
+        self._send_times = {}  # trans_id -> 发送时间, 只在开启指标时记录
+        if pipeline:
+            self.set_pipeline(True)
 
     @property
     def has_err_warn(self):
@@ -54,6 +86,60 @@ class UxbusCmdTcp(UxbusCmd):
     
     def get_protocol_identifier(self):
         return self._protocol_identifier
+
+    @property
+    def pipeline(self):
+        return self._pipeline
+
+    @lock_require
+    def set_pipeline(self, on_off):
+        """
+        流水线模式: 多个请求可以同时在途, 回复按事务ID分发给对应的等待者
+        关闭时恢复为一问一答模式(持有lock直到收到回复)
+        """
+        on_off = bool(on_off)
+        if on_off == self._pipeline:
+            return 0
+        self._pipeline = on_off
+        if on_off:
+            self.arm_port.set_rx_handler(self._dispatch_pipeline_response)
+        else:
+            self.arm_port.set_rx_handler(None)
+            for future in self._pipeline_futures.values():
+                future.cond.notify()
+            self._pipeline_futures.clear()
+        return 0
+
+    def _dispatch_pipeline_response(self, rx_data):
+        # call by recv thread of arm_port
+        if len(rx_data) < 8:
+            return
+        trans_id = convert.bytes_to_u16(rx_data[0:2])
+        with self.lock:
+            future = self._pipeline_futures.pop(trans_id, None)
+            if future is None:
+                logger.verbose('[pipeline] drop response, trans_id={}'.format(trans_id))
+                return
+            future.set_result(rx_data)
+
+    def _discard_response(self, trans_id):
+        self._pipeline_futures.pop(trans_id, None)
+        self._send_times.pop(trans_id, None)
+
+    def _wait_pipeline_response(self, trans_id, timeout):
+        # must be called with the lock held, the lock is released while waiting
+        future = self._pipeline_futures.get(trans_id, None)
+        if future is None:
+            return -1
+        expired = time.monotonic() + timeout
+        while future.data is None and self._pipeline:
+            remaining = expired - time.monotonic()
+            if remaining <= 0 or not self.arm_port.connected:
+                break
+            future.cond.wait(min(remaining, 0.1))
+        if self._pipeline_futures.get(trans_id, None) is future:
+            self._pipeline_futures.pop(trans_id, None)
+        return -1 if future.data is None else future.data
     
     def _get_trans_id(self):
         return self._transaction_id
@@ -87,7 +173,7 @@ class UxbusCmdTcp(UxbusCmd):
         self._has_err_warn = False
         return 0
     
-    def send_modbus_request(self, unit_id, pdu_data, pdu_len, prot_id=-1, t_id=None):
+    def send_modbus_request(self, unit_id, pdu_data, pdu_len, prot_id=-1, t_id=None, flush=True):
         trans_id = self._transaction_id if t_id is None else t_id
         prot_id = self._protocol_identifier if prot_id < 0 else prot_id
         send_data = convert.u16_to_bytes(trans_id)
@@ -96,20 +182,74 @@ class UxbusCmdTcp(UxbusCmd):
         send_data += bytes([unit_id])
         for i in range(pdu_len):
             send_data += bytes([pdu_data[i]])
-        self.arm_port.flush()
+        if self._pipeline:
+            # register before write, the response may arrive before write returns
+            self._pipeline_futures[trans_id] = PipelineFuture(self.lock)
+        elif flush:
+            self.arm_port.flush()
         if self._debug:
             debug_log_datas(send_data, label='send({})'.format(unit_id))
         ret = self.arm_port.write(send_data)
         if ret != 0:
+            self._pipeline_futures.pop(trans_id, None)
             return -1
+        if self.metrics is not None and self.metrics.enabled:
+            self._send_times[trans_id] = time.perf_counter()
         if t_id is None:
             self._transaction_id = self._transaction_id % TRANSACTION_ID_MAX + 1
         return trans_id
     
+    def _parse_modbus_response(self, rx_data, ret, prot_id, ret_raw=False):
+        if prot_id != STANDARD_MODBUS_TCP_PROTOCOL and not ret_raw:
+            # Private Modbus TCP Protocol
+            ret[0] = self.check_private_protocol(rx_data)
+            num = convert.bytes_to_u16(rx_data[4:6]) - 2
+            ret = ret[:num + 1] if len(ret) >= num + 1 else [ret[0]] * (num + 1)
+            length = len(rx_data) - 8
+            for i in range(num):
+                if i >= length:
+                    break
+                ret[i + 1] = rx_data[i + 8]
+        else:
+            # Standard Modbus TCP Protocol
+            ret[0] = 0
+            num = convert.bytes_to_u16(rx_data[4:6]) + 6
+            ret = ret[:num + 1] if len(ret) >= num + 1 else [ret[0]] * (num + 1)
+            length = len(rx_data)
+            for i in range(num):
+                if i >= length:
+                    break
+                ret[i + 1] = rx_data[i]
+        return ret
+
     def recv_modbus_response(self, t_unit_id, t_trans_id, num, timeout, t_prot_id=-1, ret_raw=False):
+        ret = self._recv_modbus_response(t_unit_id, t_trans_id, num, timeout, t_prot_id=t_prot_id, ret_raw=ret_raw)
+        metrics = self.metrics
+        if metrics is not None and metrics.enabled:
+            # 发送时间按事务ID保存, 事务ID是16位的, 不会无限增长
+            send_time = self._send_times.pop(t_trans_id, None)
+            if ret[0] == XCONF.UxbusState.ERR_TOUT:
+                metrics.inc('cmd_timeouts_total', _funcode_name(t_unit_id))
+            elif send_time is not None:
+                metrics.observe('cmd_rtt_seconds', time.perf_counter() - send_time, _funcode_name(t_unit_id))
+        return ret
+
+    def _recv_modbus_response(self, t_unit_id, t_trans_id, num, timeout, t_prot_id=-1, ret_raw=False):
         prot_id = self._protocol_identifier if t_prot_id < 0 else t_prot_id
         ret = [0] * 320 if num == -1 else [0] * (num + 1)
         ret[0] = XCONF.UxbusState.ERR_TOUT
+        if self._pipeline:
+            rx_data = self._wait_pipeline_response(t_trans_id, timeout)
+            if rx_data == -1:
+                return ret
+            self._last_comm_time = time.monotonic()
+            if self._debug:
+                debug_log_datas(rx_data, label='recv({})'.format(t_unit_id))
+            code = self.check_protocol_header(rx_data, t_trans_id, prot_id, t_unit_id)
+            if code != 0:
+                ret[0] = code
+                return ret
+            return self._parse_modbus_response(rx_data, ret, prot_id, ret_raw=ret_raw)
         expired = time.monotonic() + timeout
         while time.monotonic() < expired:
             remaining = expired - time.monotonic()
@@ -127,29 +267,89 @@ class UxbusCmdTcp(UxbusCmd):
                     return ret
                 else:
                     continue
-            if prot_id != STANDARD_MODBUS_TCP_PROTOCOL and not ret_raw:
-                # Private Modbus TCP Protocol
-                ret[0] = self.check_private_protocol(rx_data)
-                num = convert.bytes_to_u16(rx_data[4:6]) - 2
-                ret = ret[:num + 1] if len(ret) >= num + 1 else [ret[0]] * (num + 1)
-                length = len(rx_data) - 8
-                for i in range(num):
-                    if i >= length:
-                        break
-                    ret[i + 1] = rx_data[i + 8]       
-            else:
-                # Standard Modbus TCP Protocol
-                ret[0] = 0
-                num = convert.bytes_to_u16(rx_data[4:6]) + 6
-                ret = ret[:num + 1] if len(ret) >= num + 1 else [ret[0]] * (num + 1)
-                length = len(rx_data)
-                for i in range(num):
-                    if i >= length:
-                        break
-                    ret[i + 1] = rx_data[i]
-            return ret
+            return self._parse_modbus_response(rx_data, ret, prot_id, ret_raw=ret_raw)
         return ret
 
+    def _modbus_request_batch(self, requests, window=8, timeout=None):
+        """
+        发送多个请求, 最多window个请求同时在途, 回复按顺序接收(调用者持有lock)
+        非流水线模式下只在第一个请求前清空接收队列, 后面的请求不能再清空(会丢掉前面请求的回复)
+        :param requests: [(funcode, txdata, rx_num), ...]
+        :param timeout: the timeout of each response, default is the get timeout
+        :return: the list of the responses (same as recv_modbus_response)
+        """
+        results = [None] * len(requests)
+        pending = collections.deque()
+        index = 0
+        window = max(window, 1)
+        timeout = self._G_TOUT if timeout is None else timeout
+        while index < len(requests) or pending:
+            while index < len(requests) and len(pending) < window:
+                funcode, txdata, rx_num = requests[index]
+                trans_id = self.send_modbus_request(funcode, txdata, len(txdata), flush=index == 0)
+                if trans_id == -1:
+                    results[index] = [XCONF.UxbusState.ERR_NOTTCP] * (rx_num + 1)
+                else:
+                    pending.append((index, funcode, trans_id, rx_num))
+                index += 1
+            if not pending:
+                continue
+            i, funcode, trans_id, rx_num = pending.popleft()
+            results[i] = self.recv_modbus_response(funcode, trans_id, rx_num, timeout)
+        return results
+
+    @lock_require
+    def servo_addr_r_batch(self, items, window=8):
+        """
+        读取多个伺服寄存器, 协议每帧只能读一个寄存器, 所以按批量请求发送
+        :param items: [(axis, addr, width), ...], width is 16 or 32
+        :param window: the maximum number of requests in flight
+        :return: [[code, value], ...]
+        """
+        requests = []
+        for axis, addr, width in items:
+            funcode = XCONF.UxbusReg.SERVO_R32B if width == 32 else XCONF.UxbusReg.SERVO_R16B
+            requests.append((funcode, bytes([axis]) + convert.u16_to_bytes(addr), 4))
+        rets = self._modbus_request_batch(requests, window=window)
+        return [[ret[0], convert.bytes_to_long_big(ret[1:5])] for ret in rets]
+
+    @lock_require
+    def swop_nfp32_batch(self, funcode, datas_list, txn, rxn, window=8):
+        """
+        :param datas_list: [datas, ...], each datas has txn float values
+        :param window: the maximum number of requests in flight
+        :return: [[code, value1, ..., value_rxn], ...]
+        """
+        requests = [(funcode, convert.fp32s_to_bytes(datas, txn), rxn * 4) for datas in datas_list]
+        rets = self._modbus_request_batch(requests, window=window)
+        return [[ret[0]] + convert.bytes_to_fp32s(ret[1:rxn * 4 + 1], rxn) for ret in rets]
+
+    @lock_require
+    def is_nfp32_batch(self, funcode, datas_list, txn, window=8):
+        """
+        :param datas_list: [datas, ...], each datas has txn float values
+        :param window: the maximum number of requests in flight
+        :return: [[code, value], ...]
+        """
+        requests = [(funcode, convert.fp32s_to_bytes(datas, txn), 1) for datas in datas_list]
+        return self._modbus_request_batch(requests, window=window)
+
+    @lock_require
+    def move_line_common_batch(self, items, coord=0, is_axis_angle=False, only_check_type=0, window=8):
+        """
+        批量发送直线运动指令(不带反馈key), 指令进入控制器的指令缓存后就会回复, 所以可以多个请求同时在途
+        :param items: [(mvpose, mvvelo, mvacc, mvtime, radius), ...]
+        :param coord/is_axis_angle/only_check_type: same as move_line_common
+        :param window: the maximum number of requests in flight
+        :return: [ret, ...], same as move_line_common
+        """
+        requests = []
+        byte_data = bytes([coord, int(is_axis_angle), only_check_type])
+        for mvpose, mvvelo, mvacc, mvtime, radius in items:
+            txdata = [mvpose[i] for i in range(6)] + [mvvelo, mvacc, mvtime, -1 if radius is None else radius]
+            requests.append((XCONF.UxbusReg.MOVE_LINE, convert.fp32s_to_bytes(txdata, 10) + byte_data, 3))
+        return self._modbus_request_batch(requests, window=window, timeout=10)
+
     # def send_hex_request(self, send_data):
     #     trans_id = int('0x' + str(send_data[0]) + str(send_data[1]), 16)
     #     data_str = b''
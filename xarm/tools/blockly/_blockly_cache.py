@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Blockly应用编译缓存
+以xml的绝对路径作为缓存项, 每一项保存生成的python代码(.py)和marshal后的代码对象(.bin),
+xml内容的sha1/转换参数/SDK版本/python版本都一致时直接加载代码对象, 不再解析xml和编译
+同一个进程内的代码对象另外保存在内存中, 文件的修改时间和大小不变时连xml都不需要读取
+"""
+
+import os
+import json
+import marshal
+import hashlib
+import threading
+import importlib.util
+from ...version import __version__
+from ...core.utils.log import logger
+from ._blockly_tool import BlocklyTool
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.UFACTORY', 'cache', 'blockly')
+
+# 会影响生成代码的转换参数
+_CODE_OPTIONS = ('init', 'wait_seconds', 'mode', 'state', 'error_exit', 'stop_exit', 'axis_type', 'loop_max_frequency')
+
+
+class BlocklyCompileCache(object):
+    def __init__(self, cache_dir=None, memory_size=16):
+        """
+        :param cache_dir: the directory of the cache files, default is ~/.UFACTORY/cache/blockly
+        :param memory_size: the number of code objects kept in memory
+        """
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self._memory_size = memory_size
+        self._memory = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _options_key(arm, kwargs):
+        options = {k: kwargs[k] for k in _CODE_OPTIONS if k in kwargs}
+        # arm是字符串(ip)时生成的代码中会创建XArmAPI('<ip>'), 其它情况与arm无关
+        options['arm'] = arm if isinstance(arm, str) else None
+        # highlight_callback只影响生成的代码是否带高亮调用, 与回调本身无关
+        options['highlight'] = bool(kwargs.get('highlight_callback', None))
+        options['is_exec'] = bool(kwargs.get('is_exec', False))
+        options['version'] = __version__
+        options['python'] = importlib.util.MAGIC_NUMBER.hex()
+        return json.dumps(options, sort_keys=True, default=str)
+
+    def _entry_path(self, path):
+        name = hashlib.sha1(path.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name)
+
+    def compile(self, path, arm=None, **kwargs):
+        """
+        Convert the blockly xml to python and compile it, the cached result is used if the xml is not changed
+
+        :param path: the path of the xml file
+        :param arm: passed to BlocklyTool.to_python
+        :param kwargs: the parameters of BlocklyTool.to_python
+        :return: (succeed, code_object, source)
+            succeed: False if the conversion is incomplete (some blocks are not supported), not cached
+        """
+        path = os.path.abspath(path)
+        options = self._options_key(arm, kwargs)
+        stat = os.stat(path)
+        mem_key = (path, stat.st_mtime_ns, stat.st_size, options)
+        with self._lock:
+            item = self._memory.get(mem_key)
+            if item is not None:
+                self.hits += 1
+                return True, item[0], item[1]
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha1(data + b'\0' + options.encode('utf-8')).hexdigest()
+        entry = self._entry_path(path)
+        code, source = self._load(entry, digest)
+        if code is None:
+            blockly_tool = BlocklyTool(path)
+            succeed = blockly_tool.to_python(arm=arm, **kwargs)
+            if not succeed:
+                return False, None, blockly_tool.codes
+            source = blockly_tool.codes
+            # 使用缓存的.py文件作为文件名, 出错时traceback可以显示代码行
+            code = compile(source, entry + '.py', 'exec')
+            self._save(entry, digest, source, code)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.hits += 1
+        with self._lock:
+            self._memory.pop(mem_key, None)
+            self._memory[mem_key] = (code, source)
+            while len(self._memory) > self._memory_size:
+                self._memory.pop(next(iter(self._memory)))
+        return True, code, source
+
+    def _load(self, entry, digest):
+        try:
+            with open(entry + '.bin', 'rb') as f:
+                if f.readline().decode('ascii').strip() != digest:
+                    return None, None
+                code = marshal.loads(f.read())
+            with open(entry + '.py', 'r', encoding='utf-8') as f:
+                source = f.read()
+            return code, source
+        except Exception:
+            return None, None
+
+    def _save(self, entry, digest, source, code):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # 先写临时文件再替换, 多个进程同时启动同一个应用时不会读到写了一半的文件
+            tmp = '{}.{}.tmp'.format(entry, os.getpid())
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(source)
+            os.replace(tmp, entry + '.py')
+            with open(tmp, 'wb') as f:
+                f.write('{}\n'.format(digest).encode('ascii'))
+                f.write(marshal.dumps(code))
+            os.replace(tmp, entry + '.bin')
+        except Exception as e:
+            logger.warning('save blockly cache failed: {}'.format(e))
+
+    def clear(self):
+        """
+        Remove all the cache files and the code objects in memory
+        """
+        with self._lock:
+            self._memory.clear()
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.py') or name.endswith('.bin'):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except Exception:
+                    pass
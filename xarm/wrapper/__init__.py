@@ -1 +1,28 @@
-from .xarm_api import XArmAPI
+import sys
+
+# PEP 562: 只在第一次访问时导入, 例如只用AsyncXArmAPI时不会加载XArmAPI和所有的mixin
+_LAZY_ATTRS = {
+    'XArmAPI': '.xarm_api',
+    'AsyncXArmAPI': '.xarm_api_async',
+    'ArmGroup': '.arm_group',
+    'ReportSubscriber': '..x3.report_shm',
+    'ReportRecording': '..x3.report_recorder',
+}
+
+if sys.version_info < (3, 7):
+    from .xarm_api import XArmAPI
+    from .xarm_api_async import AsyncXArmAPI
+    from .arm_group import ArmGroup
+    from ..x3.report_shm import ReportSubscriber
+    from ..x3.report_recorder import ReportRecording
+else:
+    def __getattr__(name):
+        if name not in _LAZY_ATTRS:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+        import importlib
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY_ATTRS))
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import queue
+import threading
+from ..core.utils.log import logger
+from ..x3.code import APIState
+
+
+class ArmTask(object):
+    """
+    An action queued on one arm of the ArmGroup
+    """
+    def __init__(self, name, func, args=(), kwargs=None, after=None):
+        self.name = name
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs or {}
+        if after is None:
+            self._after = []
+        elif isinstance(after, ArmTask):
+            self._after = [after]
+        else:
+            self._after = list(after)
+        self._event = threading.Event()
+        self.code = None
+        self.result = None
+
+    @property
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the task to finish
+
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :return: code, See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        if not self._event.wait(timeout):
+            return APIState.WAIT_FINISH_TIMEOUT
+        return self.code
+
+    def _finish(self, code, result=None):
+        self.code = code
+        self.result = result
+        self._event.set()
+
+
+class _Rendezvous(object):
+    def __init__(self, parties, timeout=None):
+        self.barrier = threading.Barrier(parties, timeout=timeout)
+
+
+class ArmGroup(object):
+    """
+    多臂协同
+    每个机械臂有一个常驻的工作线程, 按顺序执行各自队列中的动作, 运动类的动作都等待运动完成后才返回,
+    所以sync/barrier/after都是以运动完成为准, 不需要按时间sleep
+
+    任何一个动作失败(返回非0的code或抛出异常)或者任何一个机械臂上报了错误, 整个组都会中止:
+        所有队列中未执行的动作被取消(code=APIState.ARM_GROUP_ABORTED), 正在等待的sync被打断,
+        stop_on_error为True时其它机械臂会被急停(否则执行完当前的动作后停止)
+        急停由组内单独的线程执行, 不在上报线程(错误回调)中调用机械臂的接口
+    中止后需要调用reset()才能继续使用
+
+    Example:
+        group = ArmGroup({'f': arm_f, 'b': arm_b})
+        group.move('f', [300, 0, 300, 180, 0, 0])
+        task = group.move('f', [300, 100, 300, 180, 0, 0])
+        group.move('b', [300, 0, 300, 180, 0, 0], after=task)  # b starts after f reached the 2nd point
+        group.sync()  # f and b wait for each other
+        group.move('f', [300, 0, 300, 180, 0, 0])
+        group.move('b', [300, 0, 300, 180, 0, 0])
+        code = group.join()
+    """
+    def __init__(self, arms, stop_on_error=False, check_error=True):
+        """
+        :param arms: dict of {name: XArmAPI} or list of XArmAPI (the names are the indexes)
+        :param stop_on_error: emergency stop the other arms when one arm fails, default is False
+        :param check_error: abort the group when the report of any arm has an error code, default is True
+            Note: only available if enable_report of the arm is True
+        """
+        self._arms = dict(arms) if isinstance(arms, dict) else dict(enumerate(arms))
+        self._stop_on_error = stop_on_error
+        self._lock = threading.Lock()
+        self._error = None
+        self._rendezvous = []
+        self._queues = {name: queue.Queue() for name in self._arms}
+        # 错误回调可能在构造过程中就被调用, _abort用到的属性先创建
+        self._closed = False
+        self._stop_event = threading.Event()
+        self._stopper = None
+        if stop_on_error:
+            self._stopper = threading.Thread(target=self._stop_worker, name='ArmGroup-stop', daemon=True)
+            self._stopper.start()
+        self._error_callbacks = {}
+        if check_error:
+            for name, arm in self._arms.items():
+                callback = self._gen_error_callback(name)
+                if arm.register_error_warn_changed_callback(callback):
+                    self._error_callbacks[name] = callback
+        self._workers = []
+        for name in self._arms:
+            t = threading.Thread(target=self._worker, args=(name,), name='ArmGroup-{}'.format(name), daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def names(self):
+        return list(self._arms.keys())
+
+    @property
+    def arms(self):
+        return self._arms
+
+    @property
+    def error(self):
+        """
+        None if no error, else (name, code): the first arm that failed and its code
+        """
+        return self._error
+
+    @property
+    def code(self):
+        return 0 if self._error is None else self._error[1]
+
+    def _gen_error_callback(self, name):
+        def callback(data):
+            if data['error_code'] != 0:
+                self._abort(name, APIState.HAS_ERROR)
+        return callback
+
+    def _abort(self, name, code):
+        with self._lock:
+            if self._error is not None:
+                return
+            self._error = (name, code)
+            rendezvous = self._rendezvous
+            self._rendezvous = []
+        logger.error('ArmGroup abort, arm={}, code={}'.format(name, code))
+        for rdv in rendezvous:
+            rdv.barrier.abort()
+        if self._stop_on_error:
+            # _abort可能在上报线程中调用, 急停交给_stop_worker
+            self._stop_event.set()
+
+    def _stop_worker(self):
+        while True:
+            self._stop_event.wait()
+            self._stop_event.clear()
+            if self._closed:
+                break
+            error = self._error
+            if error is None:
+                continue
+            for other, arm in self._arms.items():
+                if other != error[0]:
+                    try:
+                        arm.set_state(4)
+                    except Exception as e:
+                        logger.error('ArmGroup stop arm exception, arm={}, exception={}'.format(other, e))
+
+    def reset(self):
+        """
+        Clear the error of the group, the queued actions are not affected
+        Note: clean the error of the arms before calling this
+        """
+        with self._lock:
+            self._error = None
+
+    def _wait_after(self, task):
+        for after in task._after:
+            while not after._event.wait(0.1):
+                if self._error is not None:
+                    return False
+        return self._error is None
+
+    def _run_task(self, name, task):
+        if not self._wait_after(task):
+            task._finish(APIState.ARM_GROUP_ABORTED)
+            return
+        if isinstance(task._func, _Rendezvous):
+            try:
+                task._func.barrier.wait()
+                task._finish(0)
+            except threading.BrokenBarrierError:
+                if self._error is None:
+                    self._abort(name, APIState.WAIT_FINISH_TIMEOUT)
+                    task._finish(APIState.WAIT_FINISH_TIMEOUT)
+                else:
+                    task._finish(APIState.ARM_GROUP_ABORTED)
+            with self._lock:
+                if task._func in self._rendezvous and task._func.barrier.n_waiting == 0:
+                    self._rendezvous.remove(task._func)
+            return
+        try:
+            ret = task._func(self._arms[name], *task._args, **task._kwargs)
+        except Exception as e:
+            logger.error('ArmGroup action exception, arm={}, exception={}'.format(name, e))
+            self._abort(name, APIState.API_EXCEPTION)
+            task._finish(APIState.API_EXCEPTION)
+            return
+        code = ret[0] if isinstance(ret, (tuple, list)) else ret if isinstance(ret, int) else 0
+        if code != 0:
+            self._abort(name, code)
+        task._finish(code, ret)
+
+    def _worker(self, name):
+        que = self._queues[name]
+        while True:
+            task = que.get()
+            if task is None:
+                break
+            if self._error is not None:
+                task._finish(APIState.ARM_GROUP_ABORTED)
+                continue
+            self._run_task(name, task)
+
+    def submit(self, name, func, *args, after=None, **kwargs):
+        """
+        Queue an action on the arm, the actions of one arm are executed in order
+
+        :param name: the name of the arm
+        :param func: called as func(arm, *args, **kwargs) in the worker of the arm,
+            the return value is the code, or a tuple/list whose first item is the code
+            Note: the motion should wait for the completion (wait=True)
+        :param after: ArmTask or list of ArmTask (may belong to other arms), the action starts after them
+        :return: ArmTask
+        """
+        task = ArmTask(name, func, args, kwargs, after=after)
+        self._queues[name].put(task)
+        return task
+
+    def move(self, name, pose, after=None, **kwargs):
+        """
+        Queue set_position(*pose, wait=True, **kwargs) on the arm
+
+        :return: ArmTask
+        """
+        kwargs['wait'] = True
+        return self.submit(name, lambda arm: arm.set_position(*pose, **kwargs), after=after)
+
+    def move_joint(self, name, angles, after=None, **kwargs):
+        """
+        Queue set_servo_angle(angle=angles, wait=True, **kwargs) on the arm
+
+        :return: ArmTask
+        """
+        kwargs['wait'] = True
+        return self.submit(name, lambda arm: arm.set_servo_angle(angle=angles, **kwargs), after=after)
+
+    def sleep(self, name, seconds, after=None):
+        """
+        Queue a dwell on the arm (e.g. waiting for the camera), not for synchronization
+
+        :return: ArmTask
+        """
+        return self.submit(name, lambda arm: time.sleep(seconds), after=after)
+
+    def sync(self, names=None, timeout=None):
+        """
+        Queue a rendezvous point, each arm waits there until all the arms reached it
+        (all the previous actions of these arms are finished)
+
+        :param names: the names of the arms, default is all
+        :param timeout: maximum waiting time at the rendezvous (unit: second), default is None(no timeout),
+            the group is aborted with APIState.WAIT_FINISH_TIMEOUT if timeout
+        :return: list of ArmTask
+        """
+        names = self.names if names is None else list(names)
+        rdv = _Rendezvous(len(names), timeout=timeout)
+        with self._lock:
+            self._rendezvous.append(rdv)
+        return [self.submit(name, rdv) for name in names]
+
+    def barrier(self, names=None, timeout=None):
+        """
+        Wait for all the queued actions of the arms to finish (blocking)
+
+        :param names: the names of the arms, default is all
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :return: code, the code of the group error if the group is aborted
+        """
+        names = self.names if names is None else list(names)
+        tasks = [self.submit(name, lambda arm: 0) for name in names]
+        expired = None if timeout is None else time.monotonic() + timeout
+        for task in tasks:
+            remaining = None if expired is None else max(expired - time.monotonic(), 0)
+            if task.wait(remaining) == APIState.WAIT_FINISH_TIMEOUT:
+                return APIState.WAIT_FINISH_TIMEOUT
+        return self.code
+
+    def join(self, timeout=None):
+        """
+        Wait for all the queued actions of all the arms to finish (blocking)
+
+        :return: code
+        """
+        return self.barrier(timeout=timeout)
+
+    def close(self):
+        """
+        Stop the workers (after the queued actions) and release the callbacks, the arms are not disconnected
+        """
+        for que in self._queues.values():
+            que.put(None)
+        for t in self._workers:
+            t.join()
+        self._workers = []
+        if self._stopper is not None:
+            self._closed = True
+            self._stop_event.set()
+            self._stopper.join()
+            self._stopper = None
+        for name, callback in self._error_callbacks.items():
+            self._arms[name].release_error_warn_changed_callback(callback)
+        self._error_callbacks = {}
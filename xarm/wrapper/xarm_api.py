@@ -79,6 +79,14 @@ class XArmAPI(object):
                 Note: only available in the param `check_cmdnum_limit` is True
             check_is_ready: check if the arm is ready to move or not, default is True
                 Note: only available if firmware_version < 1.5.20
+            enable_pipeline: allow multiple requests in flight on the socket connection, default is False
+                Note: the responses are dispatched to the waiting threads by transaction id,
+                    useful when several threads send commands to the same arm at the same time
+            feedback_maxsize: the maximum number of the commands whose feedback is kept, default is 4096
+            feedback_ttl: the feedback of the command which is not waited is dropped after feedback_ttl seconds, default is 600
+                None or <= 0 means no ttl (the feedbacks are only dropped when the number exceeds feedback_maxsize)
+            enable_metrics: collect the metrics (command round-trip time, report interval, ...) or not, default is False
+                Note: see the interface `get_metrics`
         """
         self._arm = XArm(port=port,
                          is_radian=is_radian,
@@ -752,6 +760,40 @@ class XArmAPI(object):
         """
         return self._arm.send_cmd_sync(command=command)
 
+    def send_cmd_async(self, command, timeout=None):
+        """
+        Queue the cmd and return immediately, the cmds are sent in order by a worker thread (see send_cmd_sync for the cmds)
+        Note:
+            1. The motion cmds are sent only when the number of cmds cached in the controller is less than max_cmdnum
+            2. The motion cmds (G1/G2/G7/G8/G9) are done when the feedback of the controller is received
+                (only available if the firmware version >= 2.0.102), the other cmds are done when they are executed
+            3. The queue is created on the first call (maxsize=1024), use gcode_queue() to customize it
+
+        :param command: 'G1 X{x} Y{y} Z{z} A{roll} B{pitch} C{yaw} F{speed} Q{acc} T{mvtime}', ...
+        :param timeout: maximum waiting time for the space of the queue(unit: second), default is None(no timeout)
+        :return: GcodeFuture
+            future.wait(timeout=None): wait for the cmd to finish and return the code
+            future.done: whether the cmd is finished
+            future.code: the code of the cmd, See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            future.result: the return value of the cmd (same as send_cmd_sync)
+            future.feedback_code: the feedback code of the controller (0: success, 1: failure, 2: discarded), -1 if no feedback
+            future.add_done_callback(callback): callback(future) is called when the cmd is finished
+        """
+        return self._arm.send_cmd_async(command, timeout=timeout)
+
+    def gcode_queue(self, maxsize=1024, lookahead=None):
+        """
+        Create (replace) the queue used by send_cmd_async, the cmds in the old queue are sent before it stops
+
+        :param maxsize: the maximum number of cmds waiting in the queue, send_cmd_async blocks when it is full
+        :param lookahead: the maximum number of cmds cached in the controller, default is None (max_cmdnum)
+        :return: GcodeQueue
+            queue.submit(command, timeout=None): same as send_cmd_async
+            queue.cancel(): cancel the cmds waiting in the queue
+            queue.close(cancel=True): stop the queue
+        """
+        return self._arm.gcode_queue(maxsize=maxsize, lookahead=lookahead)
+
     def get_position(self, is_radian=None):
         """
         Get the cartesian position
@@ -968,6 +1010,36 @@ class XArmAPI(object):
         return self._arm.set_servo_cartesian(mvpose, speed=speed, mvacc=mvacc, mvtime=mvtime, is_radian=is_radian,
                                              is_tool_coord=is_tool_coord, **kwargs)
 
+    def servo_stream(self, rate=100, is_cartesian=False, speed=None, mvacc=None, mvtime=None, is_radian=None,
+                     is_tool_coord=False, wait_response=False, **kwargs):
+        """
+        Create a stream that sends servo_j (or servo_cartesian) setpoints at a fixed rate, need to be set to servo motion mode(self.set_mode(1))
+        Note:
+            1. The setpoints are paced by deadline (start + n / rate), if the stream falls behind, the missed periods are skipped
+            2. By default the setpoints are sent without waiting for the response, the error/state is checked from the report data
+            3. Streaming stops when the iterator is exhausted, stream.stop() is called, or a send fails
+
+        :param rate: target send rate (unit: Hz), default is 100
+        :param is_cartesian: send servo_cartesian setpoints (pose) or not, default is False (servo_j, angles)
+        :param speed: speed, reserved
+        :param mvacc: acceleration, reserved
+        :param mvtime: 0, reserved
+        :param is_radian: the setpoints in radians or not, default is self.default_is_radian
+        :param is_tool_coord: is tool coordinate or not, only valid if is_cartesian is True
+        :param wait_response: wait for the response of every setpoint or not, default is False
+        :param kwargs: reserved
+        :return: ServoStream object
+            stream.run(setpoints): send the setpoints (blocking), return code
+            stream.start(setpoints): send the setpoints in a background thread
+            stream.stop(): stop sending
+            stream.join(timeout=None): wait for the background thread, return code
+            stream.stats: {'count', 'missed', 'late', 'jitter_max', 'jitter_avg', 'rate'}
+
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.servo_stream(rate=rate, is_cartesian=is_cartesian, speed=speed, mvacc=mvacc, mvtime=mvtime,
+                                      is_radian=is_radian, is_tool_coord=is_tool_coord, wait_response=wait_response, **kwargs)
+
     def move_circle(self, pose1, pose2, percent, speed=None, mvacc=None, mvtime=None, is_radian=None,
                     wait=False, timeout=None, is_tool_coord=False, is_axis_angle=False, **kwargs):
         """
@@ -1018,7 +1090,7 @@ class XArmAPI(object):
         return self._arm.move_gohome(speed=speed, mvacc=mvacc, mvtime=mvtime, is_radian=is_radian, wait=wait, timeout=timeout, **kwargs)
 
     def move_arc_lines(self, paths, is_radian=None, times=1, first_pause_time=0.1, repeat_pause_time=0,
-                       automatic_calibration=True, speed=None, mvacc=None, mvtime=None, wait=False):
+                       automatic_calibration=True, speed=None, mvacc=None, mvtime=None, wait=False, **kwargs):
         """
         Continuous linear motion with interpolation.
         Note:
@@ -1041,10 +1113,27 @@ class XArmAPI(object):
         :param mvacc: move acceleration (mm/s^2, rad/s^2), default is self.last_used_tcp_acc
         :param mvtime: 0, reserved
         :param wait: whether to wait for the arm to complete, default is False
+        :param kwargs: the parameters of the path preprocessing (for the dense paths, such as the paths from CAD)
+            preprocess: preprocess the paths or not, default is False
+                1. The near-duplicate points and the collinear points are dropped
+                2. The radius of the points without radius (or radius < 0) is computed from the adjacent segments
+                3. The points are sent in batches as long as the command cache of the controller has space
+                    (the firmware before 1.11.100 or only_check_type > 0 still sends the points one by one)
+                4. All points are checked (roll/pitch/yaw range, and the tcp limit if check is True) before sending
+            min_distance: the point closer than min_distance (unit: mm) to the previous point is dropped, default is 0.05
+            tolerance: the point within tolerance (unit: mm) of the line through its neighbours is dropped, default is 0.01
+            angle_tolerance: the orientation tolerance of the dropped points (unit: rad), default is 0.001
+            auto_radius: compute the radius of the points without radius or not, default is True
+            radius_ratio: the radius is at most radius_ratio (<=0.5) of the shorter adjacent segment, default is 0.4
+            max_radius: the maximum radius (unit: mm), default is None (no limit)
+            max_deviation: the maximum distance from the corner to the blended path (unit: mm), default is 0.5
+            lookahead: the maximum number of the commands in the controller cache, default is max_cmdnum (the parameter of the constructor) minus window
+            window: the maximum number of requests in flight, default is 8
+            check: check the tcp limit of all points before sending, default is False
         """
         return self._arm.move_arc_lines(paths, is_radian=is_radian, times=times, first_pause_time=first_pause_time,
                                         repeat_pause_time=repeat_pause_time, automatic_calibration=automatic_calibration,
-                                        speed=speed, mvacc=mvacc, mvtime=mvtime, wait=wait)
+                                        speed=speed, mvacc=mvacc, mvtime=mvtime, wait=wait, **kwargs)
 
     def set_servo_attach(self, servo_id=None):
         """
@@ -1771,6 +1860,120 @@ class XArmAPI(object):
         """
         return self._arm.is_joint_limit(joint, is_radian=is_radian)
 
+    def get_inverse_kinematics_batch(self, poses, input_is_radian=None, return_is_radian=None, window=8, use_cache=True):
+        """
+        Get inverse kinematics of multiple poses
+        Note:
+            1. Multiple requests are in flight at the same time over the socket connection (up to window),
+                instead of one round trip for each pose
+            2. The successful results are cached by the pose (quantized to 0.001mm/1e-6rad), the cache is cleared
+                when the TCP offset, the world offset, the DH parameters or the reduced/fence mode change
+
+        :param poses: N x 6 list (or numpy array) of [x(mm), y(mm), z(mm), roll(rad or °), pitch(rad or °), yaw(rad or °)]
+        :param input_is_radian: the param poses value(only roll/pitch/yaw) is in radians or not, default is self.default_is_radian
+        :param return_is_radian: the returned value is in radians or not, default is self.default_is_radian
+        :param window: the maximum number of requests in flight, default is 8
+        :param use_cache: use the cached results or not, default is True
+        :return: tuple((code, results))
+            code: the last non-zero code of the items, 0 if all succeed
+                See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            results: [[code, angles], ...], the same as the return of get_inverse_kinematics for each pose
+        """
+        return self._arm.get_inverse_kinematics_batch(poses, input_is_radian=input_is_radian, return_is_radian=return_is_radian,
+                                                      window=window, use_cache=use_cache)
+
+    def get_forward_kinematics_batch(self, angles_list, input_is_radian=None, return_is_radian=None, window=8, use_cache=True):
+        """
+        Get forward kinematics of multiple joint angles
+        Note: the requests are pipelined and the results are cached, see get_inverse_kinematics_batch
+
+        :param angles_list: N x 7 (or N x number of axes) list (or numpy array) of [angle-1, angle-2, ..., angle-n]
+        :param input_is_radian: the param angles_list value is in radians or not, default is self.default_is_radian
+        :param return_is_radian: the returned value is in radians or not, default is self.default_is_radian
+        :param window: the maximum number of requests in flight, default is 8
+        :param use_cache: use the cached results or not, default is True
+        :return: tuple((code, results))
+            code: the last non-zero code of the items, 0 if all succeed
+                See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            results: [[code, pose], ...], the same as the return of get_forward_kinematics for each item
+        """
+        return self._arm.get_forward_kinematics_batch(angles_list, input_is_radian=input_is_radian, return_is_radian=return_is_radian,
+                                                      window=window, use_cache=use_cache)
+
+    def is_tcp_limit_batch(self, poses, is_radian=None, window=8, use_cache=True):
+        """
+        Check multiple tcp poses are in limit
+        Note: the requests are pipelined and the results are cached, see get_inverse_kinematics_batch
+
+        :param poses: N x 6 list (or numpy array) of [x, y, z, roll, pitch, yaw]
+        :param is_radian: roll/pitch/yaw value is radians or not, default is self.default_is_radian
+        :param window: the maximum number of requests in flight, default is 8
+        :param use_cache: use the cached results or not, default is True
+        :return: tuple((code, results))
+            code: the last non-zero code of the items, 0 if all succeed
+                See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            results: [[code, limit], ...], limit is True/False/None, limit or not, or failed
+        """
+        return self._arm.is_tcp_limit_batch(poses, is_radian=is_radian, window=window, use_cache=use_cache)
+
+    def is_joint_limit_batch(self, joints, is_radian=None, window=8, use_cache=True):
+        """
+        Check multiple joint angles are in limit
+        Note: the requests are pipelined and the results are cached, see get_inverse_kinematics_batch
+
+        :param joints: N x 7 (or N x number of axes) list (or numpy array) of [angle-1, angle-2, ..., angle-n]
+        :param is_radian: angle value is radians or not, default is self.default_is_radian
+        :param window: the maximum number of requests in flight, default is 8
+        :param use_cache: use the cached results or not, default is True
+        :return: tuple((code, results))
+            code: the last non-zero code of the items, 0 if all succeed
+                See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            results: [[code, limit], ...], limit is True/False/None, limit or not, or failed
+        """
+        return self._arm.is_joint_limit_batch(joints, is_radian=is_radian, window=window, use_cache=use_cache)
+
+    def get_kinematics_model(self, refresh=False, validate=True):
+        """
+        Get the local kinematics model built from the DH parameters, the TCP offset and the world offset of the controller
+        Note:
+            1. The model computes the forward/inverse kinematics and the jacobian locally (no communication),
+                e.g. model.fk(angles), model.fk_batch(angles_list), model.ik(pose, seed=angles), model.jacobian(angles)
+            2. The unit of the model is mm and radian, the pose is the TCP in the user coordinate (the same as get_forward_kinematics)
+            3. The model is built once and reused, the TCP offset and the world offset of the cached model follow the
+                controller, refresh it after the DH parameters changed
+            4. Save it with model.save(path) and load it with KinematicsModel.load(path) to use it without the arm
+            5. only available if firmware_version >= 2.0.0 (get_dh_params)
+
+        :param refresh: rebuild the model or not, default is False
+        :param validate: compare the model with the forward kinematics of the controller at some random joint angles
+            and select the layout of the DH parameters, then check it with the inverse kinematics of the controller,
+            default is True
+        :return: tuple((code, model))
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+                APIState.KINEMATICS_MISMATCH(108) if the model does not match the controller (the model is not cached)
+            model: KinematicsModel instance
+        """
+        return self._arm.get_kinematics_model(refresh=refresh, validate=validate)
+
+    def clear_kinematics_cache(self):
+        """
+        Clear the cached results of the batch kinematics interfaces
+
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.clear_kinematics_cache()
+
+    def get_kinematics_cache_stats(self):
+        """
+        Get the statistics of the kinematics cache
+
+        :return: tuple((code, stats))
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            stats: {'size': n, 'maxsize': n, 'hits': n, 'misses': n}
+        """
+        return self._arm.get_kinematics_cache_stats()
+
     def emergency_stop(self):
         """
         Emergency stop (set_state(4) -> motion_enable(True) -> set_state(0))
@@ -1819,7 +2022,14 @@ class XArmAPI(object):
         :param speed: speed,unit:r/min
         :param auto_enable: auto enable or not, default is False
         :param timeout: wait time, unit:second, default is 10s
-        :return: code
+        :param kwargs: 
+            return_future: only valid if wait is False, return a future instead of the code, default is False
+                the completion is polled by the end effector poller shared by all the end effectors
+                future.done: whether the motion is finished
+                future.wait(timeout=None): wait for the motion to finish, return code
+                future.add_done_callback(callback): callback(future) is called when the motion is finished
+                future.code: the code of the motion
+        :return: code (or future if return_future is True)
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
         """
         return self._arm.set_gripper_position(pos, wait=wait, speed=speed, auto_enable=auto_enable, timeout=timeout, **kwargs)
@@ -1906,7 +2116,7 @@ class XArmAPI(object):
         """
         return self._arm.get_suction_cup()
 
-    def set_vacuum_gripper(self, on, wait=False, timeout=3, delay_sec=None):
+    def set_vacuum_gripper(self, on, wait=False, timeout=3, delay_sec=None, **kwargs):
         """
         Set vacuum gripper state
 
@@ -1916,10 +2126,17 @@ class XArmAPI(object):
         :param wait: wait or not, default is False
         :param timeout: wait time, unit:second, default is 3s
         :param delay_sec: delay effective time from the current start, in seconds, default is None(effective immediately)
-        :return: code
+        :param kwargs: 
+            return_future: only valid if wait is False, return a future instead of the code, default is False
+                the completion is polled by the end effector poller shared by all the end effectors
+                future.done: whether the vacuum state is reached
+                future.wait(timeout=None): wait until the vacuum state is reached, return code
+                future.add_done_callback(callback): callback(future) is called when the vacuum state is reached
+                future.code: the code of the wait
+        :return: code (or future if return_future is True)
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
         """
-        return self._arm.set_suction_cup(on, wait=wait, timeout=timeout, delay_sec=delay_sec)
+        return self._arm.set_suction_cup(on, wait=wait, timeout=timeout, delay_sec=delay_sec, **kwargs)
 
     def get_cgpio_digital(self, ionum=None):
         """
@@ -2031,6 +2248,108 @@ class XArmAPI(object):
         """
         return self._arm.get_cgpio_state()
 
+    def wait_cgpio_digital(self, pattern, timeout=None, is_output=False):
+        """
+        Wait until the digital IO states of the controller match the pattern
+        Note:
+            1. Resolved from the report data within one report period if enable_report is True and report_type is 'rich',
+                else get_cgpio_state() is polled every 100ms
+
+        :param pattern: dict of {ionum: value} or list of value (ionum is the index, None means any)
+            ionum: 0~7 are CI/CO, 8~15 are DI/DO
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :param is_output: wait for the output IO or not, default is False (input IO)
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+                0: matched
+                APIState.WAIT_FINISH_TIMEOUT: timeout
+        """
+        return self._arm.wait_cgpio_digital(pattern, timeout=timeout, is_output=is_output)
+
+    def get_cgpio_digital_cache(self):
+        """
+        Get the digital IO states of the controller cached from the report data (no communication)
+        Note: only available if enable_report is True and report_type is 'rich'
+
+        :return: (code, states)
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+                APIState.CMD_NOT_EXIST: the cache is not available
+            states: dict
+                'inputs': the input states, [CI0, ... CI7, DI0, ... DI7]
+                'outputs': the output states, [CO0, ... CO7, DO0, ... DO7]
+                'input_times': time.monotonic() of the last change of each input (0 if not changed since connected)
+                'output_times': time.monotonic() of the last change of each output
+                'seq': the number of reports received
+        """
+        return self._arm.get_cgpio_digital_cache()
+
+    def register_cgpio_edge_callback(self, callback, ionum=None, edge='both', is_output=False):
+        """
+        Register the callback of the edge of the digital IO of the controller (detected from the report data)
+        Note: only available if enable_report is True and report_type is 'rich'
+
+        :param callback: callback(ionum, value, timestamp), timestamp is time.monotonic() when the edge is detected
+            Note: called in the report thread, do not block it
+        :param ionum: the ionum (0~7 are CI/CO, 8~15 are DI/DO), default is None (all)
+        :param edge: 'rising', 'falling' or 'both', default is 'both'
+        :param is_output: the output IO or not, default is False (input IO)
+        :return: True/False
+        """
+        return self._arm.register_cgpio_edge_callback(callback, ionum=ionum, edge=edge, is_output=is_output)
+
+    def release_cgpio_edge_callback(self, callback=None):
+        """
+        Release the callback of the edge of the digital IO of the controller
+
+        :param callback: default is None (release all)
+        :return: True/False
+        """
+        return self._arm.release_cgpio_edge_callback(callback)
+
+    def start_report_broker(self, name=None):
+        """
+        Publish the latest report data of this instance to a shared memory block (seqlock protected),
+        other processes on the same host can map it read-only by xarm.wrapper.ReportSubscriber(name)
+        instead of connecting to the report port and decoding every frame again
+        Note:
+            1. Only available if enable_report is True, Python 3.8+ is required
+            2. The shared memory is removed on stop_report_broker() or disconnect()
+
+        :param name: the name of the shared memory, default is 'xarm_report_{ip}_{report_type}'
+        :return: the name of the shared memory
+        """
+        return self._arm.start_report_broker(name=name)
+
+    def stop_report_broker(self):
+        """
+        Stop publishing the report data to the shared memory, and remove the shared memory
+        """
+        return self._arm.stop_report_broker()
+
+    def start_report_recorder(self, path, capacity=900000, fields=None):
+        """
+        Record the report data (angles, position, joints_torque, currents, voltages, temperatures, ft_ext_force,
+        ft_raw_force) to preallocated memory-mapped ring files, one .npy file per field, the oldest frames are
+        overwritten when the ring is full, so the memory usage does not grow with the recording time
+        The recording can be read (also while recording) by xarm.wrapper.ReportRecording(path) as zero-copy views,
+        or by numpy.load('{path}/{field}.npy', mmap_mode='r')
+        Note:
+            1. Only available if enable_report is True
+            2. The files are flushed and closed on stop_report_recorder() or disconnect()
+
+        :param path: the directory of the recording, the old recording in the directory is overwritten
+        :param capacity: the number of frames in the ring, default is 900000 (1 hour at 250Hz)
+        :param fields: the names of the fields to record, default is None (all)
+        :return: the ReportRecorder instance
+        """
+        return self._arm.start_report_recorder(path, capacity=capacity, fields=fields)
+
+    def stop_report_recorder(self):
+        """
+        Stop recording the report data, and close the files
+        """
+        return self._arm.stop_report_recorder()
+
     def register_report_callback(self, callback=None, report_cartesian=True, report_joints=True,
                                  report_state=True, report_error_code=True, report_warn_code=True,
                                  report_mtable=True, report_mtbrake=True, report_cmd_num=True):
@@ -2320,17 +2639,53 @@ class XArmAPI(object):
     def run_blockly_app(self, path, **kwargs):
         """
         Run the app generated by xArmStudio software
+        Note: the generated python code and the compiled code object are cached on disk (~/.UFACTORY/cache/blockly),
+            the xml is not parsed again until its content (or the conversion parameters, SDK version) changes
+
         :param path: app path
+        :param kwargs: reserved parameters
+            times: the number of times to run the app, default is 1
+            use_cache: use the compile cache or not, default is True
         """
         return self._arm.run_blockly_app(path, **kwargs)
 
     def run_gcode_file(self, path, **kwargs):
         """
         Run the gcode file
+        Note:
+            1. the file is compiled once (see compile_gcode_file) and the compiled program is reused until the file is modified
+            2. the consecutive linear motions (G1/G9) are sent in batches without waiting for the response of each line,
+                as long as the command cache of the controller has space (the firmware before 1.11.100 or
+                only_check_type > 0 still sends them line by line)
+
         :param path: gcode file path
+        :param kwargs: reserved parameters
+            times: the number of times to run the file, default is 1
+            init: clean the error/warn, enable the motion and set the mode/state before running, default is False
+            mode: the mode to set if init is True, default is 0
+            state: the state to set if init is True, default is 0
+            wait_seconds: the seconds to wait before running, default is 0
+            lookahead: the maximum number of commands queued in the controller while running,
+                the motions are sent ahead until the cache reaches it, default is None (max_cmdnum minus window)
+            window: the maximum number of the linear motion requests in flight, default is 8
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
         """
         return self._arm.run_gcode_file(path, **kwargs)
 
+    def compile_gcode_file(self, path):
+        """
+        Parse the gcode file into the instruction list used by run_gcode_file,
+        the result is cached by the file path until the modification time or size of the file changes
+
+        :param path: gcode file path
+        :return: (code, program)
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            program: list of (op, args, line), op is the number of the G command (see xarm.x3.parse),
+                or 0 if the line is executed as raw command by send_cmd_sync
+        """
+        return self._arm.compile_gcode_file(path)
+
     def get_gripper_version(self):
         """
         Get gripper version, only for debug
@@ -2368,6 +2723,36 @@ class XArmAPI(object):
         """
         return self._arm.get_harmonic_type(servo_id=servo_id)
 
+    def get_servo_addrs(self, items, window=8):
+        """
+        Read multiple servo registers in one call, only for debug
+        Note: the protocol reads one register per request, up to `window` requests are in flight at the same time
+            (only for the socket connection), instead of one round trip for each register
+
+        :param items: [(servo_id, addr, width), ...] or [(servo_id, addr), ...], width is 16(default) or 32
+        :param window: the maximum number of requests in flight, default is 8
+        :return: (code, rets)
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+                the last non-zero code of the items, 0 if all succeed
+            rets: [[code, value], ...], in the order of items
+        """
+        return self._arm.get_servo_addrs(items, window=window)
+
+    def get_servo_addr_table(self, servo_ids, addrs, width=16, default=None, window=8):
+        """
+        Read the same registers of multiple servos in one call, only for debug
+
+        :param servo_ids: [servo_id, ...]
+        :param addrs: [addr, ...]
+        :param width: 16 or 32, default is 16
+        :param default: the value of the failed item, default is None (keep the value of the failed read)
+        :param window: the maximum number of requests in flight, default is 8
+        :return: (code, table)
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            table: [[value of addrs[0], value of addrs[1], ...] of servo_ids[0], ...]
+        """
+        return self._arm.get_servo_addr_table(servo_ids, addrs, width=width, default=default, window=window)
+
     def get_hd_types(self):
         """
         Get harmonic types, only for debug
@@ -2664,8 +3049,15 @@ class XArmAPI(object):
         :param force: gripper force between 0 and 255
         :param wait: whether to wait for the robotion motion complete, default is True
         :param timeout: maximum waiting time(unit: second), default is 5, only available if wait=True
+        :param kwargs: 
+            return_future: only valid if wait is False, return a future instead of the code, default is False
+                the completion is polled by the end effector poller shared by all the end effectors
+                future.done: whether the motion is finished
+                future.wait(timeout=None): wait for the motion to finish, return code
+                future.add_done_callback(callback): callback(future) is called when the motion is finished
+                future.code: the code of the motion
         
-        :return: tuple((code, robotiq_response))
+        :return: tuple((code, robotiq_response)), code is a future if return_future is True
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
             robotiq_response: See the robotiq documentation 
         """
@@ -2679,8 +3071,9 @@ class XArmAPI(object):
         :param force: gripper force between 0 and 255
         :param wait: whether to wait for the robotiq motion to complete, default is True
         :param timeout: maximum waiting time(unit: second), default is 5, only available if wait=True
+        :param kwargs: return_future, see robotiq_set_position
         
-        :return: tuple((code, robotiq_response))
+        :return: tuple((code, robotiq_response)), code is a future if return_future is True
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
             robotiq_response: See the robotiq documentation 
         """
@@ -2694,8 +3087,9 @@ class XArmAPI(object):
         :param force: gripper force between 0 and 255
         :param wait: whether to wait for the robotiq motion to complete, default is True
         :param timeout: maximum waiting time(unit: second), default is 3, only available if wait=True
+        :param kwargs: return_future, see robotiq_set_position
         
-        :return: tuple((code, robotiq_response))
+        :return: tuple((code, robotiq_response)), code is a future if return_future is True
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
             robotiq_response: See the robotiq documentation
         """
@@ -2776,8 +3170,15 @@ class XArmAPI(object):
         :param speed: speed value, default is 0 (not set the speed)
         :param wait: whether to wait for the bio gripper motion complete, default is True
         :param timeout: maximum waiting time(unit: second), default is 5, only available if wait=True
+        :param kwargs: 
+            return_future: only valid if wait is False, return a future instead of the code, default is False
+                the completion is polled by the end effector poller shared by all the end effectors
+                future.done: whether the motion is finished
+                future.wait(timeout=None): wait for the motion to finish, return code
+                future.add_done_callback(callback): callback(future) is called when the motion is finished
+                future.code: the code of the motion
         
-        :return: code
+        :return: code (or future if return_future is True)
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
         """
         return self._arm.open_bio_gripper(speed=speed, wait=wait, timeout=timeout, **kwargs)
@@ -2789,8 +3190,9 @@ class XArmAPI(object):
         :param speed: speed value, default is 0 (not set the speed)
         :param wait: whether to wait for the bio gripper motion complete, default is True
         :param timeout: maximum waiting time(unit: second), default is 5, only available if wait=True
+        :param kwargs: return_future, see open_bio_gripper
         
-        :return: code
+        :return: code (or future if return_future is True)
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
         """
         return self._arm.close_bio_gripper(speed=speed, wait=wait, timeout=timeout, **kwargs)
@@ -2949,6 +3351,121 @@ class XArmAPI(object):
         """
         return self._arm.set_collision_tool_model(tool_type, *args, **kwargs)
 
+    def set_tool_bus_config(self, coalesce_window=None, route_low_to_503=None):
+        """
+        Config the scheduler of the end RS-485 (tool Modbus) transactions
+        Note:
+            1. all the transactions of tgpio_set_modbus (gripper/robotiq/bio gripper/linear track/getset_tgpio_modbus_data)
+                are granted the bus one by one by priority: high (writes), normal (reads), low (reads of the linear track),
+                the transactions with the same priority are granted by deadline and then in order
+            2. the same reads (not transparent transmission) in progress or completed in coalesce_window share the result,
+                a write to the same slave discards the completed reads of the slave
+
+        :param coalesce_window: the window to share a completed read (unit: second), 0 means only the reads in progress,
+            default is None (not change, initial value is 0.01)
+        :param route_low_to_503: send the low priority transparent transmission transactions (e.g. issued in
+            tool_bus_priority('low')) over the 503 port (connected if not), the other transactions always use the
+            main port, default is None (not change, initial value is False)
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.set_tool_bus_config(coalesce_window=coalesce_window, route_low_to_503=route_low_to_503)
+
+    def get_tool_bus_stats(self):
+        """
+        Get the statistics of the end RS-485 (tool Modbus) scheduler
+
+        :return: tuple((code, stats))
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            stats: {'requests', 'max_wait', 'coalesced', 'expired', 'routed', 'waiting'}
+                requests/max_wait: {'high', 'normal', 'low'}, the number of transactions sent and the maximum time
+                    waited for the bus (unit: second) of each priority
+                coalesced: the number of reads answered by a shared result
+                expired: the number of transactions dropped because the deadline passed before the bus was granted
+                routed: the number of low priority transparent transmission transactions sent over the 503 port
+                waiting: the number of transactions waiting for the bus
+        """
+        return self._arm.get_tool_bus_stats()
+
+    def tool_bus_priority(self, priority=None, timeout=None):
+        """
+        Set the priority/deadline of the end RS-485 (tool Modbus) transactions issued by the current thread in a with block
+        Example:
+            with arm.tool_bus_priority('high', timeout=0.05):
+                arm.get_gripper_position()
+
+        :param priority: 'high'/'normal'/'low' (or 0/1/2), default is None (by the type of the transaction)
+        :param timeout: the transaction must be granted the bus in timeout seconds, otherwise it is not sent and
+            fails with the timeout code (3), default is None (no deadline)
+        :return: context manager
+        """
+        return self._arm.tool_bus_priority(priority=priority, timeout=timeout)
+
+    def set_metrics_enable(self, enable):
+        """
+        Enable/disable collecting the metrics (the histograms and the counters), the queue depths are always available
+        Note:
+            1. The constructor parameter enable_metrics sets the initial value, default is False
+
+        :param enable: True/False
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.set_metrics_enable(enable)
+
+    def get_metrics(self, fmt='dict'):
+        """
+        Get the snapshot of the metrics
+
+        :param fmt: 'dict', 'json' or 'prometheus' (the Prometheus text format), default is 'dict'
+        :return: tuple((code, metrics))
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            metrics: {'enabled', 'time', 'histograms', 'counters', 'gauges'}
+                histograms: {name: {label: {'count', 'sum', 'min', 'max', 'mean', 'p50', 'p90', 'p99', 'buckets'}}}
+                    cmd_rtt_seconds: the round-trip time of the commands on the socket connection, label is the funcode
+                    report_interval_seconds: the interval between the report frames, label is the report type
+                    report_decode_seconds: the time to decode a report frame, label is the report type
+                    Note: the quantiles are estimated by the upper bound of the buckets
+                counters: {name: {label: count}}
+                    cmd_timeouts_total: the number of the commands without response, label is the funcode
+                gauges: {name: {label: value}}
+                    rx_queue_depth/feedback_queue_depth/cmd_cache_depth/pipeline_pending/report_dropped_frames/
+                    report_max_interval_seconds/feedback_registry/tool_bus/kinematics_cache
+        """
+        return self._arm.get_metrics(fmt=fmt)
+
+    def reset_metrics(self):
+        """
+        Clear the histograms and the counters of the metrics
+
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.reset_metrics()
+
+    def start_metrics_server(self, port=9120, host='127.0.0.1'):
+        """
+        Start a HTTP server to export the metrics
+            http://host:port/metrics: the Prometheus text format
+            http://host:port/metrics.json: the JSON format
+
+        :param port: the port of the server, default is 9120
+        :param host: the host of the server, default is '127.0.0.1' (only local), use '0.0.0.0' to export to the network
+        :return: tuple((code, address))
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            address: (host, port) the server listening on
+        """
+        return self._arm.start_metrics_server(port=port, host=host)
+
+    def stop_metrics_server(self):
+        """
+        Stop the HTTP server of the metrics
+
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.stop_metrics_server()
+
     def set_simulation_robot(self, on_off):
         """
         Set the simulation robot
@@ -3254,6 +3771,35 @@ class XArmAPI(object):
         """
         return self._arm.get_ft_sensor_data()
 
+    def ft_stream(self, capacity=2500, source='ext', filters=None):
+        """
+        Create a stream that keeps the timestamped samples of the Six-axis Force Torque Sensor from the report data
+        Note:
+            1. the rich report is required (enable_report is True and report_type is 'rich'), the sensor must be enabled
+            2. every report is kept in the ring buffer, the transients between two reads of self.ft_ext_force are not lost
+            3. the filters and the threshold callbacks are run in the report thread, keep them fast
+            4. call stream.close() when no longer used
+
+        :param capacity: the number of samples in the ring buffer, default is 2500 (10 seconds at 250Hz)
+        :param source: 'ext'(self.ft_ext_force) or 'raw'(self.ft_raw_force), default is 'ext'
+        :param filters: list of online filters applied in order, default is None
+            from xarm.x3.ft_stream import MovingAverageFilter, LowPassFilter, MedianFilter
+            MovingAverageFilter(n): moving average of the last n samples
+            LowPassFilter(cutoff): first order IIR low-pass filter, cutoff frequency in Hz
+            MedianFilter(n): median of the last n samples
+        :return: FtStream object
+            stream.latest(filtered=True): (timestamp, [fx, fy, fz, tx, ty, tz])
+            stream.samples(n=None, window=None, filtered=True): (timestamps, values) of the last n samples or window seconds
+            stream.stats(n=None, window=None, filtered=True): {'count', 'min', 'max', 'mean', 'rms', 'peak_force', 'peak_torque'}
+            stream.add_threshold(axis, threshold, callback, direction='above', hysteresis=0, filtered=True): handle
+                axis: 0~5, 'fx'/'fy'/'fz'/'tx'/'ty'/'tz' or 'force'/'torque'(the magnitude)
+                callback: callback(axis, value, timestamp), called when the value crosses the threshold
+            stream.remove_threshold(handle=None)
+            stream.wait_threshold(axis, threshold, direction='above', timeout=None, filtered=True): (crossed, value, timestamp)
+            stream.close()
+        """
+        return self._arm.ft_stream(capacity=capacity, source=source, filters=filters)
+
     def get_ft_sensor_config(self):
         """
         Get the config of the Six-axis Force Torque Sensor
@@ -3498,11 +4044,65 @@ class XArmAPI(object):
         :param speed: speed of the linear track. Integer between 1 and 1000mm/s. default is not set
         :param wait: wait to motion finish or not, default is True
         :param timeout: wait timeout, seconds, default is 100s.
-        :return: code
+        :param kwargs: 
+            return_future: only valid if wait is False, return a LinearTrackFuture instead of the code, default is False
+                the linear track monitor is started if not running (see self.start_linear_track_monitor)
+                future.done: whether the motion is finished
+                future.wait(timeout=None): wait for the motion to finish, return code
+                future.add_done_callback(callback): callback(future) is called when the motion is finished
+                future.code: the code of the motion
+        :return: code (or LinearTrackFuture if return_future is True)
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
         """
         return self._arm.set_linear_track_pos(pos, speed=speed, wait=wait, timeout=timeout, **kwargs)
 
+    def start_linear_track_monitor(self, fast_interval=0.02, slow_interval=0.2):
+        """
+        Start polling the status of the linear track in a background thread
+        Note:
+            1. only available if firmware_version >= 1.8.0
+            2. 8 registers (pos/status/error/is_enabled/on_zero/sci/sco) are read in one request
+            3. when the monitor is running, the waits of the linear track (set_linear_track_pos/set_linear_track_back_origin)
+                are notified by the monitor instead of polling in the calling thread
+
+        :param fast_interval: polling interval when the track is moving or waited (unit: second), default is 0.02
+        :param slow_interval: polling interval when the track is idle (unit: second), default is 0.2
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.start_linear_track_monitor(fast_interval=fast_interval, slow_interval=slow_interval)
+
+    def stop_linear_track_monitor(self):
+        """
+        Stop the linear track monitor, the pending futures are finished with APIState.NOT_CONNECTED
+
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.stop_linear_track_monitor()
+
+    def get_linear_track_cache(self):
+        """
+        Get the latest status of the linear track published by the monitor (no request is sent)
+
+        :return: tuple((code, status)), code is APIState.NOT_READY if the monitor is not running or no status yet
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            status: {'pos', 'status', 'error', 'is_enabled', 'on_zero', 'sci', 'sco', 'timestamp', 'seq'}
+                timestamp: time.monotonic() of the read
+        """
+        return self._arm.get_linear_track_cache()
+
+    def wait_linear_track(self, predicate, timeout=None):
+        """
+        Wait until predicate(status) is True, the status is published by the monitor
+
+        :param predicate: predicate(status), status is the same as the return of get_linear_track_cache
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.wait_linear_track(predicate, timeout=timeout)
+
     def set_linear_track_stop(self):
         """
         Set the linear track to stop
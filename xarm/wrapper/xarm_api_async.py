@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import math
+import asyncio
+from ..core.config.x_config import XCONF
+from ..core.utils import convert
+from ..core.utils.log import logger
+from ..core.utils.report_layout import get_report_layout
+from ..core.wrapper.uxbus_cmd_async import AsyncUxbusCmdTcp
+from ..x3.code import APIState
+from ..x3.utils import to_radian
+
+
+class AsyncXArmAPI(object):
+    """
+    asyncio版本的xArm接口, 控制端口(502)和上报端口(30001/30002/30003)都基于asyncio.open_connection
+    所有命令都是协程, 可以在同一个事件循环中并发await, 回复按事务ID分发
+
+    Example:
+        async with AsyncXArmAPI('192.168.1.185') as arm:
+            await arm.motion_enable(True)
+            await arm.set_mode(0)
+            await arm.set_state(0)
+            await arm.set_position(300, 0, 300, 180, 0, 0, speed=100, wait=True)
+
+    Note: only the common motion/state interfaces are provided here,
+        other commands can be awaited through arm.arm_cmd (AsyncUxbusCmdTcp) if they are built on the basic read/write interfaces
+    """
+    def __init__(self, port=None, is_radian=False, enable_report=True, report_type='rich', timeout=None):
+        """
+        :param port: ip-address
+        :param is_radian: set the default unit is radians or not, default is False
+        :param enable_report: whether to connect the report port, default is True
+            Note: wait_move/state/position/angles... depend on the report data
+        :param report_type: 'normal'/'rich'/'real', default is 'rich'
+        :param timeout: the timeout of the commands (unit: second), default is None (use the default of UxbusCmd)
+        """
+        self._port = port
+        self._default_is_radian = is_radian
+        self._enable_report = enable_report
+        self._report_type = report_type
+        self._timeout = timeout
+        self.arm_cmd = None
+        self._report_reader = None
+        self._report_writer = None
+        self._report_task = None
+        self._report_event = None
+
+        self._state = 4
+        self._mode = 0
+        self._cmd_num = 0
+        self._error_code = 0
+        self._warn_code = 0
+        self._angles = [0] * 7
+        self._position = [201.5, 0, 140.5, 3.1415926, 0, 0]
+
+        self._last_tcp_speed = 100  # mm/s, rad/s
+        self._last_tcp_acc = 2000  # mm/s^2, rad/s^2
+        self._last_joint_speed = 0.3490658503988659  # 20 °/s
+        self._last_joint_acc = 8.726646259971648  # 500 °/s^2
+        self._mvtime = 0
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+
+    @property
+    def connected(self):
+        return self.arm_cmd is not None and self.arm_cmd.connected
+
+    @property
+    def reported(self):
+        return self._report_task is not None and not self._report_task.done()
+
+    @property
+    def default_is_radian(self):
+        return self._default_is_radian
+
+    @property
+    def state(self):
+        """xArm state (from the report data)"""
+        return self._state
+
+    @property
+    def mode(self):
+        """xArm mode (from the report data)"""
+        return self._mode
+
+    @property
+    def cmd_num(self):
+        """Number of command caches in the controller (from the report data)"""
+        return self._cmd_num
+
+    @property
+    def error_code(self):
+        return self._error_code
+
+    @property
+    def warn_code(self):
+        return self._warn_code
+
+    @property
+    def angles(self):
+        """Servo angles (from the report data), the unit depends on the is_radian of the constructor"""
+        return self._angles if self._default_is_radian else [math.degrees(angle) for angle in self._angles]
+
+    @property
+    def position(self):
+        """Cartesion position (from the report data), the unit of the roll/pitch/yaw depends on the is_radian of the constructor"""
+        return self._position if self._default_is_radian else \
+            self._position[:3] + [math.degrees(val) for val in self._position[3:]]
+
+    async def connect(self, port=None):
+        """
+        Connect to xArm
+
+        :param port: ip-address, default is the port value of the constructor
+        """
+        if self.connected:
+            return
+        self._port = port if port is not None else self._port
+        if self._port is None:
+            raise Exception('can not connect to port/ip {}'.format(self._port))
+        reader, writer = await asyncio.open_connection(self._port, XCONF.SocketConf.TCP_CONTROL_PORT)
+        self.arm_cmd = AsyncUxbusCmdTcp(reader, writer)
+        if self._timeout is not None:
+            self.arm_cmd.set_timeout(self._timeout)
+        self.arm_cmd.start()
+        self._report_event = asyncio.Event()
+        if self._enable_report:
+            if self._report_type == 'real':
+                report_port = XCONF.SocketConf.TCP_REPORT_REAL_PORT
+            elif self._report_type == 'normal':
+                report_port = XCONF.SocketConf.TCP_REPORT_NORM_PORT
+            else:
+                report_port = XCONF.SocketConf.TCP_REPORT_RICH_PORT
+            self._report_reader, self._report_writer = await asyncio.open_connection(self._port, report_port)
+            self._report_task = asyncio.ensure_future(self._report_loop())
+        logger.info('async connect {} success'.format(self._port))
+
+    async def disconnect(self):
+        """
+        Disconnect
+        """
+        if self._report_task is not None:
+            self._report_task.cancel()
+            try:
+                await self._report_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._report_task = None
+        if self._report_writer is not None:
+            try:
+                self._report_writer.close()
+                await self._report_writer.wait_closed()
+            except Exception:
+                pass
+            self._report_writer = None
+        if self.arm_cmd is not None:
+            await self.arm_cmd.close()
+
+    async def _read_report_frames(self):
+        reader = self._report_reader
+        pending = b''
+        size_is_not_confirm = True
+        while True:
+            header = pending if pending else await reader.readexactly(4)
+            pending = b''
+            size = convert.bytes_to_u32(header)
+            if size == 233 and size_is_not_confirm:
+                # 部分固件的rich上报头部长度为233, 实际长度为245, 读到下一帧的头部才能确定
+                data = header + await reader.readexactly(233)
+                size_is_not_confirm = False
+                if convert.bytes_to_u32(data[233:237]) == 233:
+                    pending = data[233:237]
+                    yield data[:233]
+                    continue
+                size = 245
+                data += await reader.readexactly(size - len(data))
+            else:
+                data = header + await reader.readexactly(size - 4)
+            size_is_not_confirm = False
+            yield data
+
+    async def _report_loop(self):
+        report_type = self._report_type if self._report_type in ('real', 'normal') else 'rich'
+        try:
+            async for rx_data in self._read_report_frames():
+                layout = get_report_layout(report_type, len(rx_data))
+                if not layout.is_complete:
+                    logger.warning('async report is too short, data_len={}'.format(len(rx_data)))
+                    continue
+                values = layout.unpack(rx_data)
+                state_mode = values[layout.state_mode]
+                self._state = state_mode & 0x0F
+                self._mode = state_mode >> 4
+                self._cmd_num = values[layout.cmd_num]
+                self._angles = list(values[layout.angles])
+                self._position = list(values[layout.pose])
+                if layout.mtbrake_mtable_err_warn is not None:
+                    self._error_code, self._warn_code = values[layout.mtbrake_mtable_err_warn][2:4]
+                self._notify_report()
+        except asyncio.CancelledError:
+            pass
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            logger.error('async report connection closed: {}'.format(e))
+        finally:
+            self._notify_report()
+
+    def _notify_report(self):
+        event = self._report_event
+        self._report_event = asyncio.Event()
+        event.set()
+
+    async def _wait_report(self, timeout):
+        """wait for the next report frame, return False if timeout or the report is disconnected"""
+        if not self.reported:
+            await asyncio.sleep(timeout)
+            return False
+        try:
+            await asyncio.wait_for(self._report_event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _check_code(self, code, is_move_cmd=False):
+        if is_move_cmd:
+            if code in [0, XCONF.UxbusState.WAR_CODE]:
+                return 0 if self.arm_cmd.state_is_ready else XCONF.UxbusState.STATE_NOT_READY
+            return code
+        return 0 if code in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE, XCONF.UxbusState.STATE_NOT_READY] else code
+
+    async def get_version(self):
+        """
+        Get the xArm firmware version
+
+        :return: tuple((code, version)), only when code is 0, the returned result is correct.
+        """
+        ret = await self.arm_cmd.get_version()
+        ret[0] = self._check_code(ret[0])
+        if ret[0] != 0:
+            return ret[0], None
+        version = ''.join(map(chr, ret[1:])).rstrip('\x00')
+        return 0, version
+
+    async def get_state(self):
+        """
+        Get state
+
+        :return: tuple((code, state)), only when code is 0, the returned result is correct.
+        """
+        ret = await self.arm_cmd.get_state()
+        ret[0] = self._check_code(ret[0])
+        if ret[0] == 0:
+            self._state = ret[1]
+        return ret[0], self._state
+
+    async def set_state(self, state=0):
+        """
+        Set the xArm state
+
+        :param state: default is 0
+            0: sport state
+            3: pause state
+            4: stop state
+        :return: code
+        """
+        ret = await self.arm_cmd.set_state(state)
+        return self._check_code(ret[0])
+
+    async def set_mode(self, mode=0):
+        """
+        Set the xArm mode
+
+        :param mode: default is 0
+            0: position control mode
+            1: servo motion mode
+            2: joint teaching mode
+            4: joint velocity control mode
+            5: cartesian velocity control mode
+        :return: code
+        """
+        ret = await self.arm_cmd.set_mode(mode)
+        return self._check_code(ret[0])
+
+    async def motion_enable(self, enable=True, servo_id=None):
+        """
+        Motion enable
+
+        :param enable: True/False
+        :param servo_id: 1-(Number of axes), None(8)
+        :return: code
+        """
+        ret = await self.arm_cmd.motion_en(8 if servo_id is None else servo_id, int(enable))
+        return self._check_code(ret[0])
+
+    async def get_err_warn_code(self):
+        """
+        Get the controller error and warn code
+
+        :return: tuple((code, [error_code, warn_code])), only when code is 0, the returned result is correct.
+        """
+        ret = await self.arm_cmd.get_err_code()
+        ret[0] = self._check_code(ret[0])
+        if ret[0] == 0:
+            self._error_code, self._warn_code = ret[1:3]
+        return ret[0], [self._error_code, self._warn_code]
+
+    async def clean_error(self):
+        """
+        Clean the error, need to be manually enabled motion(arm.motion_enable(True)) and set state(arm.set_state(state=0))after clean error
+
+        :return: code
+        """
+        ret = await self.arm_cmd.clean_err()
+        return self._check_code(ret[0])
+
+    async def clean_warn(self):
+        """
+        Clean the warn
+
+        :return: code
+        """
+        ret = await self.arm_cmd.clean_war()
+        return self._check_code(ret[0])
+
+    async def get_cmdnum(self):
+        """
+        Get the cmd count in cache
+
+        :return: tuple((code, cmd num)), only when code is 0, the returned result is correct.
+        """
+        ret = await self.arm_cmd.get_cmdnum()
+        ret[0] = self._check_code(ret[0])
+        if ret[0] == 0:
+            self._cmd_num = ret[1]
+        return ret[0], self._cmd_num
+
+    async def get_position(self, is_radian=None):
+        """
+        Get the cartesian position
+
+        :param is_radian: the returned value (only roll/pitch/yaw) is in radians or not, default is self.default_is_radian
+        :return: tuple((code, [x, y, z, roll, pitch, yaw])), only when code is 0, the returned result is correct.
+        """
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        ret = await self.arm_cmd.get_tcp_pose()
+        ret[0] = self._check_code(ret[0])
+        if ret[0] == 0:
+            self._position = [float('{:.6f}'.format(val)) for val in ret[1:7]]
+        return ret[0], self._position if is_radian else self._position[:3] + [math.degrees(val) for val in self._position[3:]]
+
+    async def get_servo_angle(self, is_radian=None):
+        """
+        Get the servo angle
+
+        :param is_radian: the returned value is in radians or not, default is self.default_is_radian
+        :return: tuple((code, [angle1, angle2, ..., angle7])), only when code is 0, the returned result is correct.
+        """
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        ret = await self.arm_cmd.get_joint_pos()
+        ret[0] = self._check_code(ret[0])
+        if ret[0] == 0:
+            self._angles = [float('{:.6f}'.format(val)) for val in ret[1:8]]
+        return ret[0], self._angles if is_radian else [math.degrees(angle) for angle in self._angles]
+
+    async def set_position(self, x=None, y=None, z=None, roll=None, pitch=None, yaw=None, radius=None,
+                           speed=None, mvacc=None, mvtime=None, is_radian=None, wait=False, timeout=None):
+        """
+        Set the cartesian position, the API will modify self._last_tcp_speed/self._last_tcp_acc
+
+        :param x/y/z: (mm), None means the current reported value
+        :param roll/pitch/yaw: (° or rad), None means the current reported value
+        :param radius: move radius, if radius is None or radius less than 0, will MoveLine, else MoveArcLine
+        :param speed: move speed (mm/s), default is self._last_tcp_speed
+        :param mvacc: move acceleration (mm/s^2), default is self._last_tcp_acc
+        :param mvtime: 0, reserved
+        :param is_radian: the roll/pitch/yaw in radians or not, default is self.default_is_radian
+        :param wait: whether to wait for the arm to complete, default is False
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout), only valid if wait is True
+        :return: code
+        """
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        values = [x, y, z, roll, pitch, yaw]
+        pose = [self._position[i] if values[i] is None else to_radian(values[i], is_radian or i <= 2) for i in range(6)]
+        if speed is not None:
+            self._last_tcp_speed = speed
+        if mvacc is not None:
+            self._last_tcp_acc = mvacc
+        mvtime = self._mvtime if mvtime is None else mvtime
+        if radius is not None and radius >= 0:
+            ret = await self.arm_cmd.move_lineb(pose, self._last_tcp_speed, self._last_tcp_acc, mvtime, radius)
+        else:
+            ret = await self.arm_cmd.move_line(pose, self._last_tcp_speed, self._last_tcp_acc, mvtime)
+        ret[0] = self._check_code(ret[0], is_move_cmd=True)
+        if wait and ret[0] == 0:
+            return await self.wait_move(timeout)
+        return ret[0]
+
+    async def set_servo_angle(self, angle=None, speed=None, mvacc=None, mvtime=None, is_radian=None,
+                              wait=False, timeout=None, radius=None):
+        """
+        Set the servo angle, the API will modify self._last_joint_speed/self._last_joint_acc
+
+        :param angle: angle list, (unit: rad if is_radian is True else °)
+        :param speed: move speed (unit: rad/s if is_radian is True else °/s), default is self._last_joint_speed
+        :param mvacc: move acceleration (unit: rad/s^2 if is_radian is True else °/s^2), default is self._last_joint_acc
+        :param mvtime: 0, reserved
+        :param is_radian: the angle in radians or not, default is self.default_is_radian
+        :param wait: whether to wait for the arm to complete, default is False
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout), only valid if wait is True
+        :param radius: move radius, if radius is None or radius less than 0, will MoveJoint, else MoveArcJoint
+        :return: code
+        """
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        angles = [to_radian(val, is_radian) for val in angle]
+        while len(angles) < 7:
+            angles.append(0)
+        if speed is not None:
+            self._last_joint_speed = to_radian(speed, is_radian)
+        if mvacc is not None:
+            self._last_joint_acc = to_radian(mvacc, is_radian)
+        mvtime = self._mvtime if mvtime is None else mvtime
+        if radius is not None and radius >= 0:
+            ret = await self.arm_cmd.move_jointb(angles, self._last_joint_speed, self._last_joint_acc, radius)
+        else:
+            ret = await self.arm_cmd.move_joint(angles, self._last_joint_speed, self._last_joint_acc, mvtime)
+        ret[0] = self._check_code(ret[0], is_move_cmd=True)
+        if wait and ret[0] == 0:
+            return await self.wait_move(timeout)
+        return ret[0]
+
+    async def set_servo_angle_j(self, angles, speed=None, mvacc=None, mvtime=None, is_radian=None):
+        """
+        Set the servo angle, execute only the last instruction, need to be set to servo motion mode(self.set_mode(1))
+
+        :param angles: angle list, (unit: rad if is_radian is True else °)
+        :param speed: speed, reserved
+        :param mvacc: acceleration, reserved
+        :param mvtime: 0, reserved
+        :param is_radian: the angles in radians or not, default is self.default_is_radian
+        :return: code
+        """
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        angles = [to_radian(val, is_radian) for val in angles]
+        while len(angles) < 7:
+            angles.append(0)
+        ret = await self.arm_cmd.move_servoj(angles, speed or 0, mvacc or 0, mvtime or 0)
+        return self._check_code(ret[0], is_move_cmd=True)
+
+    async def set_servo_cartesian(self, mvpose, speed=None, mvacc=None, mvtime=0, is_radian=None, is_tool_coord=False):
+        """
+        Set the servo cartesian, execute only the last instruction, need to be set to servo motion mode(self.set_mode(1))
+
+        :param mvpose: cartesian position, [x(mm), y(mm), z(mm), roll(rad or °), pitch(rad or °), yaw(rad or °)]
+        :param speed: move speed, reserved
+        :param mvacc: move acceleration, reserved
+        :param mvtime: 0, reserved
+        :param is_radian: the roll/pitch/yaw of mvpose in radians or not, default is self.default_is_radian
+        :param is_tool_coord: is tool coordinate or not
+        :return: code
+        """
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        pose = [to_radian(mvpose[i], is_radian or i <= 2) for i in range(6)]
+        ret = await self.arm_cmd.move_servo_cartesian(pose, speed or 0, mvacc or 0, int(is_tool_coord))
+        return self._check_code(ret[0], is_move_cmd=True)
+
+    async def move_gohome(self, speed=None, mvacc=None, mvtime=None, is_radian=None, wait=False, timeout=None):
+        """
+        Move to go home (Back to zero)
+
+        :param speed: gohome speed (unit: rad/s if is_radian is True else °/s), default is 50 °/s
+        :param mvacc: gohome acceleration (unit: rad/s^2 if is_radian is True else °/s^2), default is 5000 °/s^2
+        :param mvtime: reserved
+        :param is_radian: the speed and acceleration are in radians or not, default is self.default_is_radian
+        :param wait: whether to wait for the arm to complete, default is False
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout), only valid if wait is True
+        :return: code
+        """
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        speed = 0.8726646259971648 if speed is None else to_radian(speed, is_radian)  # 50 °/s
+        mvacc = 87.26646259971648 if mvacc is None else to_radian(mvacc, is_radian)  # 5000 °/s^2
+        ret = await self.arm_cmd.move_gohome(speed, mvacc, self._mvtime if mvtime is None else mvtime)
+        ret[0] = self._check_code(ret[0], is_move_cmd=True)
+        if wait and ret[0] == 0:
+            return await self.wait_move(timeout)
+        return ret[0]
+
+    async def set_pause_time(self, sltime, wait=False):
+        """
+        Set the arm pause time, xArm will pause sltime second
+
+        :param sltime: sleep time (unit: second)
+        :param wait: wait or not, default is False
+        :return: code
+        """
+        ret = await self.arm_cmd.sleep_instruction(sltime)
+        if wait:
+            await asyncio.sleep(sltime)
+        return self._check_code(ret[0])
+
+    async def emergency_stop(self):
+        """
+        Emergency stop (set_state(4) until the state is 4)
+        """
+        await self.set_state(4)
+        loop = asyncio.get_running_loop()
+        expired = loop.time() + 3
+        while self._state != 4 and loop.time() < expired:
+            await self._wait_report(0.1)
+            if self._state != 4:
+                await self.set_state(4)
+
+    async def wait_move(self, timeout=None):
+        """
+        Wait for the arm to complete the motion (driven by the report data, polls get_state if the report is not connected)
+
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :return: code
+        """
+        loop = asyncio.get_running_loop()
+        expired = None if timeout is None else loop.time() + timeout
+        # 状态连续max_cnt个周期(50ms)不是运动中才认为运动完成, 与同步接口的wait_move一致
+        stop_time = 0
+        state5_time = 0
+        max_cnt = 2 if self._state == 1 else 10
+        while expired is None or loop.time() < expired:
+            if not self.connected:
+                return APIState.NOT_CONNECTED
+            if self._error_code != 0:
+                return APIState.HAS_ERROR
+            if self._mode != 0 and self._mode != 11:
+                return 0
+            if not self.reported:
+                code, _ = await self.get_state()
+                if code != 0:
+                    return code
+            state = self._state
+            now = loop.time()
+            if state >= 4:
+                if state == 5 and state5_time == 0:
+                    state5_time = now
+                if state != 5 or now - state5_time >= 1:
+                    return APIState.EMERGENCY_STOP
+            else:
+                state5_time = 0
+            if state in (0, 1, 3):
+                stop_time = 0
+                max_cnt = 2
+            else:
+                if stop_time == 0:
+                    stop_time = now
+                if now - stop_time >= (max_cnt - 1) * 0.05:
+                    return 0
+            await self._wait_report(0.05)
+        return APIState.WAIT_FINISH_TIMEOUT
@@ -1,2 +1,22 @@
-from .xarm import XArm
-from .studio import Studio
+import sys
+
+# PEP 562: 只在第一次访问时导入, 导入xarm.x3的子模块(code/utils等)不再加载所有的mixin
+_LAZY_ATTRS = {
+    'XArm': '.xarm',
+    'Studio': '.studio',
+}
+
+if sys.version_info < (3, 7):
+    from .xarm import XArm
+    from .studio import Studio
+else:
+    def __getattr__(name):
+        if name not in _LAZY_ATTRS:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+        import importlib
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY_ATTRS))
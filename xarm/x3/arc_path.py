@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+move_arc_lines路径预处理
+1. 去掉与前一个保留点几乎重合的点(位置和姿态都在容差内)
+2. 去掉共线的中间点(Ramer-Douglas-Peucker): 被去掉的每个点到保留的前后两点连线的距离都在容差内,
+   且姿态与线性插值的姿态在容差内, 误差不会累积
+3. 没有指定过渡半径的点按相邻两段的长度和转角自动计算过渡半径, 相邻两个过渡区不重叠, 且拐角处的偏差不超过max_deviation
+位姿的单位是mm和rad
+"""
+
+import math
+
+
+def _distance(a, b):
+    return math.sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2)
+
+
+def _angle_diff(a, b):
+    return abs(math.atan2(math.sin(a - b), math.cos(a - b)))
+
+
+def _orientation_diff(a, b):
+    return max(_angle_diff(a[i], b[i]) for i in range(3, 6))
+
+
+def _lerp_angle(a, b, t):
+    return a + math.atan2(math.sin(b - a), math.cos(b - a)) * t
+
+
+def _segment_error(a, b, c):
+    """
+    b相对线段a->c的误差
+    :return: (distance to the segment (unit: mm), orientation difference to the interpolation (unit: rad))
+    """
+    ac = [c[i] - a[i] for i in range(3)]
+    ab = [b[i] - a[i] for i in range(3)]
+    length2 = ac[0] ** 2 + ac[1] ** 2 + ac[2] ** 2
+    t = (ab[0] * ac[0] + ab[1] * ac[1] + ab[2] * ac[2]) / length2 if length2 > 0 else 0
+    t = min(max(t, 0), 1)
+    foot = [a[i] + ac[i] * t for i in range(3)]
+    return _distance(b, foot), max(_angle_diff(b[i], _lerp_angle(a[i], c[i], t)) for i in range(3, 6))
+
+
+def _simplify(points, start, end, tolerance, angle_tolerance, keep):
+    # Ramer-Douglas-Peucker, 保留误差最大的点并继续分割, 直到区间内所有点都在容差内
+    stack = [(start, end)]
+    while stack:
+        first, last = stack.pop()
+        worst, worst_ratio = -1, 1
+        for i in range(first + 1, last):
+            dist, angle = _segment_error(points[first], points[i], points[last])
+            ratio = max(dist / tolerance if tolerance > 0 else (dist > 0) * 2,
+                        angle / angle_tolerance if angle_tolerance > 0 else (angle > 0) * 2)
+            if ratio > worst_ratio:
+                worst, worst_ratio = i, ratio
+        if worst > 0:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+
+
+def _corner_radius(prev, curr, nxt, ratio, max_radius, max_deviation):
+    len_in = _distance(prev, curr)
+    len_out = _distance(curr, nxt)
+    radius = ratio * min(len_in, len_out)
+    if max_deviation is not None and len_in > 0 and len_out > 0:
+        u = [(curr[i] - prev[i]) / len_in for i in range(3)]
+        v = [(nxt[i] - curr[i]) / len_out for i in range(3)]
+        cos_turn = max(min(u[0] * v[0] + u[1] * v[1] + u[2] * v[2], 1.0), -1.0)
+        # 两段的夹角为beta时, 在距拐点radius处开始的圆弧过渡离拐点的距离为radius * (1 - sin(beta/2)) / cos(beta/2)
+        half = (math.pi - math.acos(cos_turn)) / 2
+        factor = (1 - math.sin(half)) / max(math.cos(half), 1e-9)
+        if factor > 1e-9:
+            radius = min(radius, max_deviation / factor)
+    if max_radius is not None:
+        radius = min(radius, max_radius)
+    return radius
+
+
+def compact_arc_path(paths, min_distance=0.05, tolerance=0.01, angle_tolerance=0.001,
+                     auto_radius=True, radius_ratio=0.4, max_radius=None, max_deviation=0.5):
+    """
+    :param paths: [[x, y, z, roll, pitch, yaw(, radius)], ...], unit: mm, rad, radius < 0 or not given means auto
+    :param min_distance: the point closer than min_distance (unit: mm) to the previous kept point (and the orientation
+        within angle_tolerance) is dropped
+    :param tolerance: the maximum distance (unit: mm) from a dropped point to the line between the kept points around it
+    :param angle_tolerance: the orientation tolerance (unit: rad)
+    :param auto_radius: compute the blend radius of the points without radius
+    :param radius_ratio: the radius is at most radius_ratio of the shorter adjacent segment, not more than 0.5
+        (the blends of two adjacent corners do not overlap)
+    :param max_radius: the maximum radius (unit: mm), default is None (no limit)
+    :param max_deviation: the maximum distance from the corner to the blended path (unit: mm), None means no limit
+    :return: [[x, y, z, roll, pitch, yaw, radius], ...]
+    """
+    points = []
+    for index, path in enumerate(paths):
+        point = [float(v) for v in path[:6]]
+        radius = float(path[6]) if len(path) > 6 and path[6] is not None else -1
+        if points and _distance(points[-1], point) < min_distance \
+                and _orientation_diff(points[-1], point) <= angle_tolerance:
+            if index == len(paths) - 1 and len(points) > 1:
+                # 终点必须准确到达, 用终点代替与它重合的上一个点
+                points[-1] = point + [max(points[-1][6], radius)]
+            else:
+                # 重复点保留较大的过渡半径
+                points[-1][6] = max(points[-1][6], radius)
+            continue
+        points.append(point + [radius])
+
+    if len(points) > 2:
+        # 首尾点和指定了过渡半径的点按用户的意图保留, 分段简化
+        keep = [i == 0 or i == len(points) - 1 or point[6] >= 0 for i, point in enumerate(points)]
+        fixed = [i for i, k in enumerate(keep) if k]
+        for first, last in zip(fixed, fixed[1:]):
+            _simplify(points, first, last, tolerance, angle_tolerance, keep)
+        points = [point for i, point in enumerate(points) if keep[i]]
+
+    ratio = min(max(radius_ratio, 0), 0.5)
+    for i, point in enumerate(points):
+        if point[6] >= 0:
+            continue
+        if auto_radius and 0 < i < len(points) - 1:
+            point[6] = _corner_radius(points[i - 1], point, points[i + 1], ratio, max_radius, max_deviation)
+        else:
+            point[6] = 0
+    return points
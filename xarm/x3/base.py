@@ -10,23 +10,13 @@ import re
 import sys
 import time
 import math
-import uuid
 import queue
-import struct
 import threading
-try:
-    from multiprocessing.pool import ThreadPool
-except:
-    ThreadPool = None
-try:
-    import asyncio
-
-    if sys.version_info.major >= 3 and sys.version_info.minor >= 5:
-        from .grammar_async import AsyncObject as BaseObject
-    else:
-        from .grammar_coroutine import CoroutineObject as BaseObject
-except:
-    asyncio = None
+# asyncio/multiprocessing.pool/uuid导入较慢, 只在用到时导入(见_import_asyncio/_import_thread_pool)
+if sys.version_info.major >= 3 and sys.version_info.minor >= 5:
+    from .grammar_async import AsyncObject as BaseObject
+else:
+    from .grammar_coroutine import CoroutineObject as BaseObject
 if not hasattr(math, 'inf'):
     setattr(math, 'inf', float('inf'))
 from .events import Events
@@ -39,10 +29,16 @@ except:
 from ..core.wrapper import UxbusCmdSer, UxbusCmdTcp
 from ..core.utils.log import logger, pretty_print
 from ..core.utils import convert
+from ..core.utils.report_layout import get_report_layout
+from ..core.utils.metrics import Metrics
 from ..core.config.x_code import ControllerWarn, ControllerError, ControllerErrorCodeMap, ControllerWarnCodeMap
 from .utils import compare_time, compare_version, filter_invaild_number
 from .decorator import xarm_is_connected, xarm_is_ready, xarm_is_not_simulation_mode, xarm_wait_until_cmdnum_lt_max, xarm_wait_until_not_pause
 from .code import APIState
+from .io_cache import CGpioCache
+from .ee_poller import EndEffectorPoller
+from .feedback_registry import FeedbackRegistry
+from ..core.wrapper.tool_bus import ToolBusScheduler
 from ..tools.threads import ThreadManage
 from ..version import __version__
 
@@ -52,6 +48,22 @@ controller_warn_keys = ControllerWarnCodeMap.keys()
 print('SDK_VERSION: {}'.format(__version__))
 
 
+def _import_asyncio():
+    try:
+        import asyncio
+        return asyncio
+    except:
+        return None
+
+
+def _import_thread_pool():
+    try:
+        from multiprocessing.pool import ThreadPool
+        return ThreadPool
+    except:
+        return None
+
+
 class Base(BaseObject, Events):
     def __init__(self, port=None, is_radian=False, do_not_open=False, **kwargs):
         if kwargs.get('init', False):
@@ -79,6 +91,7 @@ class Base(BaseObject, Events):
             self._check_is_pause = kwargs.get('check_is_pause', True)
             self._timed_comm = kwargs.get('timed_comm', True)
             self._timed_comm_interval = kwargs.get('timed_comm_interval', 30)
+            self._enable_pipeline = kwargs.get('enable_pipeline', False)
             self._timed_comm_t = None
             self._timed_comm_t_alive = False
 
@@ -180,6 +193,11 @@ class Base(BaseObject, Events):
 
             self._is_set_move = False
             self._pause_cond = threading.Condition()
+            self._report_cond = threading.Condition()  # 收到上报数据或者反馈时通知等待者
+            self._report_seq = 0
+            self._report_broker = None  # 上报数据共享内存分发
+            self._report_recorder = None  # 上报数据列式记录
+            self._report_sinks = []  # 每帧上报数据处理完后调用sink.publish(self)
             self._pause_lock = threading.Lock()
             self._pause_cnts = 0
 
@@ -193,6 +211,11 @@ class Base(BaseObject, Events):
             self._cgpio_reset_enable = 0
             self._tgpio_reset_enable = 0
             self._cgpio_states = [0, 0, 256, 65533, 0, 65280, 0, 0, 0.0, 0.0, [0, 0, 0, 0, 0, 0, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0]]
+            self._cgpio_cache = CGpioCache(self._cgpio_states)  # 由rich上报更新的cgpio数字量缓存
+            self._add_report_sink(self._cgpio_cache)
+            self._ee_poller = EndEffectorPoller(self)  # 末端执行器(夹爪/真空吸头等)等待共用的轮询线程
+            self._tool_bus = ToolBusScheduler()  # 末端RS-485事务调度, 主端口与503端口共用
+            self._tool_bus.set_router(lambda: self.arm_cmd_503 if self.connected_503 else None)
             self._iden_progress = 0
 
             self._ignore_error = False
@@ -243,9 +266,11 @@ class Base(BaseObject, Events):
             self._support_feedback = False
             self._feedback_que = queue.Queue()
             self._feedback_thread = None
-            self._fb_key_transid_map = {}
-            self._fb_transid_type_map = {}
-            self._fb_transid_result_map = {}
+            self._fb_registry = FeedbackRegistry(maxsize=kwargs.get('feedback_maxsize', 4096), ttl=kwargs.get('feedback_ttl', 600))
+
+            self._metrics = Metrics(enabled=kwargs.get('enable_metrics', False))
+            self._metrics_last_report_time = None
+            self._init_metrics()
 
             if not do_not_open:
                 self.connect()
@@ -304,6 +329,8 @@ class Base(BaseObject, Events):
 
         self._is_set_move = False
         self._pause_cond = threading.Condition()
+        self._report_cond = threading.Condition()
+        self._report_seq = 0
         self._pause_lock = threading.Lock()
         self._pause_cnts = 0
 
@@ -318,6 +345,7 @@ class Base(BaseObject, Events):
         self._tgpio_reset_enable = 0
         self._cgpio_states = [0, 0, 256, 65533, 0, 65280, 0, 0, 0.0, 0.0, [0, 0, 0, 0, 0, 0, 0, 0],
                               [0, 0, 0, 0, 0, 0, 0, 0]]
+        self._cgpio_cache.reset(self._cgpio_states)
         self._iden_progress = 0
 
         self._ignore_error = False
@@ -783,13 +811,16 @@ class Base(BaseObject, Events):
                 with self._pause_lock:
                     self._pause_cnts -= 1
     
-    def wait_until_cmdnum_lt_max(self):
-        if not self._check_cmdnum_limit:
-            return
-        while self.connected and self.cmd_num >= self._max_cmd_num:
+    def wait_until_cmdnum_lt_max(self, max_cmdnum=None):
+        if max_cmdnum is None:
+            if not self._check_cmdnum_limit:
+                return
+            max_cmdnum = self._max_cmd_num
+        seq = self._report_seq
+        while self.connected and self.cmd_num >= max_cmdnum:
             if time.monotonic() - self._last_report_time > 0.4:
                 self.get_cmdnum()
-            time.sleep(0.05)
+            seq = self._wait_report_notify(seq)
 
     @property
     def check_xarm_is_ready(self):
@@ -837,8 +868,11 @@ class Base(BaseObject, Events):
             heartbeat=self._enable_heartbeat, buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE, forbid_uds=self._forbid_uds)
         if not self.connected_503:
             return -1
-        self.arm_cmd_503 = UxbusCmdTcp(self._stream_503, set_feedback_key_tranid=self._set_feedback_key_tranid)
+        self.arm_cmd_503 = UxbusCmdTcp(self._stream_503, set_feedback_key_tranid=self._set_feedback_key_tranid,
+                                       pipeline=self._enable_pipeline)
         self.arm_cmd_503.set_debug(self._debug)
+        self.arm_cmd_503.tool_bus = self._tool_bus
+        self.arm_cmd_503.metrics = self._metrics
         return 0
 
     def connect(self, port=None, baudrate=None, timeout=None, axis=None, arm_type=None):
@@ -878,8 +912,11 @@ class Base(BaseObject, Events):
                 self._feedback_thread = threading.Thread(target=self._feedback_thread_handle, daemon=True)
                 self._feedback_thread.start()
 
-                self.arm_cmd = UxbusCmdTcp(self._stream, set_feedback_key_tranid=self._set_feedback_key_tranid)
+                self.arm_cmd = UxbusCmdTcp(self._stream, set_feedback_key_tranid=self._set_feedback_key_tranid,
+                                           pipeline=self._enable_pipeline)
                 self.arm_cmd.set_protocol_identifier(2)
+                self.arm_cmd.tool_bus = self._tool_bus
+                self.arm_cmd.metrics = self._metrics
                 self._stream_type = 'socket'
 
                 try:
@@ -902,13 +939,7 @@ class Base(BaseObject, Events):
                 self._support_feedback = self.version_is_ge(2, 0, 102)
                 self.arm_cmd.set_debug(self._debug)
 
-                if self._max_callback_thread_count < 0 and asyncio is not None:
-                    self._asyncio_loop = asyncio.new_event_loop()
-                    self._asyncio_loop_thread = threading.Thread(target=self._run_asyncio_loop, daemon=True)
-                    self._thread_manage.append(self._asyncio_loop_thread)
-                    self._asyncio_loop_thread.start()
-                elif self._max_callback_thread_count > 0 and ThreadPool is not None:
-                    self._pool = ThreadPool(self._max_callback_thread_count)
+                self._start_callback_thread()
 
                 if self._stream.connected and self._enable_report:
                     self._report_thread = threading.Thread(target=self._report_thread_handle, daemon=True)
@@ -925,15 +956,11 @@ class Base(BaseObject, Events):
                 self._report_error_warn_changed_callback()
 
                 self.arm_cmd = UxbusCmdSer(self._stream)
+                self.arm_cmd.tool_bus = self._tool_bus
+                self.arm_cmd.metrics = self._metrics
                 self._stream_type = 'serial'
 
-                if self._max_callback_thread_count < 0 and asyncio is not None:
-                    self._asyncio_loop = asyncio.new_event_loop()
-                    self._asyncio_loop_thread = threading.Thread(target=self._run_asyncio_loop, daemon=True)
-                    self._thread_manage.append(self._asyncio_loop_thread)
-                    self._asyncio_loop_thread.start()
-                elif self._max_callback_thread_count > 0 and ThreadPool is not None:
-                    self._pool = ThreadPool(self._max_callback_thread_count)
+                self._start_callback_thread()
 
                 if self._enable_report:
                     self._report_thread = threading.Thread(target=self._auto_get_report_thread, daemon=True)
@@ -949,24 +976,36 @@ class Base(BaseObject, Events):
                 setattr(self.arm_cmd, 'set_modbus_baudrate_old', self.arm_cmd.set_modbus_baudrate)
                 setattr(self.arm_cmd, 'set_modbus_baudrate', self._core_set_modbus_baudrate)
 
-    if asyncio:
-        def _run_asyncio_loop(self):
-            # @asyncio.coroutine
-            # def _asyncio_loop():
-            #     logger.debug('asyncio thread start ...')
-            #     while self.connected:
-            #         yield from asyncio.sleep(0.001)
-            #     logger.debug('asyncio thread exit ...')
+    def _start_callback_thread(self):
+        if self._max_callback_thread_count < 0:
+            asyncio = _import_asyncio()
+            if asyncio is not None:
+                self._asyncio_loop = asyncio.new_event_loop()
+                self._asyncio_loop_thread = threading.Thread(target=self._run_asyncio_loop, daemon=True)
+                self._thread_manage.append(self._asyncio_loop_thread)
+                self._asyncio_loop_thread.start()
+        elif self._max_callback_thread_count > 0:
+            ThreadPool = _import_thread_pool()
+            if ThreadPool is not None:
+                self._pool = ThreadPool(self._max_callback_thread_count)
+
+    def _run_asyncio_loop(self):
+        # @asyncio.coroutine
+        # def _asyncio_loop():
+        #     logger.debug('asyncio thread start ...')
+        #     while self.connected:
+        #         yield from asyncio.sleep(0.001)
+        #     logger.debug('asyncio thread exit ...')
 
-            try:
-                asyncio.set_event_loop(self._asyncio_loop)
-                self._asyncio_loop_alive = True
-                # self._asyncio_loop.run_until_complete(_asyncio_loop())
-                self._asyncio_loop.run_until_complete(self._asyncio_loop_func())
-            except Exception as e:
-                pass
+        try:
+            _import_asyncio().set_event_loop(self._asyncio_loop)
+            self._asyncio_loop_alive = True
+            # self._asyncio_loop.run_until_complete(_asyncio_loop())
+            self._asyncio_loop.run_until_complete(self._asyncio_loop_func())
+        except Exception as e:
+            pass
 
-            self._asyncio_loop_alive = False
+        self._asyncio_loop_alive = False
 
         # @staticmethod
         # @asyncio.coroutine
@@ -977,7 +1016,7 @@ class Base(BaseObject, Events):
         try:
             if self._asyncio_loop_alive and enable_callback_thread:
                 coroutine = self._async_run_callback(callback, msg)
-                asyncio.run_coroutine_threadsafe(coroutine, self._asyncio_loop)
+                _import_asyncio().run_coroutine_threadsafe(coroutine, self._asyncio_loop)
             elif self._pool is not None and enable_callback_thread:
                 self._pool.apply_async(callback, args=(msg,))
             else:
@@ -1029,6 +1068,8 @@ class Base(BaseObject, Events):
         self._report_connect_changed_callback(False, False)
         with self._pause_cond:
             self._pause_cond.notifyAll()
+        self.stop_report_broker()
+        self.stop_report_recorder()
         self._clean_thread()
 
     def set_timeout(self, timeout):
@@ -1246,19 +1287,95 @@ class Base(BaseObject, Events):
             with self._pause_cond:
                 self._pause_cond.notifyAll()
         self.disconnect()
+        self._notify_report_waiters()
+
+    def _notify_report_waiters(self):
+        with self._report_cond:
+            self._report_seq += 1
+            self._report_cond.notify_all()
+
+    def _wait_report_notify(self, seq, timeout=0.05):
+        """
+        等待下一帧上报数据或者下一个反馈, 最多等待timeout秒
+        :param seq: 上一次返回的序号, 序号变化说明这期间已经有新的通知, 不会漏掉
+        :return: 当前序号
+        """
+        with self._report_cond:
+            self._report_cond.wait_for(lambda: self._report_seq != seq, timeout)
+            return self._report_seq
+
+    def start_report_broker(self, name=None):
+        if self._report_broker is not None:
+            return self._report_broker.name
+        if name is None:
+            name = 'xarm_report_{}_{}'.format(re.sub(r'[^0-9a-zA-Z]', '_', str(self._port)), self._report_type)
+        from .report_shm import ReportBroker
+        self._report_broker = ReportBroker(name)
+        self._add_report_sink(self._report_broker)
+        logger.info('report broker start, name={}'.format(name))
+        return name
+
+    def stop_report_broker(self):
+        broker = self._report_broker
+        self._report_broker = None
+        if broker is not None:
+            self._remove_report_sink(broker)
+            broker.close()
+            logger.info('report broker stop, name={}'.format(broker.name))
+
+    def start_report_recorder(self, path, capacity=900000, fields=None):
+        if self._report_recorder is not None:
+            self.stop_report_recorder()
+        from .report_recorder import ReportRecorder
+        self._report_recorder = ReportRecorder(path, capacity=capacity, fields=fields)
+        self._add_report_sink(self._report_recorder)
+        logger.info('report recorder start, path={}, capacity={}'.format(path, capacity))
+        return self._report_recorder
+
+    def stop_report_recorder(self):
+        recorder = self._report_recorder
+        self._report_recorder = None
+        if recorder is not None:
+            self._remove_report_sink(recorder)
+            recorder.close()
+            logger.info('report recorder stop, path={}, count={}'.format(recorder.path, recorder.count))
+
+    def _add_report_sink(self, sink):
+        # 替换列表而不是原地修改, 上报线程遍历时不需要加锁
+        self._report_sinks = self._report_sinks + [sink]
+
+    def _remove_report_sink(self, sink):
+        self._report_sinks = [s for s in self._report_sinks if s is not sink]
+
+    def _report_state_is_fresh(self):
+        return self._enable_report and self._stream_type == 'socket' and self._stream_report is not None \
+            and self._stream_report.connected and time.monotonic() - self._last_report_time < 0.4
+
+    def _get_wait_state(self):
+        # 上报数据正常时直接使用上报的状态, 不再通过502端口发送get_state请求
+        if self._report_state_is_fresh():
+            return 0, self._state
+        return self.get_state()
 
     def _handle_report_data(self, data):
-        def __handle_report_normal_old(rx_data):
+        metrics = self._metrics
+        if metrics.enabled:
+            decode_start = time.perf_counter()
+            if self._metrics_last_report_time is not None:
+                metrics.observe('report_interval_seconds', decode_start - self._metrics_last_report_time, self._report_type)
+            self._metrics_last_report_time = decode_start
+
+        def __handle_report_normal_old(rx_data, layout, values):
             report_time = time.monotonic()
             interval = report_time - self._last_report_time
             self._max_report_interval = max(self._max_report_interval, interval)
             self._last_report_time = report_time
             # print('length:', convert.bytes_to_u32(rx_data[0:4]))
-            state, mtbrake, mtable, error_code, warn_code = rx_data[4:9]
-            angles = convert.bytes_to_fp32s(rx_data[9:7 * 4 + 9], 7)
-            pose = convert.bytes_to_fp32s(rx_data[37:6 * 4 + 37], 6)
-            cmd_num = convert.bytes_to_u16(rx_data[61:63])
-            pose_offset = convert.bytes_to_fp32s(rx_data[63:6 * 4 + 63], 6)
+            state, mtbrake, mtable, error_code, warn_code = values[layout.state_mtbrake_mtable_err_warn]
+            angles = list(values[layout.angles])
+            pose = list(values[layout.pose])
+            cmd_num = values[layout.cmd_num]
+            pose_offset = list(values[layout.pose_offset])
 
             if error_code != self._error_code or warn_code != self._warn_code:
                 if error_code != self._error_code:
@@ -1386,14 +1503,14 @@ class Base(BaseObject, Events):
                 self._sync()
                 self._is_sync = True
 
-        def __handle_report_rich_old(rx_data):
-            __handle_report_normal_old(rx_data)
+        def __handle_report_rich_old(rx_data, layout, values):
+            __handle_report_normal_old(rx_data, layout, values)
             (self._arm_type,
              arm_axis,
              self._arm_master_id,
              self._arm_slave_id,
              self._arm_motor_tid,
-             self._arm_motor_fid) = rx_data[87:93]
+             self._arm_motor_fid) = values[layout.arm_info]
 
             if 7 >= arm_axis >= 5:
                 self._arm_axis = arm_axis
@@ -1404,10 +1521,10 @@ class Base(BaseObject, Events):
             elif self._arm_type == 3:
                 self._arm_axis = 7
 
-            ver_msg = rx_data[93:122]
+            # ver_msg = rx_data[93:122]
             # self._version = str(ver_msg, 'utf-8')
 
-            trs_msg = convert.bytes_to_fp32s(rx_data[123:143], 5)
+            trs_msg = values[layout.trs_msg]
             # trs_msg = [i[0] for i in trs_msg]
             (self._tcp_jerk,
              self._min_tcp_acc,
@@ -1418,7 +1535,7 @@ class Base(BaseObject, Events):
             #     self._tcp_jerk, self._min_tcp_acc, self._max_tcp_acc, self._min_tcp_speed, self._max_tcp_speed
             # ))
 
-            p2p_msg = convert.bytes_to_fp32s(rx_data[143:163], 5)
+            p2p_msg = values[layout.p2p_msg]
             # p2p_msg = [i[0] for i in p2p_msg]
             (self._joint_jerk,
              self._min_joint_acc,
@@ -1430,20 +1547,25 @@ class Base(BaseObject, Events):
             #     self._min_joint_speed, self._max_joint_speed
             # ))
 
-            rot_msg = convert.bytes_to_fp32s(rx_data[163:171], 2)
+            rot_msg = values[layout.rot_msg]
             # rot_msg = [i[0] for i in rot_msg]
             self._rot_jerk, self._max_rot_acc = rot_msg
             # print('rot_jerk: {}, mac_acc: {}'.format(self._rot_jerk, self._max_rot_acc))
 
-            sv3_msg = convert.bytes_to_u16s(rx_data[171:187], 8)
+            # sv3_msg = values[layout.sv3_msg]
             self._first_report_over = True
 
-        def __handle_report_real(rx_data):
-            state, mode = rx_data[4] & 0x0F, rx_data[4] >> 4
-            cmd_num = convert.bytes_to_u16(rx_data[5:7])
-            angles = convert.bytes_to_fp32s(rx_data[7:7 * 4 + 7], 7)
-            pose = convert.bytes_to_fp32s(rx_data[35:6 * 4 + 35], 6)
-            torque = convert.bytes_to_fp32s(rx_data[59:7 * 4 + 59], 7)
+        def __handle_report_real(rx_data, layout, values):
+            report_time = time.monotonic()
+            interval = report_time - self._last_report_time
+            self._max_report_interval = max(self._max_report_interval, interval)
+            self._last_report_time = report_time
+            state_mode = values[layout.state_mode]
+            state, mode = state_mode & 0x0F, state_mode >> 4
+            cmd_num = values[layout.cmd_num]
+            angles = list(values[layout.angles])
+            pose = list(values[layout.pose])
+            torque = list(values[layout.torque])
             if cmd_num != self._cmd_num:
                 self._cmd_num = cmd_num
                 self._report_cmdnum_changed_callback()
@@ -1478,35 +1600,36 @@ class Base(BaseObject, Events):
             length = len(rx_data)
             if length >= 135:
                 # FT_SENSOR
-                self._ft_ext_force = convert.bytes_to_fp32s(rx_data[87:111], 6)
-                self._ft_raw_force = convert.bytes_to_fp32s(rx_data[111:135], 6)
+                self._ft_ext_force = list(values[layout.ft_ext_force])
+                self._ft_raw_force = list(values[layout.ft_raw_force])
 
-        def __handle_report_normal(rx_data):
+        def __handle_report_normal(rx_data, layout, values):
             report_time = time.monotonic()
             interval = report_time - self._last_report_time
             self._max_report_interval = max(self._max_report_interval, interval)
             self._last_report_time = report_time
             # print('length:', convert.bytes_to_u32(rx_data[0:4]), len(rx_data))
-            state, mode = rx_data[4] & 0x0F, rx_data[4] >> 4
+            state_mode = values[layout.state_mode]
+            state, mode = state_mode & 0x0F, state_mode >> 4
             # if state != self._state or mode != self._mode:
             #     print('mode: {}, state={}, time={}'.format(mode, state, time.monotonic()))
-            cmd_num = convert.bytes_to_u16(rx_data[5:7])
-            angles = convert.bytes_to_fp32s(rx_data[7:7 * 4 + 7], 7)
-            pose = convert.bytes_to_fp32s(rx_data[35:6 * 4 + 35], 6)
-            torque = convert.bytes_to_fp32s(rx_data[59:7 * 4 + 59], 7)
-            mtbrake, mtable, error_code, warn_code = rx_data[87:91]
-            pose_offset = convert.bytes_to_fp32s(rx_data[91:6 * 4 + 91], 6)
-            tcp_load = convert.bytes_to_fp32s(rx_data[115:4 * 4 + 115], 4)
-            collis_sens, teach_sens = rx_data[131:133]
+            cmd_num = values[layout.cmd_num]
+            angles = list(values[layout.angles])
+            pose = list(values[layout.pose])
+            torque = list(values[layout.torque])
+            mtbrake, mtable, error_code, warn_code = values[layout.mtbrake_mtable_err_warn]
+            pose_offset = list(values[layout.pose_offset])
+            tcp_load = values[layout.tcp_load]
+            collis_sens, teach_sens = values[layout.collis_teach_sens]
             # if (collis_sens not in list(range(6)) or teach_sens not in list(range(6))) \
             #         and ((error_code != 0 and error_code not in controller_error_keys) or (warn_code != 0 and warn_code not in controller_warn_keys)):
             #     self._stream_report.close()
             #     logger.warn('ReportDataException: data={}'.format(rx_data))
             #     return
-            length = convert.bytes_to_u32(rx_data[0:4])
+            length = values[layout.length]
             data_len = len(rx_data)
-            if (length != data_len and (length != 233 or data_len != 245)) or collis_sens not in list(range(6)) or teach_sens not in list(range(6)) \
-                or mode not in list(range(12)) or state not in list(range(10)):
+            if (length != data_len and (length != 233 or data_len != 245)) or not 0 <= collis_sens < 6 or not 0 <= teach_sens < 6 \
+                or not 0 <= mode < 12 or not 0 <= state < 10:
                 self._stream_report.close()
                 logger.warn('ReportDataException: length={}, data_len={}, '
                             'state={}, mode={}, collis_sens={}, teach_sens={}, '
@@ -1515,7 +1638,8 @@ class Base(BaseObject, Events):
                     state, mode, collis_sens, teach_sens, error_code, warn_code
                 ))
                 return
-            self._gravity_direction = convert.bytes_to_fp32s(rx_data[133:3*4 + 133], 3)
+            if data_len >= 145:
+                self._gravity_direction = list(values[layout.gravity_direction])
 
             reset_tgpio_params = False
             reset_linear_track_params = False
@@ -1666,22 +1790,22 @@ class Base(BaseObject, Events):
                 self._need_sync = False
                 self._sync()
 
-        def __handle_report_rich(rx_data):
+        def __handle_report_rich(rx_data, layout, values):
             # print('interval={}, max_interval={}'.format(interval, self._max_report_interval))
-            __handle_report_normal(rx_data)
+            __handle_report_normal(rx_data, layout, values)
             (self._arm_type,
              arm_axis,
              self._arm_master_id,
              self._arm_slave_id,
              self._arm_motor_tid,
-             self._arm_motor_fid) = rx_data[145:151]
+             self._arm_motor_fid) = values[layout.arm_info]
 
             if 7 >= arm_axis >= 5:
                 self._arm_axis = arm_axis
 
             # self._version = str(rx_data[151:180], 'utf-8')
 
-            trs_msg = convert.bytes_to_fp32s(rx_data[181:201], 5)
+            trs_msg = values[layout.trs_msg]
             # trs_msg = [i[0] for i in trs_msg]
             (self._tcp_jerk,
              self._min_tcp_acc,
@@ -1692,7 +1816,7 @@ class Base(BaseObject, Events):
             #     self._tcp_jerk, self._min_tcp_acc, self._max_tcp_acc, self._min_tcp_speed, self._max_tcp_speed
             # ))
 
-            p2p_msg = convert.bytes_to_fp32s(rx_data[201:221], 5)
+            p2p_msg = values[layout.p2p_msg]
             # p2p_msg = [i[0] for i in p2p_msg]
             (self._joint_jerk,
              self._min_joint_acc,
@@ -1704,12 +1828,12 @@ class Base(BaseObject, Events):
             #     self._min_joint_speed, self._max_joint_speed
             # ))
 
-            rot_msg = convert.bytes_to_fp32s(rx_data[221:229], 2)
+            rot_msg = values[layout.rot_msg]
             # rot_msg = [i[0] for i in rot_msg]
             self._rot_jerk, self._max_rot_acc = rot_msg
             # print('rot_jerk: {}, mac_acc: {}'.format(self._rot_jerk, self._max_rot_acc))
 
-            servo_codes = [val for val in rx_data[229:245]]
+            servo_codes = values[layout.servo_codes]
             for i in range(self.axis):
                 if self._servo_codes[i][0] != servo_codes[i * 2] or self._servo_codes[i][1] != servo_codes[i * 2 + 1]:
                     print('servo_error_code, servo_id={}, status={}, code={}'.format(i + 1, servo_codes[i * 2], servo_codes[i * 2 + 1]))
@@ -1721,25 +1845,24 @@ class Base(BaseObject, Events):
             # length = convert.bytes_to_u32(rx_data[0:4])
             length = len(rx_data)
             if length >= 252:
-                temperatures = list(struct.unpack('>7b', struct.pack('>7B', *rx_data[245:252])))
-                # temperatures = list(map(int, rx_data[245:252]))
+                temperatures = list(values[layout.temperatures])
                 if temperatures != self.temperatures:
                     self._temperatures = temperatures
                     self._report_temperature_changed_callback()
             if length >= 284:
-                speeds = convert.bytes_to_fp32s(rx_data[252:8 * 4 + 252], 8)
+                speeds = values[layout.speeds]
                 self._realtime_tcp_speed = speeds[0]
-                self._realtime_joint_speeds = speeds[1:]
+                self._realtime_joint_speeds = list(speeds[1:])
                 # print(speeds[0], speeds[1:])
             if length >= 288:
-                count = convert.bytes_to_u32(rx_data[284:288])
+                count = values[layout.count]
                 # print(count, rx_data[284:288])
                 if self._count != -1 and count != self._count:
                     self._count = count
                     self._report_count_changed_callback()
                 self._count = count
             if length >= 312:
-                world_offset = convert.bytes_to_fp32s(rx_data[288:6 * 4 + 288], 6)
+                world_offset = list(values[layout.world_offset])
                 for i in range(len(world_offset)):
                     if i < 3:
                         world_offset[i] = float('{:.3f}'.format(world_offset[i]))
@@ -1748,65 +1871,81 @@ class Base(BaseObject, Events):
                 if math.inf not in world_offset and -math.inf not in world_offset and not (10 <= self._error_code <= 17):
                     self._world_offset = world_offset
             if length >= 314:
-                self._cgpio_reset_enable, self._tgpio_reset_enable = rx_data[312:314]
+                self._cgpio_reset_enable, self._tgpio_reset_enable = values[layout.gpio_reset_enable]
             if length >= 417:
-                self._is_simulation_robot = bool(rx_data[314])
-                self._is_collision_detection, self._collision_tool_type = rx_data[315:317]
-                self._collision_tool_params = convert.bytes_to_fp32s(rx_data[317:341], 6)
+                is_simulation_robot, self._is_collision_detection, self._collision_tool_type = values[layout.simulation_collision]
+                self._is_simulation_robot = bool(is_simulation_robot)
+                self._collision_tool_params = list(values[layout.collision_tool_params])
 
-                voltages = convert.bytes_to_u16s(rx_data[341:355], 7)
-                voltages = list(map(lambda x: x / 100, voltages))
+                voltages = [x / 100 for x in values[layout.voltages]]
                 self._voltages = voltages
 
-                currents = convert.bytes_to_fp32s(rx_data[355:383], 7)
+                currents = list(values[layout.currents])
                 self._currents = currents
 
-                cgpio_states = []
-                cgpio_states.extend(rx_data[383:385])
-                cgpio_states.extend(convert.bytes_to_u16s(rx_data[385:401], 8))
-                cgpio_states[6:10] = list(map(lambda x: x / 4095.0 * 10.0, cgpio_states[6:10]))
-                cgpio_states.append(list(map(int, rx_data[401:409])))
-                cgpio_states.append(list(map(int, rx_data[409:417])))
+                cgpio_states = list(values[layout.cgpio_states])
+                cgpio_states.extend(values[layout.cgpio_values])
+                cgpio_states[6:10] = [x / 4095.0 * 10.0 for x in cgpio_states[6:10]]
+                cgpio_configs = values[layout.cgpio_configs]
+                cgpio_states.append(list(cgpio_configs[:8]))
+                cgpio_states.append(list(cgpio_configs[8:]))
                 if self._control_box_type_is_1300 and length >= 433:
-                    cgpio_states[-2].extend(list(map(int, rx_data[417:425])))
-                    cgpio_states[-1].extend(list(map(int, rx_data[425:433])))
+                    cgpio_configs_ext = values[layout.cgpio_configs_ext]
+                    cgpio_states[-2].extend(cgpio_configs_ext[:8])
+                    cgpio_states[-1].extend(cgpio_configs_ext[8:])
                 self._cgpio_states = cgpio_states
             if length >= 481:
                 # FT_SENSOR
-                self._ft_ext_force = convert.bytes_to_fp32s(rx_data[433:457], 6)
-                self._ft_raw_force = convert.bytes_to_fp32s(rx_data[457:481], 6)
+                self._ft_ext_force = list(values[layout.ft_ext_force])
+                self._ft_raw_force = list(values[layout.ft_raw_force])
             if length >= 482:
-                iden_progress = rx_data[481]
+                iden_progress = values[layout.iden_progress]
                 if iden_progress != self._iden_progress:
                     self._iden_progress = iden_progress
                     self._report_iden_progress_changed_callback()
             if length >= 494:
-                pose_aa = convert.bytes_to_fp32s(rx_data[482:494], 3)
+                pose_aa = list(values[layout.pose_aa])
                 for i in range(len(pose_aa)):
                     pose_aa[i] = filter_invaild_number(pose_aa[i], 6, default=self._pose_aa[i])
                 self._pose_aa = self._position[:3] + pose_aa
             if length >= 495:
-                self._is_reduced_mode = rx_data[494] & 0x01
-                self._is_fence_mode = (rx_data[494] >> 1) & 0x01
-                self._is_report_current = (rx_data[494] >> 2) & 0x01  # 针对get_report_tau_or_i的结果
-                self._is_approx_motion = (rx_data[494] >> 3) & 0x01
-                self._is_cart_continuous = (rx_data[494] >> 4) & 0x01
+                flags = values[layout.flags]
+                self._is_reduced_mode = flags & 0x01
+                self._is_fence_mode = (flags >> 1) & 0x01
+                self._is_report_current = (flags >> 2) & 0x01  # 针对get_report_tau_or_i的结果
+                self._is_approx_motion = (flags >> 3) & 0x01
+                self._is_cart_continuous = (flags >> 4) & 0x01
 
         try:
+            # 每种上报类型和长度对应一个预编译的布局, 一帧数据只解析一次
             if self._report_type == 'real':
-                __handle_report_real(data)
+                report_type, handler = 'real', __handle_report_real
             elif self._report_type == 'rich':
                 if self._is_old_protocol:
-                    __handle_report_rich_old(data)
+                    report_type, handler = 'rich_old', __handle_report_rich_old
                 else:
-                    __handle_report_rich(data)
+                    report_type, handler = 'rich', __handle_report_rich
             else:
                 if self._is_old_protocol:
-                    __handle_report_normal_old(data)
+                    report_type, handler = 'normal_old', __handle_report_normal_old
                 else:
-                    __handle_report_normal(data)
+                    report_type, handler = 'normal', __handle_report_normal
+            layout = get_report_layout(report_type, len(data))
+            if layout.is_complete:
+                handler(data, layout, layout.unpack(data))
+            else:
+                # 数据不完整, 丢弃这一帧, 保留之前的值
+                logger.warning('ReportDataException: the {} report is too short, data_len={}'.format(report_type, len(data)))
         except Exception as e:
             logger.error(e)
+        if metrics.enabled:
+            metrics.observe('report_decode_seconds', time.perf_counter() - decode_start, self._report_type)
+        self._notify_report_waiters()
+        for sink in self._report_sinks:
+            try:
+                sink.publish(self)
+            except Exception as e:
+                logger.error('publish report to {} failed: {}'.format(sink.__class__.__name__, e))
 
     def _auto_get_report_thread(self):
         logger.debug('get report thread start')
@@ -2262,53 +2401,72 @@ class Base(BaseObject, Events):
     def _gen_feedback_key(self, wait, **kwargs):
         feedback_key = kwargs.get('feedback_key', '') if self._support_feedback and not wait else ''
         studio_wait = bool(feedback_key)
-        feedback_key = str(uuid.uuid1()) if wait and self._support_feedback else feedback_key
-        # feedback_key = str(uuid.uuid1()) if wait and self._support_feedback else ''
-        self._fb_key_transid_map[feedback_key if feedback_key else 'no_use'] = -1
+        if wait and self._support_feedback:
+            feedback_key = self._fb_registry.gen_key()
+        elif feedback_key:
+            # 外部指定的key可能重复使用, 去掉上一次登记的trans_id
+            self._fb_registry.discard_key(feedback_key)
         return feedback_key, studio_wait
+
+    def _new_feedback_key(self):
+        return self._fb_registry.gen_key()
     
     def _get_feedback_transid(self, feedback_key, studio_wait=False):
-        return self._fb_key_transid_map.pop(feedback_key, -1) if not studio_wait else -1
+        return self._fb_registry.pop_key(feedback_key) if feedback_key and not studio_wait else -1
     
     def _set_feedback_key_tranid(self, feedback_key, trans_id, feedback_type=0):
-        self._fb_key_transid_map[feedback_key] = trans_id
-        self._fb_transid_type_map[trans_id] = feedback_type
-        self._fb_transid_result_map.pop(trans_id, -1)
+        self._fb_registry.bind(feedback_key, trans_id, feedback_type)
+
+    def _register_feedback_future(self, feedback_key, future):
+        # future需要有trans_id属性和_finish(code, result=None, feedback_code=-1)方法
+        self._fb_registry.register_future(feedback_key, future)
+
+    def _release_feedback_key(self, feedback_key):
+        self._fb_registry.release_key(feedback_key)
+
+    def _release_feedback_future(self, future):
+        self._fb_registry.release_future(future)
     
     def _wait_feedback(self, timeout=None, trans_id=-1, ignore_log=False):
         if timeout is not None:
             expired = time.monotonic() + timeout + (self._sleep_finish_time if self._sleep_finish_time > time.monotonic() else 0)
         else:
             expired = 0
-        state5_cnt = 0
+        entry = self._fb_registry.acquire(trans_id)
+        try:
+            return self.__wait_feedback_entry(entry, timeout, expired, ignore_log)
+        finally:
+            self._fb_registry.release(entry)
+
+    def __wait_feedback_entry(self, entry, timeout, expired, ignore_log):
+        state5_time = 0
         while timeout is None or time.monotonic() < expired:
             if not self.connected:
-                self._fb_transid_result_map.clear()
                 if not ignore_log:
                     self.log_api_info('wait_feedback, xarm is disconnect', code=APIState.NOT_CONNECTED)
                 return APIState.NOT_CONNECTED, -1
             if self.error_code != 0:
-                self._fb_transid_result_map.clear()
                 if not ignore_log:
                     self.log_api_info('wait_feedback, xarm has error, error={}'.format(self.error_code), code=APIState.HAS_ERROR)
                 return APIState.HAS_ERROR, -1
-            code, state = self.get_state()
+            code, state = self._get_wait_state()
             if code != 0:
                 return code, -1
             if state >= 4:
                 self._sleep_finish_time = 0
-                if state == 5:
-                    state5_cnt += 1
-                if state != 5 or state5_cnt >= 20:
-                    self._fb_transid_result_map.clear()
+                if state == 5 and state5_time == 0:
+                    state5_time = time.monotonic()
+                if state != 5 or time.monotonic() - state5_time >= 1:
                     if not ignore_log:
                         self.log_api_info('wait_feedback, xarm is stop, state={}'.format(state), code=APIState.EMERGENCY_STOP)
                     return APIState.EMERGENCY_STOP, -1
             else:
-                state5_cnt = 0
-            if trans_id in self._fb_transid_result_map:
-                return 0, self._fb_transid_result_map.pop(trans_id, -1)
-            time.sleep(0.05)
+                state5_time = 0
+            # 收到反馈时只唤醒等待这个trans_id的线程, 超时是为了定期检查连接/错误/状态
+            if entry.event.wait(0.05 if timeout is None else max(min(0.05, expired - time.monotonic()), 0)):
+                if entry.evicted:
+                    return APIState.WAIT_FINISH_TIMEOUT, -1
+                return 0, entry.feedback_code
         return APIState.WAIT_FINISH_TIMEOUT, -1
     
     def wait_move(self, timeout=None, trans_id=-1):
@@ -2318,10 +2476,12 @@ class Base(BaseObject, Events):
             expired = time.monotonic() + timeout + (self._sleep_finish_time if self._sleep_finish_time > time.monotonic() else 0)
         else:
             expired = 0
-        _, state = self.get_state()
-        cnt = 0
-        state5_cnt = 0
+        _, state = self._get_wait_state()
+        # 状态连续max_cnt个周期(50ms)不是运动中才认为运动完成, 按时间计算, 与状态的来源(上报或查询)无关
+        stop_time = 0
+        state5_time = 0
         max_cnt = 2 if _ == 0 and state == 1 else 10
+        seq = self._report_seq
         while timeout is None or time.monotonic() < expired:
             if not self.connected:
                 self.log_api_info('wait_move, xarm is disconnect', code=APIState.NOT_CONNECTED)
@@ -2331,33 +2491,30 @@ class Base(BaseObject, Events):
                 return APIState.HAS_ERROR
             if self.mode != 0 and self.mode != 11:
                 return 0
-            code, state = self.get_state()
+            code, state = self._get_wait_state()
             if code != 0:
                 return code
             if state >= 4:
                 self._sleep_finish_time = 0
-                if state == 5:
-                    state5_cnt += 1
-                if state != 5 or state5_cnt >= 20:
+                if state == 5 and state5_time == 0:
+                    state5_time = time.monotonic()
+                if state != 5 or time.monotonic() - state5_time >= 1:
                     self.log_api_info('wait_move, xarm is stop, state={}'.format(state), code=APIState.EMERGENCY_STOP)
                     return APIState.EMERGENCY_STOP
             else:
-                state5_cnt = 0
+                state5_time = 0
             if time.monotonic() < self._sleep_finish_time or state == 3:
-                cnt = 0
+                stop_time = 0
                 max_cnt = 2 if state == 3 else max_cnt
-                time.sleep(0.05)
-                continue
-            if state == 0 or state == 1:
-                cnt = 0
+            elif state == 0 or state == 1:
+                stop_time = 0
                 max_cnt = 2
-                time.sleep(0.05)
-                continue
             else:
-                cnt += 1
-                if cnt >= max_cnt:
+                if stop_time == 0:
+                    stop_time = time.monotonic()
+                if time.monotonic() - stop_time >= (max_cnt - 1) * 0.05:
                     return 0
-                time.sleep(0.05)
+            seq = self._wait_report_notify(seq)
         return APIState.WAIT_FINISH_TIMEOUT
 
     @xarm_is_connected(_type='set')
@@ -2497,6 +2654,71 @@ class Base(BaseObject, Events):
             self.log_api_info('API -> getset_tgpio_modbus_data -> code={}, response={}'.format(ret[0], ret[2:]), code=ret[0])
         return ret[0], ret[2:]
 
+    def set_tool_bus_config(self, coalesce_window=None, route_low_to_503=None):
+        if coalesce_window is not None:
+            self._tool_bus.coalesce_window = max(coalesce_window, 0)
+        if route_low_to_503 is not None:
+            if route_low_to_503 and not self.connected_503 and (not self.connected or self.connect_503() != 0):
+                return APIState.NOT_CONNECTED
+            self._tool_bus.route_low = bool(route_low_to_503)
+        return 0
+
+    def get_tool_bus_stats(self):
+        return 0, self._tool_bus.get_stats()
+
+    def _init_metrics(self):
+        metrics = self._metrics
+        metrics.describe('cmd_rtt_seconds', 'Round-trip time of the commands', 'funcode')
+        metrics.describe('cmd_timeouts_total', 'Number of the commands without response', 'funcode')
+        metrics.describe('report_interval_seconds', 'Interval between the report frames', 'report_type')
+        metrics.describe('report_decode_seconds', 'Time to decode a report frame', 'report_type')
+        metrics.register_gauge('rx_queue_depth', lambda: {
+            'main': self._stream.rx_que.qsize() if self._stream else 0,
+            'report': self._stream_report.rx_que.qsize() if self._stream_report else 0,
+        }, 'Number of the frames waiting in the receive queue', 'port')
+        metrics.register_gauge('feedback_queue_depth', lambda: self._feedback_que.qsize(),
+                               'Number of the feedback frames waiting to be handled')
+        metrics.register_gauge('cmd_cache_depth', lambda: self._cmd_num, 'Number of the commands cached in the controller')
+        metrics.register_gauge('pipeline_pending', lambda: len(getattr(self.arm_cmd, '_pipeline_futures', {})),
+                               'Number of the requests waiting for response in pipeline mode')
+        metrics.register_gauge('report_dropped_frames', lambda: self._stream_report.rx_dropped if self._stream_report else 0,
+                               'Number of the report frames dropped because they were not handled in time')
+        metrics.register_gauge('report_max_interval_seconds', lambda: self._max_report_interval,
+                               'Maximum interval between the report frames')
+        metrics.register_gauge('feedback_registry', self._fb_registry.get_stats, 'Command feedback bookkeeping', 'stat')
+        metrics.register_gauge('tool_bus', self._tool_bus.get_stats, 'End RS-485 scheduler', 'stat')
+
+    def set_metrics_enable(self, enable):
+        self._metrics.enabled = bool(enable)
+        self._metrics_last_report_time = None
+        return 0
+
+    def get_metrics(self, fmt='dict'):
+        if fmt == 'json':
+            return 0, self._metrics.to_json()
+        elif fmt == 'prometheus':
+            return 0, self._metrics.to_prometheus()
+        return 0, self._metrics.snapshot()
+
+    def reset_metrics(self):
+        self._metrics.reset()
+        self._metrics_last_report_time = None
+        return 0
+
+    def start_metrics_server(self, port=9120, host='127.0.0.1'):
+        try:
+            return 0, self._metrics.start_server(port=port, host=host)[:2]
+        except Exception as e:
+            logger.error('start metrics server failed: {}'.format(e))
+            return APIState.API_EXCEPTION, None
+
+    def stop_metrics_server(self):
+        self._metrics.stop_server()
+        return 0
+
+    def tool_bus_priority(self, priority=None, timeout=None):
+        return self._tool_bus.context(priority=priority, timeout=timeout)
+
     @xarm_is_connected(_type='set')
     def set_simulation_robot(self, on_off):
         ret = self.arm_cmd.set_simulation_robot(on_off)
@@ -2546,9 +2768,12 @@ class Base(BaseObject, Events):
     
     def _feedback_callback(self, data):
         trans_id = convert.bytes_to_u16(data[0:2])
-        feedback_type = self._fb_transid_type_map.pop(trans_id, -1)
-        if feedback_type != -1:
-            self._fb_transid_result_map[trans_id] = data[12]  # feedback_code
+        is_finish = data[8] & (XCONF.FeedbackType.MOTION_START | XCONF.FeedbackType.OTHER_START) == 0
+        feedback_type, future = self._fb_registry.on_feedback(trans_id, data[12], is_finish)  # data[12]: feedback_code
+        if future is not None:
+            future._finish(0, feedback_code=data[12])
+            # GcodeFuture.wait等待的是上报通知
+            self._notify_report_waiters()
         if feedback_type & data[8] == 0:
             return
         self.__report_callback(self.FEEDBACK_ID, data, name='feedback')
@@ -57,6 +57,11 @@ class APIState(object):
     CHECK_FAILED = 101  # 等待操作完成过程检测状态连续失败次数过多
     END_EFFECTOR_HAS_FAULT = 102  # 末端配件有错误
     END_EFFECTOR_NOT_ENABLED = 103  # 末端配件未使能
+    ARM_GROUP_ABORTED = 104  # 多臂协同中止(其它机械臂出错), 动作被取消
+    CMD_QUEUE_FULL = 105  # 异步命令队列已满
+    CMD_CANCELLED = 106  # 异步命令被取消(队列关闭)
+    IK_NO_SOLUTION = 107  # 本地逆解不收敛(没有解或者超出关节限位)
+    KINEMATICS_MISMATCH = 108  # 本地运动学模型与控制器的正解/逆解不一致
 
     # 129 ~ 144: 标准modbus tcp的异常码，实际异常码(api_code - 0x80)
 
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+末端执行器(夹爪/真空吸头等)状态轮询
+所有等待共用一个后台线程, 同一个设备的多个等待共用一次读取, 每个设备的轮询间隔自适应:
+读取的值发生变化或者处于运动状态时按min_interval轮询, 否则间隔逐次加倍, 最大为max_interval(不大于原来各个等待的轮询间隔)
+"""
+
+import time
+import threading
+from ..core.utils.log import logger
+from .code import APIState
+
+# 连续读取失败超过该次数时, 等待按CHECK_FAILED结束(与原来的轮询等待一致)
+_MAX_FAILED_CNT = 10
+
+
+class PollFuture(object):
+    """
+    The handle of a polled wait, done when the check returns a code (or timeout)
+    """
+    def __init__(self, check=None, timeout=None, abort=None, moving=None):
+        self.code = None
+        self._check = check
+        self._abort = abort
+        self._moving = moving
+        self._expired = None if timeout is None else time.monotonic() + timeout
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self._event.is_set()
+
+    def add_done_callback(self, callback):
+        """
+        :param callback: called as callback(future) when the future is done (in the thread which finished it)
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def wait(self, timeout=None):
+        """
+        :param timeout: maximum waiting time(unit: second), default is None(until the timeout of the wait)
+        :return: code, See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            APIState.WAIT_FINISH_TIMEOUT if the future is not done in timeout
+        """
+        if not self._event.wait(timeout):
+            return APIState.WAIT_FINISH_TIMEOUT
+        return self.code
+
+    def _finish(self, code):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.code = code
+            self._event.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error('poll future callback exception: {}'.format(e))
+
+    @classmethod
+    def finished(cls, code):
+        future = cls()
+        future._finish(code)
+        return future
+
+
+class _Device(object):
+    def __init__(self, read, interval):
+        self.read = read
+        self.interval = interval
+        self.next_time = 0
+        self.last_value = None
+        self.failed_cnt = 0
+        self.futures = []
+
+
+class EndEffectorPoller(object):
+    def __init__(self, arm, min_interval=0.02, max_interval=0.1):
+        """
+        :param arm: XArm instance
+        :param min_interval: polling interval when the value is changing or the device is moving (unit: second)
+        :param max_interval: maximum polling interval when the value is stable (unit: second)
+        """
+        self._arm = arm
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._cond = threading.Condition()
+        self._devices = {}
+        self._thread = None
+
+    def watch(self, device, read, check, timeout=None, abort=None, moving=None):
+        """
+        :param device: the key of the device, the waits of the same device share the reads
+        :param read: read() returns (code, value), the value is compared to detect the changes
+        :param check: check(value) returns the code to finish the future or None to continue,
+            only called with the successful reads
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :param abort: abort() returns the code to finish the future or None to continue, called before every read
+        :param moving: moving(value) returns True if the device is moving (the status does not change while moving),
+            default is None (moving if the value changes)
+        :return: PollFuture
+        """
+        future = PollFuture(check, timeout, abort, moving)
+        with self._cond:
+            dev = self._devices.get(device)
+            if dev is None:
+                dev = _Device(read, self.min_interval)
+                self._devices[device] = dev
+            else:
+                # 新的等待一般是刚发送了指令, 立即按最快的间隔轮询
+                dev.interval = self.min_interval
+                dev.next_time = 0
+            dev.futures.append(future)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='EndEffectorPoller', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return future
+
+    def wait(self, device, read, check, timeout=None, abort=None, moving=None):
+        """
+        Same as watch, but wait for the result
+        :return: code
+        """
+        future = self.watch(device, read, check, timeout=timeout, abort=abort, moving=moving)
+        return future.wait()
+
+    def _run(self):
+        arm = self._arm
+        while True:
+            with self._cond:
+                if not self._devices:
+                    self._thread = None
+                    return
+                now = time.monotonic()
+                due = [(key, dev) for key, dev in self._devices.items() if dev.next_time <= now]
+                if not due:
+                    wakeup = min([dev.next_time for dev in self._devices.values()]
+                                 + [f._expired for dev in self._devices.values() for f in dev.futures if f._expired is not None])
+                    self._cond.wait(max(wakeup - now, 0))
+                    due = [(key, dev) for key, dev in self._devices.items() if dev.next_time <= time.monotonic()]
+            finished = []
+            for key, dev in due:
+                pending = []
+                for future in list(dev.futures):
+                    try:
+                        code = APIState.NOT_CONNECTED if not arm.connected else future._abort() if future._abort else None
+                    except Exception as e:
+                        logger.error('end effector poller abort exception, device={}, exception={}'.format(key, e))
+                        code = APIState.API_EXCEPTION
+                    if code is None:
+                        pending.append(future)
+                    else:
+                        finished.append((key, future, code))
+                if not pending:
+                    continue
+                try:
+                    code, value = dev.read()
+                except Exception as e:
+                    logger.error('end effector poller read exception, device={}, exception={}'.format(key, e))
+                    code, value = APIState.API_EXCEPTION, None
+                now = time.monotonic()
+                if code == 0:
+                    dev.failed_cnt = 0
+                    moving = value != dev.last_value or any(f._moving(value) for f in pending if f._moving)
+                    dev.interval = self.min_interval if moving else min(dev.interval * 2, self.max_interval)
+                    dev.last_value = value
+                else:
+                    dev.failed_cnt += 1
+                dev.next_time = now + dev.interval
+                for future in pending:
+                    result = None
+                    if code == 0:
+                        try:
+                            result = future._check(value)
+                        except Exception as e:
+                            logger.error('end effector poller check exception, device={}, exception={}'.format(key, e))
+                            result = APIState.API_EXCEPTION
+                    elif code == APIState.NOT_CONNECTED:
+                        result = code
+                    elif dev.failed_cnt > _MAX_FAILED_CNT:
+                        result = APIState.CHECK_FAILED
+                    if result is None and future._expired is not None and now >= future._expired:
+                        result = APIState.WAIT_FINISH_TIMEOUT
+                    if result is not None:
+                        finished.append((key, future, result))
+            with self._cond:
+                for key, future, _ in finished:
+                    dev = self._devices.get(key)
+                    if dev is not None and future in dev.futures:
+                        dev.futures.remove(future)
+                        if not dev.futures:
+                            self._devices.pop(key)
+            for _, future, code in finished:
+                future._finish(code)
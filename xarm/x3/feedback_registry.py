@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+指令反馈的登记表
+1. feedback_key使用进程内递增的计数生成, 不再每条指令生成uuid
+2. 每个trans_id对应一个条目, 条目带Event, 收到反馈时只唤醒等待这个trans_id的线程
+3. 条目按登记顺序保存, 超过ttl的条目(没有线程在等待, 也没有future)会被清理, 总数超过maxsize时清理最早的条目,
+   被清理的等待者/future以WAIT_FINISH_TIMEOUT结束
+   (控制器的trans_id是16位循环使用的, 同一个trans_id再次登记时旧的条目也会被清理)
+"""
+
+import time
+import threading
+import itertools
+import collections
+from ..core.utils.log import logger
+from .code import APIState
+
+
+class _FeedbackEntry(object):
+    __slots__ = ('trans_id', 'feedback_type', 'feedback_code', 'future', 'event', 'waiters', 'evicted', 'expired')
+
+    def __init__(self, trans_id, feedback_type, expired):
+        self.trans_id = trans_id
+        self.feedback_type = feedback_type
+        self.feedback_code = -1
+        self.future = None
+        self.event = threading.Event()
+        self.waiters = 0
+        self.evicted = False
+        self.expired = expired
+
+
+class FeedbackRegistry(object):
+    def __init__(self, maxsize=4096, ttl=600):
+        """
+        :param maxsize: the maximum number of the entries (trans_id) and the keys
+        :param ttl: the entry which has not received the feedback and is not waited is dropped after ttl seconds,
+            None or <= 0 means no ttl (only dropped when the number exceeds maxsize)
+        """
+        self.maxsize = max(maxsize, 1)
+        self.ttl = ttl if ttl is not None and ttl > 0 else None
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._keys = collections.OrderedDict()  # feedback_key -> trans_id
+        self._key_futures = {}  # feedback_key -> future, 发送时转到条目
+        self._entries = collections.OrderedDict()  # trans_id -> _FeedbackEntry
+        self.evicted = 0
+
+    def gen_key(self):
+        # 只在本进程内使用(不会发送给控制器), 递增计数即可保证唯一
+        return 'fb-{}'.format(next(self._counter))
+
+    def discard_key(self, feedback_key):
+        with self._lock:
+            self._keys.pop(feedback_key, None)
+
+    def pop_key(self, feedback_key):
+        """
+        :return: the trans_id of the feedback_key, -1 if the command was not sent
+        """
+        with self._lock:
+            return self._keys.pop(feedback_key, -1)
+
+    def register_future(self, feedback_key, future):
+        # future需要有trans_id属性和_finish(code, result=None, feedback_code=-1)方法
+        with self._lock:
+            self._key_futures[feedback_key] = future
+
+    def release_key(self, feedback_key):
+        with self._lock:
+            self._key_futures.pop(feedback_key, None)
+            self._keys.pop(feedback_key, None)
+
+    def release_future(self, future):
+        with self._lock:
+            entry = self._entries.get(future.trans_id, None) if future.trans_id > 0 else None
+            if entry is not None and entry.future is future:
+                entry.future = None
+
+    def bind(self, feedback_key, trans_id, feedback_type=0):
+        """
+        Called when the command with the feedback_key is sent
+        """
+        dropped = []
+        with self._lock:
+            now = time.monotonic()
+            self._keys[feedback_key] = trans_id
+            self._keys.move_to_end(feedback_key)
+            old = self._entries.pop(trans_id, None)
+            if old is not None:
+                dropped.append(old)
+            entry = _FeedbackEntry(trans_id, feedback_type, self._expired(now))
+            entry.future = self._key_futures.pop(feedback_key, None)
+            if entry.future is not None:
+                entry.future.trans_id = trans_id
+            self._entries[trans_id] = entry
+            while len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+            dropped.extend(self._prune(now))
+        self._drop(dropped)
+
+    def on_feedback(self, trans_id, feedback_code, is_finish):
+        """
+        Called when the feedback frame is received
+        :return: (feedback_type, future)
+            feedback_type: the feedback type registered when sending, -1 if the trans_id is not registered or
+                the entry has received a feedback before
+            future: the future to finish, None if not
+        """
+        with self._lock:
+            entry = self._entries.get(trans_id, None)
+            if entry is None:
+                return -1, None
+            feedback_type = -1
+            if not entry.event.is_set():
+                feedback_type = entry.feedback_type
+                entry.feedback_code = feedback_code
+                entry.event.set()
+            future = None
+            if is_finish and entry.future is not None:
+                future, entry.future = entry.future, None
+            if future is not None and entry.waiters == 0:
+                # future已经拿到结果, 没有其他等待者
+                self._entries.pop(trans_id, None)
+            return feedback_type, future
+
+    def acquire(self, trans_id):
+        """
+        :return: the entry of the trans_id, the caller must call release(entry)
+        """
+        with self._lock:
+            entry = self._entries.get(trans_id, None)
+            if entry is None:
+                # 已经被清理(或者没有登记), 重新登记, 之后收到的反馈仍然可以唤醒
+                entry = _FeedbackEntry(trans_id, 0, self._expired(time.monotonic()))
+                self._entries[trans_id] = entry
+            entry.waiters += 1
+            return entry
+
+    def release(self, entry):
+        with self._lock:
+            entry.waiters -= 1
+            if entry.waiters <= 0 and entry.future is None and self._entries.get(entry.trans_id, None) is entry:
+                self._entries.pop(entry.trans_id, None)
+
+    def clear(self):
+        with self._lock:
+            dropped = list(self._entries.values())
+            self._entries.clear()
+            self._keys.clear()
+        self._drop(dropped)
+
+    def _expired(self, now):
+        return now + self.ttl if self.ttl is not None else float('inf')
+
+    def _prune(self, now):
+        dropped = []
+        extended = 0
+        # 延长过的条目移到了末尾, 最多检查一遍, ttl很小时now + ttl可能仍然不大于now
+        while self._entries and extended < len(self._entries):
+            trans_id, entry = next(iter(self._entries.items()))
+            if len(self._entries) > self.maxsize:
+                dropped.append(entry)
+            elif entry.expired > now:
+                break
+            elif entry.waiters > 0 or entry.future is not None:
+                # 还有等待者, 延长ttl
+                entry.expired = self._expired(now)
+                self._entries.move_to_end(trans_id)
+                extended += 1
+                continue
+            self._entries.pop(trans_id)
+        return dropped
+
+    def _drop(self, entries):
+        for entry in entries:
+            self.evicted += 1
+            entry.evicted = True
+            future, entry.future = entry.future, None
+            if entry.waiters > 0 or future is not None:
+                logger.warning('feedback of trans_id {} is dropped'.format(entry.trans_id))
+            entry.event.set()
+            if future is not None:
+                future._finish(APIState.WAIT_FINISH_TIMEOUT)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'keys': len(self._keys),
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'evicted': self.evicted,
+            }
@@ -11,6 +11,7 @@ from ..core.utils import convert
 from .base import Base
 from .code import APIState
 from .decorator import xarm_is_connected
+from .ft_stream import FtStream
 
 
 class FtSensor(Base):
@@ -194,6 +195,9 @@ class FtSensor(Base):
         ret = self.arm_cmd.ft_sensor_get_data(self.version_is_ge(1, 8, 3))
         return self._check_code(ret[0]), ret[1:7]
 
+    def ft_stream(self, capacity=2500, source='ext', filters=None):
+        return FtStream(self, capacity=capacity, source=source, filters=filters)
+
     @xarm_is_connected(_type='get')
     def get_ft_sensor_config(self):
         ret = self.arm_cmd.ft_sensor_get_config()
@@ -227,13 +231,11 @@ class FtSensor(Base):
     def get_ft_sensor_sn(self):
         rd_sn = ''
         ret = [0, '']
-        for i in range(0, 14):
-            if i < 8:
-                ret = self.arm_cmd.servo_addr_r16(8, 0x0300+i)
-                ret[0] = self._check_code(ret[0])
-            else:
-                ret = self.arm_cmd.servo_addr_r16(8, 0x0400+(i-8))
-                ret[0] = self._check_code(ret[0])
+        # 一次批量读取14个寄存器, 不再逐个读取并间隔50ms
+        items = [(8, 0x0300 + i, 16) if i < 8 else (8, 0x0400 + (i - 8), 16) for i in range(0, 14)]
+        rets = self.arm_cmd.servo_addr_r_batch(items)
+        for i, ret in enumerate(rets):
+            ret[0] = self._check_code(ret[0])
             if i < 2 and ret[-1] not in [65, 73]:
                 return 1, "********"
 
@@ -241,7 +243,6 @@ class FtSensor(Base):
                 rd_sn = ''.join([rd_sn, chr(ret[-1])])
             else:
                 rd_sn = ''.join([rd_sn, '*'])
-            time.sleep(0.05)
         self.log_api_info('API -> get_ft_sensor_sn -> code={}, sn={}'.format(ret[0], rd_sn), code=ret[0])
         return ret[0], rd_sn
 
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+力传感器数据流
+由上报线程在每帧数据处理完后调用publish, 把ft_ext_force/ft_raw_force和上报时间写入环形缓冲区,
+同时经过滤波器链得到滤波后的数据, 并检测阈值穿越
+
+环形缓冲区只有上报线程写入: 先写数据再增加计数, 读方按计数复制, 复制完成后丢弃期间可能被覆盖的数据, 不需要加锁
+"""
+
+import math
+import time
+import threading
+from ..core.utils.log import logger
+
+FT_AXES = ('fx', 'fy', 'fz', 'tx', 'ty', 'tz')
+# 除了0~5(或者FT_AXES中的名字), 阈值还可以设置在合力/合力矩上
+FT_FORCE = 'force'
+FT_TORQUE = 'torque'
+
+
+class MovingAverageFilter(object):
+    """
+    Moving average of the last n samples
+    """
+    def __init__(self, n=5):
+        self.n = max(int(n), 1)
+        self.reset()
+
+    def reset(self):
+        self._buf = []
+        self._sum = [0.0] * 6
+
+    def update(self, values, dt):
+        self._buf.append(values)
+        for i in range(6):
+            self._sum[i] += values[i]
+        if len(self._buf) > self.n:
+            old = self._buf.pop(0)
+            for i in range(6):
+                self._sum[i] -= old[i]
+        cnt = len(self._buf)
+        return [x / cnt for x in self._sum]
+
+
+class LowPassFilter(object):
+    """
+    First order IIR low-pass filter, the coefficient is computed from the actual interval of the samples
+    """
+    def __init__(self, cutoff=10.0):
+        """
+        :param cutoff: cutoff frequency (unit: Hz)
+        """
+        self.cutoff = cutoff
+        self._rc = 1.0 / (2 * math.pi * cutoff)
+        self.reset()
+
+    def reset(self):
+        self._last = None
+
+    def update(self, values, dt):
+        if self._last is None or dt <= 0:
+            self._last = list(values)
+        else:
+            alpha = dt / (self._rc + dt)
+            self._last = [last + alpha * (val - last) for last, val in zip(self._last, values)]
+        return self._last
+
+
+class MedianFilter(object):
+    """
+    Median of the last n samples (removes the spikes)
+    """
+    def __init__(self, n=5):
+        self.n = max(int(n), 1)
+        self.reset()
+
+    def reset(self):
+        self._buf = []
+
+    def update(self, values, dt):
+        self._buf.append(values)
+        if len(self._buf) > self.n:
+            self._buf.pop(0)
+        cnt = len(self._buf)
+        result = []
+        for i in range(6):
+            col = sorted(row[i] for row in self._buf)
+            result.append(col[cnt // 2] if cnt % 2 else (col[cnt // 2 - 1] + col[cnt // 2]) / 2)
+        return result
+
+
+def _axis_value(values, axis):
+    if axis == FT_FORCE:
+        return math.sqrt(values[0] ** 2 + values[1] ** 2 + values[2] ** 2)
+    elif axis == FT_TORQUE:
+        return math.sqrt(values[3] ** 2 + values[4] ** 2 + values[5] ** 2)
+    return values[axis]
+
+
+class _Threshold(object):
+    def __init__(self, axis, threshold, callback, direction, hysteresis, filtered):
+        self.axis = FT_AXES.index(axis) if axis in FT_AXES else axis
+        self.threshold = threshold
+        self.callback = callback
+        self.direction = direction
+        self.hysteresis = abs(hysteresis)
+        self.filtered = filtered
+        self.above = None
+
+    def check(self, values, timestamp):
+        value = _axis_value(values, self.axis)
+        if self.above is None:
+            self.above = value > self.threshold
+            return
+        if not self.above and value > self.threshold + self.hysteresis:
+            self.above = True
+            if self.direction in ['above', 'both']:
+                self.callback(self.axis, value, timestamp)
+        elif self.above and value < self.threshold - self.hysteresis:
+            self.above = False
+            if self.direction in ['below', 'both']:
+                self.callback(self.axis, value, timestamp)
+
+
+class FtStream(object):
+    """
+    Timestamped force/torque samples from the report data (only the rich report has the ft data)
+
+    Example:
+        stream = arm.ft_stream(capacity=2500, filters=[MedianFilter(3), LowPassFilter(20)])
+        stream.add_threshold('fz', 10, lambda axis, value, ts: print('contact', value), hysteresis=1)
+        ...
+        print(stream.stats(window=0.2))  # min/max/rms of the last 200ms
+        stream.close()
+    """
+    def __init__(self, arm, capacity=2500, source='ext', filters=None):
+        """
+        :param arm: XArm instance
+        :param capacity: the number of samples in the ring buffer, default is 2500 (10 seconds at 250Hz)
+        :param source: 'ext'(ft_ext_force) or 'raw'(ft_raw_force)
+        :param filters: list of filters (MovingAverageFilter/LowPassFilter/MedianFilter or any object with
+            update(values, dt) and reset()), applied in order
+        """
+        self._arm = arm
+        self.capacity = capacity
+        self._attr = '_ft_raw_force' if source == 'raw' else '_ft_ext_force'
+        self._filters = list(filters) if filters else []
+        self._times = [0.0] * capacity
+        self._raw = [None] * capacity
+        self._filtered = [None] * capacity
+        self._count = 0
+        self._last_report_time = None
+        self._thresholds = []
+        self._lock = threading.Lock()
+        self._alive = True
+        arm._add_report_sink(self)
+
+    @property
+    def alive(self):
+        return self._alive
+
+    @property
+    def count(self):
+        """the number of samples received (including the overwritten)"""
+        return self._count
+
+    def publish(self, arm):
+        timestamp = arm._last_report_time
+        if timestamp == self._last_report_time:
+            return
+        dt = 0 if self._last_report_time is None else timestamp - self._last_report_time
+        self._last_report_time = timestamp
+        values = list(getattr(arm, self._attr))
+        if len(values) < 6:
+            return
+        filtered = values
+        for ft_filter in self._filters:
+            filtered = ft_filter.update(filtered, dt)
+        filtered = tuple(filtered)
+        index = self._count % self.capacity
+        self._times[index] = timestamp
+        self._raw[index] = tuple(values)
+        self._filtered[index] = filtered
+        self._count += 1
+        for th in self._thresholds:
+            try:
+                th.check(filtered if th.filtered else values, timestamp)
+            except Exception as e:
+                logger.error('ft threshold callback exception: {}'.format(e))
+
+    def latest(self, filtered=True):
+        """
+        :return: (timestamp, [fx, fy, fz, tx, ty, tz]), (None, None) if no sample yet
+            timestamp: time.monotonic() of the report
+        """
+        count = self._count
+        if count == 0:
+            return None, None
+        index = (count - 1) % self.capacity
+        return self._times[index], list((self._filtered if filtered else self._raw)[index])
+
+    def samples(self, n=None, window=None, filtered=True):
+        """
+        The latest samples in chronological order
+
+        :param n: the number of samples, default is None (all in the buffer)
+        :param window: only the samples of the last window seconds, default is None
+        :return: (timestamps, values), values is the list of [fx, fy, fz, tx, ty, tz]
+        """
+        count = self._count
+        n = min(count, self.capacity) if n is None else min(n, count, self.capacity)
+        data = self._filtered if filtered else self._raw
+        start = count - n
+        indexes = [i % self.capacity for i in range(start, count)]
+        times = [self._times[i] for i in indexes]
+        values = [data[i] for i in indexes]
+        # 复制期间上报线程可能已经覆盖了最旧的数据
+        overwritten = self._count - self.capacity - start
+        if overwritten > 0:
+            times = times[overwritten:]
+            values = values[overwritten:]
+        if window is not None and times:
+            expired = times[-1] - window
+            skip = 0
+            while skip < len(times) and times[skip] < expired:
+                skip += 1
+            times = times[skip:]
+            values = values[skip:]
+        return times, [list(v) for v in values]
+
+    def stats(self, n=None, window=None, filtered=True):
+        """
+        Windowed statistics of each axis
+
+        :param n: the number of the latest samples, default is None (all in the buffer)
+        :param window: only the samples of the last window seconds, default is None
+        :return: dict, None if no sample
+            {'count': n, 'min': [6], 'max': [6], 'mean': [6], 'rms': [6], 'peak_force': v, 'peak_torque': v}
+        """
+        _, values = self.samples(n=n, window=window, filtered=filtered)
+        if not values:
+            return None
+        cnt = len(values)
+        cols = list(zip(*values))
+        return {
+            'count': cnt,
+            'min': [min(col) for col in cols],
+            'max': [max(col) for col in cols],
+            'mean': [sum(col) / cnt for col in cols],
+            'rms': [math.sqrt(sum(x * x for x in col) / cnt) for col in cols],
+            'peak_force': max(_axis_value(v, FT_FORCE) for v in values),
+            'peak_torque': max(_axis_value(v, FT_TORQUE) for v in values),
+        }
+
+    def add_threshold(self, axis, threshold, callback, direction='above', hysteresis=0, filtered=True):
+        """
+        Call the callback when the value crosses the threshold
+
+        :param axis: 0~5 or 'fx'/'fy'/'fz'/'tx'/'ty'/'tz', or 'force'/'torque' (the magnitude)
+        :param threshold: the threshold value
+        :param callback: callback(axis, value, timestamp), called in the report thread, do not block it
+        :param direction: 'above'(rising over the threshold), 'below' or 'both'
+        :param hysteresis: the value must exceed threshold +/- hysteresis to cross again
+        :param filtered: check the filtered value or the raw value
+        :return: the handle for remove_threshold
+        """
+        th = _Threshold(axis, threshold, callback, direction, hysteresis, filtered)
+        _, values = self.latest(filtered=filtered)
+        if values is not None:
+            # 以当前值作为初始状态, 下一个样本就可以检测穿越
+            th.above = _axis_value(values, th.axis) > threshold
+        with self._lock:
+            # 替换列表而不是原地修改, publish遍历时不需要加锁
+            self._thresholds = self._thresholds + [th]
+        return th
+
+    def remove_threshold(self, handle=None):
+        """
+        :param handle: the return of add_threshold, default is None (remove all)
+        """
+        with self._lock:
+            self._thresholds = [] if handle is None else [th for th in self._thresholds if th is not handle]
+
+    def wait_threshold(self, axis, threshold, direction='above', timeout=None, filtered=True):
+        """
+        Wait until the value crosses the threshold, every sample is checked (the transients between two
+        calls of the property are not missed)
+
+        :param axis: 0~5 or 'fx'/'fy'/'fz'/'tx'/'ty'/'tz', or 'force'/'torque' (the magnitude)
+        :param threshold: the threshold value
+        :param direction: 'above' or 'below'
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :param filtered: check the filtered value or the raw value
+        :return: (True, value, timestamp) if crossed, (False, None, None) if timeout or disconnected
+        """
+        event = threading.Event()
+        result = []
+
+        def _callback(_, value, timestamp):
+            if not result:
+                result.append((value, timestamp))
+            event.set()
+
+        handle = self.add_threshold(axis, threshold, _callback, direction=direction, filtered=filtered)
+        try:
+            timestamp, values = self.latest(filtered=filtered)
+            if values is not None:
+                value = _axis_value(values, handle.axis)
+                if (value > threshold) if direction == 'above' else (value < threshold):
+                    return True, value, timestamp
+            expired = None if timeout is None else time.monotonic() + timeout
+            while not event.is_set():
+                if not self._alive or not self._arm.connected:
+                    break
+                remaining = 0.1 if expired is None else min(expired - time.monotonic(), 0.1)
+                if remaining <= 0:
+                    break
+                event.wait(remaining)
+        finally:
+            self.remove_threshold(handle)
+        if result:
+            return True, result[0][0], result[0][1]
+        return False, None, None
+
+    def reset(self):
+        """
+        Clear the buffer and reset the filters
+        Note: the report thread may publish at the same time, call it when the data is not used
+        """
+        for ft_filter in self._filters:
+            ft_filter.reset()
+        self._count = 0
+        self._last_report_time = None
+
+    def close(self):
+        if not self._alive:
+            return
+        self._alive = False
+        self._arm._remove_report_sink(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
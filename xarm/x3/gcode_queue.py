@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import queue
+import threading
+from ..core.utils.log import logger
+from .code import APIState
+from .parse import GcodeCompiler, GCODE_MOTION_OPS
+from .parse import GCODE_OP_MOVE_LINE, GCODE_OP_MOVE_CIRCLE, GCODE_OP_MOVE_JOINT, GCODE_OP_MOVE_GOHOME, GCODE_OP_MOVE_ARC_LINE
+
+# 支持运动反馈的指令(G1/G2/G7/G8/G9), 其它指令在发送(执行)完成时就结束
+_GCODE_FEEDBACK_OPS = (GCODE_OP_MOVE_LINE, GCODE_OP_MOVE_CIRCLE, GCODE_OP_MOVE_JOINT,
+                       GCODE_OP_MOVE_GOHOME, GCODE_OP_MOVE_ARC_LINE)
+
+
+class GcodeFuture(object):
+    """
+    The handle of a command submitted by send_cmd_async
+
+    The motion commands (G1/G2/G7/G8/G9) are done when the controller feedback of the command is received
+    (firmware >= 2.0.102), the other commands are done when they are executed
+    """
+    def __init__(self, arm, command):
+        self._arm = arm
+        self.command = command
+        self.trans_id = -1
+        self.code = None
+        self.result = None
+        self.feedback_code = -1
+        self._sent = False
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def sent(self):
+        """whether the command has been sent to the controller"""
+        return self._sent
+
+    @property
+    def done(self):
+        return self._event.is_set()
+
+    def add_done_callback(self, callback):
+        """
+        :param callback: called as callback(future) when the future is done (in the thread which finished it)
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def wait(self, timeout=None):
+        """
+        Wait for the command to finish
+        The future is finished with the error if the arm is disconnected, has error or is stopped while waiting
+
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :return: code, See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        arm = self._arm
+        expired = None if timeout is None else time.monotonic() + timeout
+        state5_time = 0
+        seq = arm._report_seq
+        while not self._event.is_set():
+            if expired is not None and time.monotonic() >= expired:
+                return APIState.WAIT_FINISH_TIMEOUT
+            if self._sent:
+                # 与_wait_feedback的判断一致
+                if not arm.connected:
+                    self._finish(APIState.NOT_CONNECTED)
+                    break
+                if arm.error_code != 0:
+                    self._finish(APIState.HAS_ERROR)
+                    break
+                code, state = arm._get_wait_state()
+                if code == 0 and state >= 4:
+                    if state == 5 and state5_time == 0:
+                        state5_time = time.monotonic()
+                    if state != 5 or time.monotonic() - state5_time >= 1:
+                        self._finish(APIState.EMERGENCY_STOP)
+                        break
+                else:
+                    state5_time = 0
+            seq = arm._wait_report_notify(seq)
+        return self.code
+
+    def _set_sent(self, result=None):
+        self.result = result
+        self._sent = True
+
+    def _finish(self, code, result=None, feedback_code=-1):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.code = code
+            if result is not None:
+                self.result = result
+            self.feedback_code = feedback_code
+            self._event.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error('gcode future callback exception: {}'.format(e))
+
+
+class GcodeQueue(object):
+    """
+    Non-blocking G-code submission
+    The commands are queued (bounded) and sent in order by a worker thread, the motion commands are sent
+    only when the number of commands cached in the controller is less than lookahead
+
+    Example:
+        futures = [arm.send_cmd_async(line) for line in lines]  # returns immediately unless the queue is full
+        ...  # prepare the next program
+        code = futures[-1].wait()
+    """
+    def __init__(self, arm, maxsize=1024, lookahead=None):
+        """
+        :param arm: XArm instance
+        :param maxsize: the maximum number of commands waiting in the queue
+        :param lookahead: the maximum number of commands cached in the controller, default is None (max_cmdnum)
+        """
+        self._arm = arm
+        self.lookahead = lookahead
+        self._que = queue.Queue(maxsize)
+        self._alive = True
+        self._thread = threading.Thread(target=self._run, name='GcodeQueue', daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self):
+        return self._alive
+
+    @property
+    def size(self):
+        """the number of commands waiting in the queue"""
+        return self._que.qsize()
+
+    def submit(self, command, timeout=None):
+        """
+        Queue a G-code command
+
+        :param command: G-code command
+        :param timeout: maximum waiting time for the queue space(unit: second), default is None(no timeout)
+        :return: GcodeFuture, finished with APIState.CMD_QUEUE_FULL if no space in time
+        """
+        future = GcodeFuture(self._arm, command)
+        if not self._alive:
+            future._finish(APIState.CMD_CANCELLED)
+            return future
+        try:
+            self._que.put(future, timeout=timeout)
+        except queue.Full:
+            future._finish(APIState.CMD_QUEUE_FULL)
+        return future
+
+    def cancel(self):
+        """
+        Cancel the commands waiting in the queue (finished with APIState.CMD_CANCELLED),
+        the commands already sent are not affected
+        """
+        while True:
+            try:
+                future = self._que.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None:
+                future._finish(APIState.CMD_CANCELLED)
+
+    def close(self, cancel=True):
+        """
+        Stop the worker
+
+        :param cancel: cancel the commands waiting in the queue, or send them before stopping
+        """
+        if not self._alive:
+            return
+        if cancel:
+            self.cancel()
+        self._que.put(None)
+        if threading.current_thread() != self._thread:
+            self._thread.join()
+
+    def _run(self):
+        arm = self._arm
+        while True:
+            future = self._que.get()
+            if future is None:
+                break
+            if not arm.connected:
+                future._finish(APIState.NOT_CONNECTED)
+                continue
+            try:
+                self._send(future)
+            except Exception as e:
+                logger.error('gcode queue exception, command={}, exception={}'.format(future.command, e))
+                future._finish(APIState.API_EXCEPTION)
+        self._alive = False
+        self.cancel()
+
+    def _send(self, future):
+        arm = self._arm
+        inst = GcodeCompiler.compile_line(future.command)
+        if inst is None:
+            future._finish(0)
+            return
+        op, args, line = inst
+        if op in GCODE_MOTION_OPS:
+            lookahead = arm._max_cmd_num if self.lookahead is None else min(max(self.lookahead, 1), arm._max_cmd_num)
+            arm.wait_until_cmdnum_lt_max(lookahead)
+        feedback_key = None
+        kwargs = {}
+        if op in _GCODE_FEEDBACK_OPS and arm._support_feedback:
+            feedback_key = arm._new_feedback_key()
+            kwargs['feedback_key'] = feedback_key
+            arm._register_feedback_future(feedback_key, future)
+        try:
+            ret = arm._exec_gcode(op, args, line, **kwargs)
+        finally:
+            if feedback_key is not None:
+                arm._release_feedback_key(feedback_key)
+        code = ret[0] if isinstance(ret, (tuple, list)) else ret if isinstance(ret, int) else 0
+        if code != 0 or future.trans_id <= 0:
+            arm._release_feedback_future(future)
+            future._finish(code, ret)
+        else:
+            future._set_sent(ret)
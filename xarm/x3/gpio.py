@@ -12,6 +12,7 @@ from ..core.config.x_config import XCONF
 from .code import APIState
 from .base import Base
 from .decorator import xarm_is_connected, xarm_is_ready, xarm_wait_until_not_pause, xarm_is_not_simulation_mode, xarm_wait_until_cmdnum_lt_max
+from .ee_poller import PollFuture
 
 
 class GPIO(Base):
@@ -276,8 +277,20 @@ class GPIO(Base):
         # print('cgpio_digital_output_fun:', ret[12])
         return code, states
 
+    @property
+    def _cgpio_cache_available(self):
+        # 只有rich上报带有cgpio状态
+        return self._enable_report and self._report_type == 'rich' and self._cgpio_cache.seq > 0
+
     @xarm_is_connected(_type='get')
     def get_cgpio_li_state(self, Ci_Li, timeout=3, is_ci=True):
+        if self._cgpio_cache_available:
+            # 与查询方式一致, 控制器有错误(查询返回ERR_CODE)时返回False, 等待过程中出现错误也返回False
+            abort = lambda: not self.connected or self.state == 4 or self.error_code != 0
+            if abort():
+                return False
+            pattern = {CI_num if is_ci else CI_num + 8: int(CI) for CI_num, CI in enumerate(Ci_Li)}
+            return self._cgpio_cache.wait(pattern, timeout=timeout, abort=abort) and self.error_code == 0
         start_time = time.monotonic()
         is_first = True
         while is_first or time.monotonic() - start_time < timeout:
@@ -300,6 +313,50 @@ class GPIO(Base):
             time.sleep(0.1)
         return False
 
+    @xarm_is_connected(_type='set')
+    def wait_cgpio_digital(self, pattern, timeout=None, is_output=False):
+        expired = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if not self.connected:
+                return APIState.NOT_CONNECTED
+            if self.state == 4:
+                return APIState.EMERGENCY_STOP
+            if self._cgpio_cache_available:
+                if self.error_code != 0:
+                    return APIState.HAS_ERROR
+                remaining = None if expired is None else max(expired - time.monotonic(), 0)
+                if self._cgpio_cache.wait(pattern, timeout=remaining, is_output=is_output,
+                                          abort=lambda: not self.connected or self.state == 4 or self.error_code != 0):
+                    return 0
+            else:
+                # 没有rich上报时查询
+                code, states = self.get_cgpio_state()
+                if code == XCONF.UxbusState.ERR_CODE:
+                    return APIState.HAS_ERROR
+                if code == 0:
+                    if is_output:
+                        digitals = [states[5] >> i & 0x0001 for i in range(len(states[11]))]
+                    else:
+                        digitals = [states[3] >> i & 0x0001 if states[10][i] in [0, 255] else 1 for i in range(len(states[10]))]
+                    items = pattern.items() if isinstance(pattern, dict) else enumerate(pattern)
+                    if all(value is None or (ionum < len(digitals) and digitals[ionum] == int(value)) for ionum, value in items):
+                        return 0
+                if expired is None or time.monotonic() < expired:
+                    time.sleep(0.1)
+            if expired is not None and time.monotonic() >= expired:
+                return APIState.WAIT_FINISH_TIMEOUT
+
+    def get_cgpio_digital_cache(self):
+        if not self._cgpio_cache_available:
+            return APIState.CMD_NOT_EXIST, None
+        return 0, self._cgpio_cache.get()
+
+    def register_cgpio_edge_callback(self, callback, ionum=None, edge='both', is_output=False):
+        return self._cgpio_cache.register_edge_callback(callback, ionum=ionum, edge=edge, is_output=is_output)
+
+    def release_cgpio_edge_callback(self, callback=None):
+        return self._cgpio_cache.release_edge_callback(callback)
+
     @xarm_is_connected(_type='get')
     def get_tgpio_li_state(self, Ti_Li, timeout=3):
         start_time = time.monotonic()
@@ -326,7 +383,7 @@ class GPIO(Base):
     @xarm_wait_until_cmdnum_lt_max
     @xarm_is_ready(_type='set')
     @xarm_is_not_simulation_mode(ret=0)
-    def set_suction_cup(self, on, wait=True, timeout=3, delay_sec=None):
+    def set_suction_cup(self, on, wait=True, timeout=3, delay_sec=None, **kwargs):
         if on:
             code1 = self.set_tgpio_digital(ionum=0, value=1, delay_sec=delay_sec)
             code2 = self.set_tgpio_digital(ionum=1, value=0, delay_sec=delay_sec)
@@ -334,29 +391,32 @@ class GPIO(Base):
             code1 = self.set_tgpio_digital(ionum=0, value=0, delay_sec=delay_sec)
             code2 = self.set_tgpio_digital(ionum=1, value=1, delay_sec=delay_sec)
         code = code1 if code2 == 0 else code2
-        if code == 0 and wait:
-            start = time.monotonic()
-            code = APIState.SUCTION_CUP_TOUT
+        return_future = not wait and kwargs.get('return_future', False)
+        if code == 0 and (wait or return_future):
             if delay_sec is not None and delay_sec > 0:
                 timeout += delay_sec
-            while time.monotonic() - start < timeout:
-                ret = self.get_suction_cup()
-                if ret[0] == XCONF.UxbusState.ERR_CODE:
-                    code = XCONF.UxbusState.ERR_CODE
-                    break
-                if ret[0] == 0:
-                    if on and ret[1] == 1:
-                        code = 0
-                        break
-                    if not on and ret[1] == 0:
-                        code = 0
-                        break
-                if not self.connected or self.state == 4:
-                    code = APIState.EMERGENCY_STOP
-                    break
-                time.sleep(0.1)
+            future = self.__watch_suction_cup(on, timeout)
+            if return_future:
+                return future
+            code = future.wait()
+            code = APIState.SUCTION_CUP_TOUT if code == APIState.WAIT_FINISH_TIMEOUT \
+                else APIState.EMERGENCY_STOP if code == APIState.NOT_CONNECTED else code
         self.log_api_info('API -> set_suction_cup(on={}, wait={}, delay_sec={}) -> code={}'.format(on, wait, delay_sec, code), code=code)
-        return code
+        return PollFuture.finished(code) if return_future else code
+
+    def __read_suction_cup(self):
+        ret = self.get_suction_cup()
+        # 控制器有错误时按成功读取返回, 由check结束等待
+        return (0, ret[1] if ret[0] == 0 else None) if ret[0] in [0, XCONF.UxbusState.ERR_CODE] else (ret[0], None)
+
+    def __watch_suction_cup(self, state, timeout):
+        def _check(value):
+            if value is None:
+                return XCONF.UxbusState.ERR_CODE
+            return 0 if (state and value == 1) or (not state and value == 0) else None
+
+        return self._ee_poller.watch('suction_cup', self.__read_suction_cup, _check, timeout=timeout,
+                                     abort=lambda: APIState.EMERGENCY_STOP if self.state == 4 else None)
 
     @xarm_is_connected(_type='get')
     def get_suction_cup(self):
@@ -403,21 +463,6 @@ class GPIO(Base):
     @xarm_is_connected(_type='set')
     @xarm_is_not_simulation_mode(ret=False)
     def check_air_pump_state(self, state, timeout=3):
-        start_time = time.monotonic()
-        is_first = True
-        while is_first or time.monotonic() - start_time < timeout:
-            is_first = False
-            if not self.connected or self.state == 4:
-                return False
-            ret = self.get_suction_cup()
-            if ret[0] == XCONF.UxbusState.ERR_CODE:
-                return False
-            if ret[0] == 0:
-                if state and ret[1] == 1:
-                    return True
-                if not state and ret[1] == 0:
-                    return True
-            time.sleep(0.1)
-        return False
+        return self.__watch_suction_cup(state, timeout).wait() == 0
 
 
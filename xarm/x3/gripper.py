@@ -14,6 +14,7 @@ from ..core.utils import convert
 from .code import APIState
 from .gpio import GPIO
 from .decorator import xarm_is_connected, xarm_wait_until_not_pause, xarm_is_not_simulation_mode
+from .ee_poller import PollFuture
 
 
 class Gripper(GPIO):
@@ -133,7 +134,10 @@ class Gripper(GPIO):
     @xarm_is_connected(_type='set')
     def set_gripper_position(self, pos, wait=False, speed=None, auto_enable=False, timeout=None, is_modbus=True, **kwargs):
         if is_modbus:
-            return self._set_modbus_gripper_position(pos, wait=wait, speed=speed, auto_enable=auto_enable, timeout=timeout, **kwargs)
+            ret = self._set_modbus_gripper_position(pos, wait=wait, speed=speed, auto_enable=auto_enable, timeout=timeout, **kwargs)
+            if not wait and kwargs.get('return_future', False) and not isinstance(ret, PollFuture):
+                ret = PollFuture.finished(ret)
+            return ret
         else:
             return self._set_gripper_position(pos, wait=wait, speed=speed, auto_enable=auto_enable, timeout=timeout, **kwargs)
 
@@ -369,89 +373,67 @@ class Gripper(GPIO):
             return ret[0], None
             # return _ if err == 0 else XCONF.UxbusState.ERR_CODE, None
 
-    def __check_gripper_position(self, target_pos, timeout=None):
-        is_add = True
-        last_pos = 0
-        _, p = self._get_modbus_gripper_position()
-        if _ == 0 and p is not None:
-            last_pos = int(p)
-            if last_pos == target_pos:
-                return 0
-            is_add = True if target_pos > last_pos else False
-        count = 0
-        count2 = 0
+    def __watch_gripper_position(self, target_pos, timeout=None):
         if not timeout or not isinstance(timeout, (int, float)) or timeout <= 0:
             timeout = 10
-        expired = time.monotonic() + timeout
-        failed_cnt = 0
-        code = APIState.WAIT_FINISH_TIMEOUT
-        while self.connected and time.monotonic() < expired:
-            _, p = self._get_modbus_gripper_position()
+        _, p = self._get_modbus_gripper_position()
+        if _ == 0 and p is not None and int(p) == target_pos:
+            return PollFuture.finished(0)
+        # 原来按0.2秒轮询计数(8次没有靠近目标/10次越过目标), 轮询间隔自适应后改为按时间判断
+        state = {
+            'last_pos': int(p) if _ == 0 and p is not None else 0,
+            'is_add': _ != 0 or p is None or target_pos > int(p),
+            'stall_time': None,
+            'over_time': None,
+        }
+
+        def _check(cur_pos):
+            if cur_pos is None:
+                return None
+            cur_pos = int(cur_pos)
+            now = time.monotonic()
+            if abs(target_pos - cur_pos) <= 1:
+                return 0
+            is_add = state['is_add']
+            if (is_add and cur_pos <= state['last_pos']) or (not is_add and cur_pos >= state['last_pos']):
+                state['stall_time'] = state['stall_time'] or now
+            elif (is_add and cur_pos <= target_pos) or (not is_add and cur_pos >= target_pos):
+                state['last_pos'] = cur_pos
+                state['stall_time'] = None
+                state['over_time'] = None
+            else:
+                state['over_time'] = state['over_time'] or now
+                if now - state['over_time'] >= 2:
+                    return 0
+            if state['stall_time'] and now - state['stall_time'] >= 1.6:
+                return 0
+            return None
+
+        def _abort():
             if self._gripper_error_code != 0:
                 print('xArm Gripper ErrorCode: {}'.format(self._gripper_error_code))
                 return APIState.END_EFFECTOR_HAS_FAULT
-            failed_cnt = 0 if _ == 0 and p is not None else failed_cnt + 1
-            if _ == 0 and p is not None:
-                cur_pos = int(p)
-                if abs(target_pos - cur_pos) <= 1:
-                    return 0
-                if is_add:
-                    if cur_pos <= last_pos:
-                        count += 1
-                    elif cur_pos <= target_pos:
-                        last_pos = cur_pos
-                        count = 0
-                        count2 = 0
-                    else:
-                        count2 += 1
-                        if count2 >= 10:
-                            return 0
-                else:
-                    if cur_pos >= last_pos:
-                        count += 1
-                    elif cur_pos >= target_pos:
-                        last_pos = cur_pos
-                        count = 0
-                        count2 = 0
-                    else:
-                        count2 += 1
-                        if count2 >= 10:
-                            return 0
-                if count >= 8:
-                    return 0
-            else:
-                if failed_cnt > 10:
-                    return APIState.CHECK_FAILED
-            time.sleep(0.2)
-        return code
+            return None
+
+        return self._ee_poller.watch('xarm_gripper_position', self._get_modbus_gripper_position, _check,
+                                     timeout=timeout, abort=_abort)
 
-    def __check_gripper_status(self, timeout=None):
-        start_move = False
-        not_start_move_cnt = 0
-        failed_cnt = 0
+    def __watch_gripper_status(self, timeout=None):
         if not timeout or not isinstance(timeout, (int, float)) or timeout <= 0:
             timeout = 10
-        expired = time.monotonic() + timeout
-        code = APIState.WAIT_FINISH_TIMEOUT
-        while self.connected and time.monotonic() < expired:
-            _, status = self.get_gripper_status()
-            failed_cnt = 0 if _ == 0 else failed_cnt + 1
-            if _ == 0:
-                if status & 0x03 == 0 or status & 0x03 == 2:
-                    if start_move:
-                        return 0
-                    else:
-                        not_start_move_cnt += 1
-                        if not_start_move_cnt > 20:
-                            return 0
-                elif not start_move:
-                    not_start_move_cnt = 0
-                    start_move = True
-            else:
-                if failed_cnt > 10:
-                    return APIState.CHECK_FAILED
-            time.sleep(0.1)
-        return code
+        # 原来按0.1秒轮询, 20次都没有开始运动就认为已经完成
+        state = {'start_move': False, 'start_time': time.monotonic()}
+
+        def _check(status):
+            if status & 0x03 == 0 or status & 0x03 == 2:
+                if state['start_move'] or time.monotonic() - state['start_time'] > 2:
+                    return 0
+            elif not state['start_move']:
+                state['start_move'] = True
+            return None
+
+        return self._ee_poller.watch('xarm_gripper_status', self.get_gripper_status, _check, timeout=timeout,
+                                     moving=lambda status: status & 0x03 not in [0, 2])
 
     @xarm_is_connected(_type='set')
     def _set_modbus_gripper_position(self, pos, wait=False, speed=None, auto_enable=False, timeout=None, **kwargs):
@@ -484,11 +466,12 @@ class Gripper(GPIO):
             print('xArm Gripper ErrorCode: {}'.format(self._gripper_error_code))
             return APIState.END_EFFECTOR_HAS_FAULT
         ret[0] = self._check_modbus_code(ret, only_check_code=True)
-        if wait and ret[0] == 0:
+        if (wait or kwargs.get('return_future', False)) and ret[0] == 0:
             if self.gripper_is_support_status:
-                return self.__check_gripper_status(timeout=timeout)
+                future = self.__watch_gripper_status(timeout=timeout)
             else:
-                return self.__check_gripper_position(pos, timeout=timeout)
+                future = self.__watch_gripper_position(pos, timeout=timeout)
+            return future.wait() if wait else future
         return ret[0]
 
     @xarm_is_connected(_type='get')
@@ -531,44 +514,29 @@ class Gripper(GPIO):
             return code, []
         return self.getset_tgpio_modbus_data(data_frame, min_res_len=min_res_len, ignore_log=True)
 
-    def __bio_gripper_wait_motion_completed(self, timeout=5, **kwargs):
-        failed_cnt = 0
-        expired = time.monotonic() + timeout
-        code = APIState.WAIT_FINISH_TIMEOUT
+    def __watch_bio_gripper_motion(self, timeout=5, **kwargs):
         check_detected = kwargs.get('check_detected', False)
-        while time.monotonic() < expired:
-            _, status = self.get_bio_gripper_status()
-            failed_cnt = 0 if _ == 0 else failed_cnt + 1
-            if _ == 0:
-                code = code if (status & 0x03) == XCONF.BioGripperState.IS_MOTION \
-                    else APIState.END_EFFECTOR_HAS_FAULT if (status & 0x03) == XCONF.BioGripperState.IS_FAULT \
-                    else 0 if not check_detected or (status & 0x03) == XCONF.BioGripperState.IS_DETECTED else code
-            else:
-                code = APIState.NOT_CONNECTED if _ == APIState.NOT_CONNECTED else APIState.CHECK_FAILED if failed_cnt > 10 else code
-            if code != APIState.WAIT_FINISH_TIMEOUT:
-                break
-            time.sleep(0.1)
-        if self.bio_gripper_error_code != 0:
-            print('BIO Gripper ErrorCode: {}'.format(self.bio_gripper_error_code))
-        if code == 0 and not self.bio_gripper_is_enabled:
-            code = APIState.END_EFFECTOR_NOT_ENABLED
-        return code
+
+        def _check(status):
+            code = None if (status & 0x03) == XCONF.BioGripperState.IS_MOTION \
+                else APIState.END_EFFECTOR_HAS_FAULT if (status & 0x03) == XCONF.BioGripperState.IS_FAULT \
+                else 0 if not check_detected or (status & 0x03) == XCONF.BioGripperState.IS_DETECTED else None
+            if code is not None:
+                if self.bio_gripper_error_code != 0:
+                    print('BIO Gripper ErrorCode: {}'.format(self.bio_gripper_error_code))
+                if code == 0 and not self.bio_gripper_is_enabled:
+                    code = APIState.END_EFFECTOR_NOT_ENABLED
+            return code
+
+        return self._ee_poller.watch('bio_gripper', self.get_bio_gripper_status, _check, timeout=timeout,
+                                     moving=lambda status: (status & 0x03) == XCONF.BioGripperState.IS_MOTION)
+
+    def __bio_gripper_wait_motion_completed(self, timeout=5, **kwargs):
+        return self.__watch_bio_gripper_motion(timeout=timeout, **kwargs).wait()
 
     def __bio_gripper_wait_enable_completed(self, timeout=3):
-        failed_cnt = 0
-        expired = time.monotonic() + timeout
-        code = APIState.WAIT_FINISH_TIMEOUT
-        while time.monotonic() < expired:
-            _, status = self.get_bio_gripper_status()
-            failed_cnt = 0 if _ == 0 else failed_cnt + 1
-            if _ == 0:
-                code = 0 if self.bio_gripper_is_enabled else code
-            else:
-                code = APIState.NOT_CONNECTED if _ == APIState.NOT_CONNECTED else APIState.CHECK_FAILED if failed_cnt > 10 else code
-            if code != APIState.WAIT_FINISH_TIMEOUT:
-                break
-            time.sleep(0.1)
-        return code
+        return self._ee_poller.wait('bio_gripper', self.get_bio_gripper_status,
+                                    lambda status: 0 if self.bio_gripper_is_enabled else None, timeout=timeout)
 
     @xarm_is_connected(_type='set')
     @xarm_is_not_simulation_mode(ret=False)
@@ -597,15 +565,16 @@ class Gripper(GPIO):
 
     @xarm_is_connected(_type='set')
     def set_bio_gripper_position(self, pos, speed=0, wait=True, timeout=5, **kwargs):
+        return_future = not wait and kwargs.get('return_future', False)
         if kwargs.get('wait_motion', True):
             has_error = self.error_code != 0
             is_stop = self.is_stop
             code = self.wait_move()
             if not (code == 0 or (is_stop and code == APIState.EMERGENCY_STOP)
                     or (has_error and code == APIState.HAS_ERROR)):
-                return code
+                return PollFuture.finished(code) if return_future else code
         if self.check_is_simulation_robot():
-            return 0
+            return PollFuture.finished(0) if return_future else 0
         if kwargs.get('auto_enable', False) and not self.bio_gripper_is_enabled:
             self.set_bio_gripper_enable(True)
         if speed > 0 and speed != self.bio_gripper_speed:
@@ -616,6 +585,8 @@ class Gripper(GPIO):
         if code == 0 and wait:
             code = self.__bio_gripper_wait_motion_completed(timeout=timeout)
         self.log_api_info('API -> set_bio_gripper_position(pos={}, wait={}, timeout={}) ->code={}'.format(pos, wait, timeout, code), code=code)
+        if return_future:
+            return self.__watch_bio_gripper_motion(timeout=timeout) if code == 0 else PollFuture.finished(code)
         return code
 
     @xarm_is_connected(_type='set')
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import threading
+from ..core.utils.log import logger
+
+EDGE_RISING = 'rising'
+EDGE_FALLING = 'falling'
+EDGE_BOTH = 'both'
+
+
+class CGpioCache(object):
+    """
+    控制器GPIO数字量缓存, 由上报线程在每帧数据处理完后调用publish(只有rich上报带有cgpio状态)
+    记录每个IO最后一次变化的时间, 检测上升/下降沿并调用注册的回调, 等待IO状态不需要再查询
+    """
+    def __init__(self, states=None):
+        self._cond = threading.Condition()
+        self._edge_callbacks = []
+        self.reset(states)
+
+    def reset(self, states=None):
+        """
+        :param states: the default _cgpio_states of Base (not from the report), ignored by publish
+        """
+        with self._cond:
+            self._states = states
+            self._seq = 0
+            self._inputs = []
+            self._outputs = []
+            self._input_times = []
+            self._output_times = []
+
+    @property
+    def seq(self):
+        """the number of reports received, 0 means the cache is not available"""
+        return self._seq
+
+    def get(self):
+        """
+        :return: dict of the digital states
+            inputs/outputs: list of 0/1, 0~7 are CI/CO, 8~15 are DI/DO
+            input_times/output_times: time.monotonic() of the last change of each IO, 0 if never changed
+            seq: the number of reports received
+        """
+        with self._cond:
+            return {
+                'inputs': list(self._inputs),
+                'outputs': list(self._outputs),
+                'input_times': list(self._input_times),
+                'output_times': list(self._output_times),
+                'seq': self._seq,
+            }
+
+    def publish(self, arm):
+        states = arm._cgpio_states
+        if states is self._states:
+            return
+        self._states = states
+        # 与get_cgpio_li_state的计算方式一致: 配置了功能的输入IO按1处理
+        inputs = [states[3] >> i & 0x0001 if states[10][i] in [0, 255] else 1 for i in range(len(states[10]))]
+        outputs = [states[5] >> i & 0x0001 for i in range(len(states[11]))]
+        now = time.monotonic()
+        edges = []
+        with self._cond:
+            if self._seq == 0 or len(inputs) != len(self._inputs) or len(outputs) != len(self._outputs):
+                self._input_times = [0] * len(inputs)
+                self._output_times = [0] * len(outputs)
+            else:
+                for is_output, old, new, times in ((False, self._inputs, inputs, self._input_times),
+                                                    (True, self._outputs, outputs, self._output_times)):
+                    for i in range(len(new)):
+                        if old[i] != new[i]:
+                            times[i] = now
+                            edges.append((i, new[i], is_output))
+            self._inputs = inputs
+            self._outputs = outputs
+            self._seq += 1
+            self._cond.notify_all()
+            callbacks = self._edge_callbacks if edges else []
+        for ionum, value, is_output in edges:
+            for callback, cb_ionum, edge, cb_is_output in callbacks:
+                if cb_is_output != is_output or (cb_ionum is not None and cb_ionum != ionum):
+                    continue
+                if edge == EDGE_RISING and value != 1 or edge == EDGE_FALLING and value != 0:
+                    continue
+                try:
+                    callback(ionum, value, now)
+                except Exception as e:
+                    logger.error('cgpio edge callback exception: {}'.format(e))
+
+    def match(self, pattern, is_output=False):
+        """
+        :param pattern: dict of {ionum: value} or list of value (None means any)
+        """
+        values = self._outputs if is_output else self._inputs
+        items = pattern.items() if isinstance(pattern, dict) else enumerate(pattern)
+        for ionum, value in items:
+            if value is None:
+                continue
+            if ionum >= len(values) or values[ionum] != int(value):
+                return False
+        return True
+
+    def wait(self, pattern, timeout=None, is_output=False, abort=None):
+        """
+        Wait until the digital states match the pattern
+
+        :param pattern: dict of {ionum: value} or list of value (None means any)
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :param abort: called every 0.1 second while waiting, stop waiting if it returns True
+        :return: True if matched else False
+        """
+        expired = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not (self._seq > 0 and self.match(pattern, is_output=is_output)):
+                if abort is not None and abort():
+                    return False
+                remaining = 0.1 if expired is None else min(expired - time.monotonic(), 0.1)
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def register_edge_callback(self, callback, ionum=None, edge=EDGE_BOTH, is_output=False):
+        if not callable(callback) or edge not in [EDGE_RISING, EDGE_FALLING, EDGE_BOTH]:
+            return False
+        with self._cond:
+            # 替换列表而不是原地修改, publish在锁外遍历
+            self._edge_callbacks = self._edge_callbacks + [(callback, ionum, edge, is_output)]
+        return True
+
+    def release_edge_callback(self, callback=None):
+        with self._cond:
+            if callback is None:
+                self._edge_callbacks = []
+            else:
+                self._edge_callbacks = [item for item in self._edge_callbacks if item[0] != callback]
+        return True
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+本地运动学
+由控制器的DH参数(get_dh_params)、TCP偏移和用户坐标系偏移建立运动链, 在本地计算正解/逆解/雅可比矩阵, 不需要与控制器通信
+位姿的单位是mm和rad, 姿态是roll/pitch/yaw(R = Rz(yaw) * Ry(pitch) * Rx(roll)), 位姿是TCP在用户坐标系下的位姿(与get_fk一致)
+
+get_dh_params没有说明每个关节4个参数的顺序和DH的形式(标准/改进), from_arm用控制器的get_fk结果校验,
+在所有可能的组合中选择误差最小的一个, 再用控制器的get_ik结果复核, 建立之后可以save到文件, 没有连接时用load加载
+"""
+
+import json
+import math
+import random
+import itertools
+from ..core.config.x_config import XCONF
+from ..core.utils.log import logger
+from .code import APIState
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DH_FIELDS = ('theta', 'd', 'alpha', 'a')
+# get_dh_params每个关节4个参数的默认顺序
+DH_ORDER = DH_FIELDS
+
+
+def pose_to_matrix(pose):
+    """
+    :param pose: [x(mm), y(mm), z(mm), roll(rad), pitch(rad), yaw(rad)]
+    :return: 4x4 homogeneous matrix (list of rows)
+    """
+    x, y, z, roll, pitch, yaw = pose[:6]
+    cr, sr = math.cos(roll), math.sin(roll)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    return [
+        [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr, x],
+        [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr, y],
+        [-sp, cp * sr, cp * cr, z],
+        [0.0, 0.0, 0.0, 1.0],
+    ]
+
+
+def matrix_to_pose(m):
+    """
+    :param m: 4x4 homogeneous matrix
+    :return: [x(mm), y(mm), z(mm), roll(rad), pitch(rad), yaw(rad)]
+    """
+    pitch = math.atan2(-m[2][0], math.sqrt(m[0][0] ** 2 + m[1][0] ** 2))
+    if abs(math.cos(pitch)) < 1e-9:
+        # 万向节锁, yaw取0
+        roll = math.atan2(m[0][1] if pitch > 0 else -m[0][1], m[1][1])
+        yaw = 0.0
+    else:
+        roll = math.atan2(m[2][1], m[2][2])
+        yaw = math.atan2(m[1][0], m[0][0])
+    return [m[0][3], m[1][3], m[2][3], roll, pitch, yaw]
+
+
+def _matmul(a, b):
+    return [[a[i][0] * b[0][j] + a[i][1] * b[1][j] + a[i][2] * b[2][j] + a[i][3] * b[3][j] for j in range(4)]
+            for i in range(4)]
+
+
+def _inverse(m):
+    # 刚体变换的逆: [R^T, -R^T * p]
+    r = [[m[j][i] for j in range(3)] for i in range(3)]
+    p = [-(r[i][0] * m[0][3] + r[i][1] * m[1][3] + r[i][2] * m[2][3]) for i in range(3)]
+    return [r[0] + [p[0]], r[1] + [p[1]], r[2] + [p[2]], [0.0, 0.0, 0.0, 1.0]]
+
+
+def _rotation_error(target, current):
+    """
+    :return: the rotation vector of target * current^T (unit: rad)
+    """
+    r = [[sum(target[i][k] * current[j][k] for k in range(3)) for j in range(3)] for i in range(3)]
+    cos_angle = max(min((r[0][0] + r[1][1] + r[2][2] - 1) / 2, 1.0), -1.0)
+    angle = math.acos(cos_angle)
+    v = [r[2][1] - r[1][2], r[0][2] - r[2][0], r[1][0] - r[0][1]]
+    if angle < 1e-9:
+        return [v[0] / 2, v[1] / 2, v[2] / 2]
+    sin_angle = math.sin(angle)
+    if sin_angle < 1e-6:
+        # 接近180度, 从对称部分取旋转轴
+        axis = [math.sqrt(max((r[i][i] + 1) / 2, 0)) for i in range(3)]
+        k = axis.index(max(axis))
+        for i in range(3):
+            if i != k:
+                axis[i] = math.copysign(axis[i], r[k][i] + r[i][k])
+        return [angle * a for a in axis]
+    return [angle * x / (2 * sin_angle) for x in v]
+
+
+def _solve(a, b):
+    # 高斯消元(列主元), a是n x n, b是n
+    n = len(b)
+    m = [list(a[i]) + [b[i]] for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda i: abs(m[i][col]))
+        if abs(m[pivot][col]) < 1e-15:
+            continue
+        m[col], m[pivot] = m[pivot], m[col]
+        for i in range(col + 1, n):
+            f = m[i][col] / m[col][col]
+            if f:
+                for j in range(col, n + 1):
+                    m[i][j] -= f * m[col][j]
+    x = [0.0] * n
+    for i in range(n - 1, -1, -1):
+        if abs(m[i][i]) < 1e-15:
+            continue
+        x[i] = (m[i][n] - sum(m[i][j] * x[j] for j in range(i + 1, n))) / m[i][i]
+    return x
+
+
+class KinematicsModel(object):
+    def __init__(self, dh_params, tcp_offset=None, world_offset=None, joint_limits=None,
+                 modified=False, order=DH_ORDER, scale=1.0, axis=None):
+        """
+        :param dh_params: the return of get_dh_params (4 values of each joint), or [[v1, v2, v3, v4], ...]
+        :param tcp_offset: [x(mm), y(mm), z(mm), roll(rad), pitch(rad), yaw(rad)], default is None (no offset)
+        :param world_offset: [x(mm), y(mm), z(mm), roll(rad), pitch(rad), yaw(rad)], default is None (no offset)
+        :param joint_limits: [(min, max), ...] (unit: rad), default is None (no limit)
+        :param modified: the parameters are modified DH (Craig) or standard DH
+        :param order: the order of the 4 values of each joint, the permutation of ('theta', 'd', 'alpha', 'a')
+        :param scale: the lengths (d/a) are multiplied by scale to mm
+        :param axis: the number of joints, default is None (joint_limits or the joints with non-zero parameters)
+        """
+        values = [float(v) for row in dh_params for v in (row if isinstance(row, (list, tuple)) else [row])]
+        rows = [values[i:i + 4] for i in range(0, len(values) - 3, 4)]
+        if axis is None:
+            axis = len(joint_limits) if joint_limits else len(rows)
+            if not joint_limits:
+                while axis > 0 and not any(rows[axis - 1]):
+                    axis -= 1
+        self.axis = axis
+        self.modified = modified
+        self.order = tuple(order)
+        self.scale = scale
+        self.dh_params = values
+        self.joints = []
+        for row in rows[:axis]:
+            item = dict(zip(self.order, row))
+            self.joints.append((item['theta'], item['d'] * scale, item['alpha'], item['a'] * scale))
+        self.joint_limits = [tuple(limit) for limit in joint_limits[:axis]] if joint_limits else None
+        self.set_tcp_offset(tcp_offset)
+        self.set_world_offset(world_offset)
+
+    def set_tcp_offset(self, tcp_offset=None):
+        self.tcp_offset = list(tcp_offset[:6]) if tcp_offset else [0.0] * 6
+        self._tcp = pose_to_matrix(self.tcp_offset)
+
+    def set_world_offset(self, world_offset=None):
+        self.world_offset = list(world_offset[:6]) if world_offset else [0.0] * 6
+        self._world_inv = _inverse(pose_to_matrix(self.world_offset))
+
+    def _joint_matrix(self, index, angle):
+        theta, d, alpha, a = self.joints[index]
+        ct, st = math.cos(angle + theta), math.sin(angle + theta)
+        ca, sa = math.cos(alpha), math.sin(alpha)
+        if self.modified:
+            # Rx(alpha) * Tx(a) * Rz(theta) * Tz(d)
+            return [[ct, -st, 0.0, a], [st * ca, ct * ca, -sa, -d * sa], [st * sa, ct * sa, ca, d * ca], [0.0, 0.0, 0.0, 1.0]]
+        # Rz(theta) * Tz(d) * Tx(a) * Rx(alpha)
+        return [[ct, -st * ca, st * sa, a * ct], [st, ct * ca, -ct * sa, a * st], [0.0, sa, ca, d], [0.0, 0.0, 0.0, 1.0]]
+
+    def _chain(self, angles):
+        """
+        :return: (the TCP matrix in the user coordinate, [the frame of each joint axis, ...])
+        """
+        t = self._world_inv
+        frames = []
+        for i in range(self.axis):
+            if not self.modified:
+                frames.append(t)
+            t = _matmul(t, self._joint_matrix(i, angles[i]))
+            if self.modified:
+                frames.append(t)
+        return _matmul(t, self._tcp), frames
+
+    def fk_matrix(self, angles):
+        """
+        :param angles: [angle-1(rad), ..., angle-n(rad)]
+        :return: 4x4 matrix of the TCP in the user coordinate
+        """
+        return self._chain(angles)[0]
+
+    def fk(self, angles):
+        """
+        :param angles: [angle-1(rad), ..., angle-n(rad)]
+        :return: [x(mm), y(mm), z(mm), roll(rad), pitch(rad), yaw(rad)]
+        """
+        return matrix_to_pose(self.fk_matrix(angles))
+
+    def fk_batch(self, angles_list, as_array=False):
+        """
+        Vectorized forward kinematics (with numpy, otherwise computed one by one)
+
+        :param angles_list: N x n list (or numpy array) of the joint angles (unit: rad)
+        :param as_array: return numpy array (N x 6) if numpy is installed
+        :return: [[x, y, z, roll, pitch, yaw], ...]
+        """
+        if numpy is None:
+            return [self.fk(angles) for angles in angles_list]
+        q = numpy.asarray(angles_list, dtype=float)
+        if q.size == 0:
+            return numpy.zeros((0, 6)) if as_array else []
+        q = q.reshape(len(q), -1)
+        cnt = q.shape[0]
+        t = numpy.broadcast_to(numpy.array(self._world_inv), (cnt, 4, 4))
+        for i in range(self.axis):
+            theta, d, alpha, a = self.joints[i]
+            th = q[:, i] + theta
+            ct, st = numpy.cos(th), numpy.sin(th)
+            ca, sa = math.cos(alpha), math.sin(alpha)
+            m = numpy.zeros((cnt, 4, 4))
+            m[:, 3, 3] = 1
+            if self.modified:
+                m[:, 0, 0], m[:, 0, 1], m[:, 0, 3] = ct, -st, a
+                m[:, 1, 0], m[:, 1, 1], m[:, 1, 2], m[:, 1, 3] = st * ca, ct * ca, -sa, -d * sa
+                m[:, 2, 0], m[:, 2, 1], m[:, 2, 2], m[:, 2, 3] = st * sa, ct * sa, ca, d * ca
+            else:
+                m[:, 0, 0], m[:, 0, 1], m[:, 0, 2], m[:, 0, 3] = ct, -st * ca, st * sa, a * ct
+                m[:, 1, 0], m[:, 1, 1], m[:, 1, 2], m[:, 1, 3] = st, ct * ca, -ct * sa, a * st
+                m[:, 2, 1], m[:, 2, 2], m[:, 2, 3] = sa, ca, d
+            t = numpy.matmul(t, m)
+        t = numpy.matmul(t, numpy.array(self._tcp))
+        pitch = numpy.arctan2(-t[:, 2, 0], numpy.sqrt(t[:, 0, 0] ** 2 + t[:, 1, 0] ** 2))
+        # 与matrix_to_pose一致, 万向节锁时yaw取0
+        lock = numpy.abs(numpy.cos(pitch)) < 1e-9
+        roll = numpy.where(lock, numpy.arctan2(numpy.where(pitch > 0, t[:, 0, 1], -t[:, 0, 1]), t[:, 1, 1]),
+                           numpy.arctan2(t[:, 2, 1], t[:, 2, 2]))
+        yaw = numpy.where(lock, 0.0, numpy.arctan2(t[:, 1, 0], t[:, 0, 0]))
+        poses = numpy.stack([t[:, 0, 3], t[:, 1, 3], t[:, 2, 3], roll, pitch, yaw], axis=1)
+        return poses if as_array else poses.tolist()
+
+    def jacobian(self, angles):
+        """
+        Geometric jacobian of the TCP in the user coordinate
+
+        :param angles: [angle-1(rad), ..., angle-n(rad)]
+        :return: 6 x n list, rows are [vx(mm/rad), vy, vz, wx(rad/rad), wy, wz]
+        """
+        t, frames = self._chain(angles)
+        p = [t[0][3], t[1][3], t[2][3]]
+        jac = [[0.0] * self.axis for _ in range(6)]
+        for i, f in enumerate(frames):
+            z = [f[0][2], f[1][2], f[2][2]]
+            r = [p[0] - f[0][3], p[1] - f[1][3], p[2] - f[2][3]]
+            v = [z[1] * r[2] - z[2] * r[1], z[2] * r[0] - z[0] * r[2], z[0] * r[1] - z[1] * r[0]]
+            for k in range(3):
+                jac[k][i] = v[k]
+                jac[k + 3][i] = z[k]
+        return jac
+
+    def in_joint_limit(self, angles):
+        """
+        :return: True if all the angles are in the joint limits
+        """
+        if not self.joint_limits:
+            return True
+        return all(low <= angles[i] <= high for i, (low, high) in enumerate(self.joint_limits))
+
+    def _clamp(self, angles):
+        if not self.joint_limits:
+            return angles
+        return [min(max(angles[i], low), high) for i, (low, high) in enumerate(self.joint_limits)]
+
+    def _random_angles(self, rand):
+        limits = self.joint_limits or [(-math.pi, math.pi)] * self.axis
+        return [rand.uniform(max(low, -math.pi), min(high, math.pi)) for low, high in limits]
+
+    def ik(self, pose, seed=None, max_iter=100, restarts=8, tol_pos=0.001, tol_rot=1e-5, damping=0.01):
+        """
+        Numeric inverse kinematics (damped least squares), the joints are kept in the joint limits
+
+        :param pose: [x(mm), y(mm), z(mm), roll(rad), pitch(rad), yaw(rad)] in the user coordinate
+        :param seed: the initial angles (unit: rad), default is None (all zero), the solution closest to the
+            seed is usually returned, so use the current angles to get a continuous solution
+        :param max_iter: the maximum iterations of each attempt
+        :param restarts: the number of attempts from the random seeds if the first attempt failed
+        :param tol_pos: the position tolerance (unit: mm)
+        :param tol_rot: the orientation tolerance (unit: rad)
+        :param damping: the damping factor
+        :return: tuple((code, angles))
+            code: 0 or APIState.IK_NO_SOLUTION
+            angles: [angle-1(rad), ..., angle-n(rad)], the best attempt if no solution
+        """
+        target = pose_to_matrix(pose)
+        rand = random.Random(0)
+        q = self._clamp([float(seed[i]) if seed is not None and i < len(seed) else 0.0 for i in range(self.axis)])
+        best, best_err = q, None
+        for attempt in range(restarts + 1):
+            if attempt > 0:
+                q = self._random_angles(rand)
+            q, err = self._solve_ik(target, q, max_iter, tol_pos, tol_rot, damping)
+            if err is None:
+                return 0, q
+            if best_err is None or err < best_err:
+                best, best_err = q, err
+        return APIState.IK_NO_SOLUTION, best
+
+    def _solve_ik(self, target, q, max_iter, tol_pos, tol_rot, damping):
+        lam2 = damping ** 2
+        err = None
+        for _ in range(max_iter):
+            t, _ = self._chain(q)
+            e_pos = [target[i][3] - t[i][3] for i in range(3)]
+            e_rot = _rotation_error(target, t)
+            pos_norm = math.sqrt(sum(x * x for x in e_pos))
+            rot_norm = math.sqrt(sum(x * x for x in e_rot))
+            if pos_norm <= tol_pos and rot_norm <= tol_rot:
+                return q, None
+            err = pos_norm / 1000 + rot_norm
+            # 长度按米计算, 与角度的量级一致
+            jac = self.jacobian(q)
+            jac = [[v / 1000 for v in row] for row in jac[:3]] + jac[3:]
+            e = [x / 1000 for x in e_pos] + e_rot
+            a = [[sum(jac[i][k] * jac[j][k] for k in range(self.axis)) + (lam2 if i == j else 0) for j in range(6)]
+                 for i in range(6)]
+            y = _solve(a, e)
+            dq = [sum(jac[k][i] * y[k] for k in range(6)) for i in range(self.axis)]
+            step = max(abs(x) for x in dq)
+            if step > 0.2:
+                dq = [x * 0.2 / step for x in dq]
+            q = self._clamp([q[i] + dq[i] for i in range(self.axis)])
+        return q, err
+
+    def validate(self, samples):
+        """
+        Compare the forward kinematics with the samples recorded from the controller (see record_samples)
+
+        :param samples: [(angles, pose), ...], unit: rad, mm
+        :return: {'count': n, 'max_pos_error': mm, 'max_rot_error': rad, 'mean_pos_error': mm}
+        """
+        pos_errors, rot_errors = [], []
+        for angles, pose in samples:
+            t = self.fk_matrix(angles)
+            target = pose_to_matrix(pose)
+            pos_errors.append(math.sqrt(sum((t[i][3] - target[i][3]) ** 2 for i in range(3))))
+            rot_errors.append(math.sqrt(sum(x * x for x in _rotation_error(target, t))))
+        if not samples:
+            return {'count': 0, 'max_pos_error': None, 'max_rot_error': None, 'mean_pos_error': None}
+        return {
+            'count': len(samples),
+            'max_pos_error': max(pos_errors),
+            'max_rot_error': max(rot_errors),
+            'mean_pos_error': sum(pos_errors) / len(pos_errors),
+        }
+
+    def to_dict(self):
+        return {
+            'dh_params': self.dh_params,
+            'tcp_offset': self.tcp_offset,
+            'world_offset': self.world_offset,
+            'joint_limits': self.joint_limits,
+            'modified': self.modified,
+            'order': list(self.order),
+            'scale': self.scale,
+            'axis': self.axis,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['dh_params'], tcp_offset=data.get('tcp_offset'), world_offset=data.get('world_offset'),
+                   joint_limits=data.get('joint_limits'), modified=data.get('modified', False),
+                   order=data.get('order', DH_ORDER), scale=data.get('scale', 1.0), axis=data.get('axis'))
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_arm(cls, arm, validate=True, samples=None, tolerance=0.5):
+        """
+        Build the model from the DH parameters, the TCP offset and the world offset of the controller
+
+        :param arm: XArm instance (connected)
+        :param validate: compare with the forward kinematics of the controller and select the DH layout,
+            then check the selected layout with the inverse kinematics of the controller
+        :param samples: [(angles, pose), ...], default is None (record_samples(arm))
+        :param tolerance: the maximum position error (unit: mm) of the selected layout
+        :return: tuple((code, model))
+            code: APIState.KINEMATICS_MISMATCH if the error of the best layout exceeds the tolerance
+            model: the best layout even if it does not match
+        """
+        code, dh_params = arm.get_dh_params()
+        if code != 0:
+            return code, None
+        joint_limits = XCONF.Robot.JOINT_LIMITS.get(arm.axis, {}).get(arm.device_type)
+        kwargs = {
+            'tcp_offset': list(arm._position_offset),
+            'world_offset': list(arm._world_offset),
+            'joint_limits': joint_limits,
+            'axis': arm.axis,
+        }
+        model = cls(dh_params, **kwargs)
+        if not validate:
+            return 0, model
+        if samples is None:
+            code, samples = record_samples(arm, joint_limits=joint_limits)
+            if code != 0:
+                return code, model
+        best, best_err = model, None
+        for modified in (False, True):
+            for order in itertools.permutations(DH_FIELDS):
+                for scale in (1.0, 1000.0):
+                    candidate = cls(dh_params, modified=modified, order=order, scale=scale, **kwargs)
+                    err = candidate.validate(samples)['max_pos_error']
+                    if best_err is None or err < best_err:
+                        best, best_err = candidate, err
+        if best_err is not None and best_err > tolerance:
+            logger.warning('local kinematics does not match the controller, max_pos_error={:.3f}mm'.format(best_err))
+            return APIState.KINEMATICS_MISMATCH, best
+        # 控制器逆解得到的关节角, 用本地正解计算后应回到同一个位姿
+        code, results = arm.get_inverse_kinematics_batch([pose for _, pose in samples], input_is_radian=True,
+                                                         return_is_radian=True, use_cache=False)
+        ik_samples = [(ret[1], pose) for (_, pose), ret in zip(samples, results) if ret[0] == 0]
+        ik_err = best.validate(ik_samples)['max_pos_error']
+        if ik_err is not None and ik_err > tolerance:
+            logger.warning('local kinematics does not match the controller ik, max_pos_error={:.3f}mm'.format(ik_err))
+            return APIState.KINEMATICS_MISMATCH, best
+        return 0, best
+
+
+def record_samples(arm, count=8, joint_limits=None, seed=0):
+    """
+    Record the forward kinematics of the controller at random joint angles
+
+    :param arm: XArm instance (connected)
+    :param count: the number of samples
+    :param joint_limits: [(min, max), ...] (unit: rad), default is None (-pi ~ pi)
+    :return: tuple((code, [(angles, pose), ...])), unit: rad, mm
+    """
+    rand = random.Random(seed)
+    limits = joint_limits or [(-math.pi, math.pi)] * arm.axis
+    joints = [[rand.uniform(max(low, -math.pi), min(high, math.pi)) for low, high in limits[:arm.axis]] for _ in range(count)]
+    code, results = arm.get_forward_kinematics_batch(joints, input_is_radian=True, return_is_radian=True, use_cache=False)
+    return code, [(angles, ret[1]) for angles, ret in zip(joints, results) if ret[0] == 0]
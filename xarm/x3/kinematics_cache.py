@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+运动学(逆解/正解/限位检查)结果缓存
+键是量化后的位姿/关节向量(单位: mm/rad), 结果只在上下文(TCP偏移/用户坐标系偏移/DH参数等)不变时有效,
+上下文变化时清空缓存
+"""
+
+import threading
+import collections
+
+KINE_IK = 'ik'
+KINE_FK = 'fk'
+KINE_TCP_LIMIT = 'tcp_limit'
+KINE_JOINT_LIMIT = 'joint_limit'
+
+# 输入是位姿(前3个是长度)的类型
+_POSE_KINDS = (KINE_IK, KINE_TCP_LIMIT)
+
+
+class KinematicsCache(object):
+    def __init__(self, maxsize=10000, length_resolution=0.001, angle_resolution=1e-6):
+        """
+        :param maxsize: the maximum number of the cached results (least recently used are dropped)
+        :param length_resolution: the inputs within the resolution share the result (unit: mm)
+        :param angle_resolution: the inputs within the resolution share the result (unit: rad)
+        """
+        self.maxsize = maxsize
+        self.length_resolution = length_resolution
+        self.angle_resolution = angle_resolution
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+        self._context = None
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, kind, values):
+        """
+        :param kind: KINE_IK/KINE_FK/KINE_TCP_LIMIT/KINE_JOINT_LIMIT
+        :param values: the pose (mm/rad) or the joints (rad)
+        """
+        n = 3 if kind in _POSE_KINDS else 0
+        return (kind,) + tuple(int(round(values[i] / (self.length_resolution if i < n else self.angle_resolution)))
+                               for i in range(len(values)))
+
+    def sync(self, context):
+        """
+        :param context: the values the results depend on, the cache is cleared if it changes
+        """
+        with self._lock:
+            if context != self._context:
+                self._cache.clear()
+                self._context = context
+
+    def get(self, key):
+        """
+        :return: the cached result, None if not cached
+        """
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._context = None
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'size': len(self._cache),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -6,7 +6,9 @@
 #
 # Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
 
+import os
 import re
+import threading
 
 GCODE_PARAM_X = 'X'  # TCP-X
 GCODE_PARAM_Y = 'Y'  # TCP-Y
@@ -108,3 +110,128 @@ class GcodeParser:
         joints[5] = self._get_float_value(string[2:], GCODE_PARAM_N, default=default)
         joints[6] = self._get_float_value(string[2:], GCODE_PARAM_O, default=default)
         return joints
+
+
+_GCODE_WORD_PATTERN = re.compile(r'([A-Z])(-?\d+\.?\d*)')
+_GCODE_POSE_PARAMS = (GCODE_PARAM_X, GCODE_PARAM_Y, GCODE_PARAM_Z, GCODE_PARAM_A, GCODE_PARAM_B, GCODE_PARAM_C)
+_GCODE_JOINT_PARAMS = (GCODE_PARAM_I, GCODE_PARAM_J, GCODE_PARAM_K, GCODE_PARAM_L, GCODE_PARAM_M, GCODE_PARAM_N, GCODE_PARAM_O)
+
+# 编译后的指令类型, 其它指令保留原始文本(GCODE_OP_RAW), 执行时交给send_cmd_sync处理
+GCODE_OP_RAW = 0
+GCODE_OP_MOVE_LINE = 1  # G1, args: (pose, speed, mvacc, mvtime)
+GCODE_OP_MOVE_CIRCLE = 2  # G2, args: (pose1, pose2, percent, speed, mvacc, mvtime)
+GCODE_OP_PAUSE = 4  # G4, args: (sltime,)
+GCODE_OP_MOVE_JOINT = 7  # G7, args: (angles, speed, mvacc, mvtime)
+GCODE_OP_MOVE_GOHOME = 8  # G8, args: (speed, mvacc, mvtime)
+GCODE_OP_MOVE_ARC_LINE = 9  # G9, args: (pose, radius, speed, mvacc, mvtime)
+GCODE_OP_SERVO_ANGLE_J = 11  # G11, args: (angles, speed, mvacc, mvtime)
+GCODE_OP_SLEEP = 12  # G12, args: (seconds,)
+
+# 会进入控制器指令缓存的运动指令
+GCODE_MOTION_OPS = (GCODE_OP_MOVE_LINE, GCODE_OP_MOVE_CIRCLE, GCODE_OP_MOVE_JOINT,
+                    GCODE_OP_MOVE_GOHOME, GCODE_OP_MOVE_ARC_LINE, GCODE_OP_SERVO_ANGLE_J)
+
+
+class GcodeCompiler(object):
+    """
+    把G代码程序一次性解析成指令列表[(op, args, line), ...], 每行只扫描一遍
+    参数的取值规则与GcodeParser一致(同一个字母取第一次出现的值)
+    """
+    def __init__(self, cache_size=16):
+        self._cache_size = cache_size
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_float(words, ch, default=None):
+        value = words.get(ch, None)
+        return default if value is None else float(value)
+
+    @classmethod
+    def _get_floats(cls, words, chs, default=None):
+        return [cls._get_float(words, ch, default=default) for ch in chs]
+
+    @classmethod
+    def _get_motion_params(cls, words):
+        return cls._get_float(words, GCODE_PARAM_F), cls._get_float(words, GCODE_PARAM_Q), cls._get_float(words, GCODE_PARAM_T)
+
+    @classmethod
+    def compile_line(cls, line):
+        """
+        :param line: one line of the G-code program
+        :return: (op, args, line), None if the line is empty
+        """
+        line = line.strip().upper()
+        if not line:
+            return None
+        words = {}
+        for ch, value in _GCODE_WORD_PATTERN.findall(line):
+            words.setdefault(ch, value)
+        for ch in ('G', 'H', 'M', 'D', 'S', 'C'):
+            if ch in words:
+                break
+        else:
+            return GCODE_OP_RAW, (), line
+        if ch != 'G':
+            return GCODE_OP_RAW, (), line
+        try:
+            num = int(words['G'])
+            if num == GCODE_OP_MOVE_LINE:
+                args = (cls._get_floats(words, _GCODE_POSE_PARAMS),) + cls._get_motion_params(words)
+            elif num == GCODE_OP_MOVE_CIRCLE:
+                args = (cls._get_floats(words, _GCODE_POSE_PARAMS, default=0),
+                        cls._get_floats(words, _GCODE_JOINT_PARAMS[:6], default=0),
+                        cls._get_float(words, GCODE_PARAM_R, default=0)) + cls._get_motion_params(words)
+            elif num == GCODE_OP_PAUSE or num == GCODE_OP_SLEEP:
+                args = (cls._get_float(words, GCODE_PARAM_T, default=0),)
+            elif num == GCODE_OP_MOVE_JOINT:
+                args = (cls._get_floats(words, _GCODE_JOINT_PARAMS),) + cls._get_motion_params(words)
+            elif num == GCODE_OP_MOVE_GOHOME:
+                args = cls._get_motion_params(words)
+            elif num == GCODE_OP_MOVE_ARC_LINE:
+                args = (cls._get_floats(words, _GCODE_POSE_PARAMS),
+                        cls._get_float(words, GCODE_PARAM_R, default=0)) + cls._get_motion_params(words)
+            elif num == GCODE_OP_SERVO_ANGLE_J:
+                args = (cls._get_floats(words, _GCODE_JOINT_PARAMS, default=0),) + cls._get_motion_params(words)
+            else:
+                return GCODE_OP_RAW, (), line
+        except ValueError:
+            return GCODE_OP_RAW, (), line
+        return num, args, line
+
+    @classmethod
+    def compile_lines(cls, lines):
+        program = []
+        for line in lines:
+            inst = cls.compile_line(line)
+            if inst is not None:
+                program.append(inst)
+        return program
+
+    def compile_file(self, path):
+        """
+        Compile the G-code file, the result is cached until the file is modified
+
+        :param path: the G-code file path
+        :return: list of (op, args, line)
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cache = self._cache.get(path, None)
+            if cache is not None and cache[0] == key:
+                return cache[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            program = self.compile_lines(f)
+        with self._lock:
+            self._cache.pop(path, None)
+            if len(self._cache) >= self._cache_size:
+                # dict保持插入顺序, 删除最早编译的
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[path] = (key, program)
+        return program
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
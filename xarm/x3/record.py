@@ -8,8 +8,6 @@
 
 import json
 import time
-import uuid
-from urllib import request
 from .code import APIState
 from ..core.config.x_config import XCONF
 from ..core.utils.log import logger
@@ -28,6 +26,7 @@ class Record(Base):
         else:
             url = 'http://{}:18333/cmd'.format(ip)
         try:
+            from urllib import request
             data = {'cmd': 'xarm_list_trajs'}
             req = request.Request(url, headers={'Content-Type': 'application/json'}, data=json.dumps(data).encode('utf-8'))
             res = request.urlopen(req)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+上报数据列式记录
+每个字段一个预分配的.npy文件(二维, capacity行), 通过mmap按环形缓冲区写入, 内存占用只有页缓存,
+可以长时间按上报频率记录, 写满后覆盖最旧的数据
+cursor.npy记录已写入的总帧数, meta.json记录字段和容量
+.npy文件可以直接用numpy.load(path, mmap_mode='r')打开, 不需要numpy也可以通过ReportRecording读取
+"""
+
+import os
+import ast
+import json
+import mmap
+import time
+import struct
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# (name, count, attribute of Base), 单位与Base中的属性一致(角度为弧度, 长度为mm)
+REPORT_RECORD_FIELDS = [
+    ('angles', 7, '_angles'),
+    ('position', 6, '_position'),
+    ('joints_torque', 7, '_joints_torque'),
+    ('currents', 7, '_currents'),
+    ('voltages', 7, '_voltages'),
+    ('temperatures', 7, '_temperatures'),
+    ('ft_ext_force', 6, '_ft_ext_force'),
+    ('ft_raw_force', 6, '_ft_raw_force'),
+]
+
+_NPY_MAGIC = b'\x93NUMPY\x01\x00'
+_TIME = struct.Struct('<d')
+_DESCR_FORMAT = {'<f4': 'f', '<f8': 'd', '<i8': 'q'}
+
+
+def _npy_header(descr, shape):
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': {}, }}".format(descr, shape)
+    # 数据起始位置按64字节对齐
+    header_len = len(_NPY_MAGIC) + 2 + len(header) + 1
+    header += ' ' * ((64 - header_len % 64) % 64) + '\n'
+    return _NPY_MAGIC + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+def _create_npy(path, descr, shape, itemsize):
+    header = _npy_header(descr, shape)
+    size = itemsize
+    for n in shape:
+        size *= n
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.truncate(len(header) + size)
+    f = open(path, 'r+b')
+    mm = mmap.mmap(f.fileno(), 0)
+    return f, mm, len(header)
+
+
+def _open_npy(path):
+    f = open(path, 'rb')
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:8] != _NPY_MAGIC:
+        mm.close()
+        f.close()
+        raise Exception('{} is not a .npy file (version 1.0)'.format(path))
+    header_len = struct.unpack('<H', mm[8:10])[0]
+    header = ast.literal_eval(mm[10:10 + header_len].decode('latin1'))
+    return f, mm, 10 + header_len, header
+
+
+class ReportRecorder(object):
+    """
+    把Base解析后的上报数据按列写入内存映射的环形文件, 由上报线程在每帧数据处理完后调用publish
+    """
+    def __init__(self, path, capacity=900000, fields=None):
+        """
+        :param path: the directory of the recording, created if not exists, the old recording is overwritten
+        :param capacity: the number of frames in the ring, default is 900000 (1 hour at 250Hz)
+        :param fields: the names of REPORT_RECORD_FIELDS to record, default is all
+        """
+        self.path = path
+        self.capacity = capacity
+        self._fields = [field for field in REPORT_RECORD_FIELDS if fields is None or field[0] in fields]
+        os.makedirs(path, exist_ok=True)
+        self._files = []
+        self._columns = []
+        f, mm, offset = _create_npy(os.path.join(path, 'time.npy'), '<f8', (capacity,), 8)
+        self._files.append((f, mm))
+        self._time = (mm, offset)
+        for name, count, attr in self._fields:
+            f, mm, offset = _create_npy(os.path.join(path, '{}.npy'.format(name)), '<f4', (capacity, count), 4)
+            self._files.append((f, mm))
+            self._columns.append((attr, count, mm, offset, struct.Struct('<{}f'.format(count))))
+        f, mm, offset = _create_npy(os.path.join(path, 'cursor.npy'), '<i8', (1,), 8)
+        self._files.append((f, mm))
+        self._cursor = memoryview(mm)[offset:].cast('q')
+        self._count = 0
+        with open(os.path.join(path, 'meta.json'), 'w') as meta:
+            json.dump({
+                'capacity': capacity,
+                'fields': [[name, count] for name, count, _ in self._fields],
+                'start_time': time.time(),
+            }, meta)
+
+    @property
+    def count(self):
+        """the number of frames recorded (including the overwritten)"""
+        return self._count
+
+    def publish(self, arm):
+        row = self._count % self.capacity
+        mm, offset = self._time
+        _TIME.pack_into(mm, offset + row * 8, time.time())
+        for attr, count, mm, offset, st in self._columns:
+            values = getattr(arm, attr)
+            if len(values) != count:
+                values = (list(values) + [0] * count)[:count]
+            st.pack_into(mm, offset + row * st.size, *values)
+        self._count += 1
+        # 最后更新cursor(8字节单次写入), 读方看到的帧都是完整的
+        self._cursor[0] = self._count
+
+    def flush(self):
+        for _, mm in self._files:
+            mm.flush()
+
+    def close(self):
+        if not self._files:
+            return
+        self.flush()
+        self._cursor.release()
+        self._columns = []
+        for f, mm in self._files:
+            mm.close()
+            f.close()
+        self._files = []
+
+
+class ReportRecording(object):
+    """
+    读取ReportRecorder的记录(可以在记录的同时读取), 返回的数据都是映射文件的视图, 不复制
+
+    Example:
+        rec = ReportRecording('/tmp/xarm_record')
+        angles = rec.last('angles', 250)  # the last second at 250Hz
+        t = rec.last('time', 250)
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r') as meta:
+            meta = json.load(meta)
+        self.capacity = meta['capacity']
+        self.fields = dict((name, count) for name, count in meta['fields'])
+        self.start_time = meta['start_time']
+        self._files = {}
+        self._views = {}
+        for name in ['time', 'cursor'] + list(self.fields.keys()):
+            f, mm, offset, header = _open_npy(os.path.join(path, '{}.npy'.format(name)))
+            self._files[name] = (f, mm)
+            if numpy is not None:
+                view = numpy.frombuffer(mm, dtype=header['descr'], offset=offset).reshape(header['shape'])
+            else:
+                view = memoryview(mm)[offset:].cast(_DESCR_FORMAT[header['descr']])
+            self._views[name] = view
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def count(self):
+        """the number of frames recorded (including the overwritten)"""
+        return int(self._views['cursor'][0])
+
+    @property
+    def first(self):
+        """the index of the oldest frame still in the ring"""
+        return max(self.count - self.capacity, 0)
+
+    def column(self, name):
+        """
+        The raw ring of the field (zero-copy), row i holds the frame i % capacity
+        :return: numpy array with shape (capacity, count), or flat memoryview if numpy is not installed
+        """
+        return self._views[name]
+
+    def slice(self, name, start, stop=None):
+        """
+        The frames [start, stop) of the field, the indexes are the absolute frame index (0 ~ count)
+
+        :return: list of zero-copy views in chronological order (2 views if the range wraps around the ring),
+            each view is a numpy array (rows, count) or a flat memoryview if numpy is not installed
+        """
+        count = self.count
+        stop = count if stop is None else min(stop, count)
+        start = max(start, count - self.capacity, 0)
+        if start >= stop:
+            return []
+        width = 1 if name == 'time' else self.fields[name]
+        step = 1 if numpy is not None else width
+        view = self._views[name]
+        begin, end = start % self.capacity, (stop - 1) % self.capacity + 1
+        if begin < end:
+            return [view[begin * step:end * step]]
+        return [view[begin * step:], view[:end * step]]
+
+    def range(self, name, start, stop=None):
+        """
+        The frames [start, stop) of the field as one array, copied only if the range wraps around the ring
+        :return: numpy array, or memoryview (list if the range wraps) if numpy is not installed
+        """
+        parts = self.slice(name, start, stop)
+        if not parts:
+            return numpy.empty((0,)) if numpy is not None else []
+        if len(parts) == 1:
+            return parts[0]
+        if numpy is not None:
+            return numpy.concatenate(parts)
+        return list(parts[0]) + list(parts[1])
+
+    def last(self, name, n):
+        """
+        The last n frames of the field
+        """
+        count = self.count
+        return self.range(name, count - n, count)
+
+    def close(self):
+        for view in self._views.values():
+            if isinstance(view, memoryview):
+                view.release()
+        self._views = {}
+        for f, mm in self._files.values():
+            try:
+                mm.close()
+            except BufferError:
+                # numpy视图还在使用, 由GC释放
+                pass
+            f.close()
+        self._files = {}
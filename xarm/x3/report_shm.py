@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+上报数据共享内存分发
+一个进程(ReportBroker)持有上报端口的连接并解析上报数据, 把最新的状态写到共享内存中,
+同一台主机上的其它进程通过ReportSubscriber只读映射这块共享内存, 不需要各自连接上报端口和解析
+
+共享内存用seqlock保护:
+    写: seq加1(奇数) -> 写数据 -> seq加1(偶数)
+    读: 读seq(偶数) -> 复制数据 -> 再读seq, 两次相同则数据一致, 否则重读
+"""
+
+import time
+import struct
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+from ..core.utils.log import logger
+
+REPORT_SHM_MAGIC = 0x58415253  # 'XARS'
+REPORT_SHM_VERSION = 1
+
+# magic(u32), version(u16), closed(u8), reserved(u8), seq(u64, native byte order)
+_HEADER = struct.Struct('<IHBB')
+_SEQ_OFFSET = 8
+_CLOSED_OFFSET = 6
+
+# (name, type, count, attribute of Base)
+#   单位与Base中的属性一致(角度为弧度, 长度为mm)
+REPORT_SHM_FIELDS = [
+    ('timestamp', 'd', 1, None),  # time.time() of the publish
+    ('report_time', 'd', 1, '_last_report_time'),  # time.monotonic() of the report (in the broker process)
+    ('state', 'B', 1, '_state'),
+    ('mode', 'B', 1, '_mode'),
+    ('cmd_num', 'H', 1, '_cmd_num'),
+    ('error_code', 'B', 1, '_error_code'),
+    ('warn_code', 'B', 1, '_warn_code'),
+    ('axis', 'B', 1, '_arm_axis'),
+    ('collision_sensitivity', 'B', 1, '_collision_sensitivity'),
+    ('teach_sensitivity', 'B', 1, '_teach_sensitivity'),
+    ('motor_enable_states', 'b', 8, '_arm_motor_enable_states'),
+    ('motor_brake_states', 'b', 8, '_arm_motor_brake_states'),
+    ('count', 'i', 1, '_count'),
+    ('angles', 'd', 7, '_angles'),
+    ('position', 'd', 6, '_position'),
+    ('position_aa', 'd', 6, '_pose_aa'),
+    ('position_offset', 'd', 6, '_position_offset'),
+    ('world_offset', 'd', 6, '_world_offset'),
+    ('joints_torque', 'd', 7, '_joints_torque'),
+    ('realtime_tcp_speed', 'd', 1, '_realtime_tcp_speed'),
+    ('realtime_joint_speeds', 'd', 7, '_realtime_joint_speeds'),
+    ('temperatures', 'd', 7, '_temperatures'),
+    ('voltages', 'd', 7, '_voltages'),
+    ('currents', 'd', 7, '_currents'),
+    ('ft_ext_force', 'd', 6, '_ft_ext_force'),
+    ('ft_raw_force', 'd', 6, '_ft_raw_force'),
+    ('gravity_direction', 'd', 3, '_gravity_direction'),
+    ('tcp_load', 'd', 4, '_tcp_load'),  # [weight, x, y, z]
+]
+
+_PAYLOAD = struct.Struct('<' + ''.join('{}{}'.format(count, tp) for _, tp, count, _ in REPORT_SHM_FIELDS))
+_PAYLOAD_OFFSET = 16
+REPORT_SHM_SIZE = _PAYLOAD_OFFSET + _PAYLOAD.size
+
+
+def _fit(values, count):
+    values = list(values[:count])
+    while len(values) < count:
+        values.append(0)
+    return values
+
+
+def _seq_view(buf):
+    # seq通过8字节对齐的memoryview单次读写, struct.pack_into会先把目标清零再写, 读方可能看到中间值
+    return buf[_SEQ_OFFSET:_SEQ_OFFSET + 8].cast('Q')
+
+
+def _attach(name):
+    # 只有创建者负责unlink, 映射方不能被resource_tracker登记(否则进程退出时会把共享内存删掉)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Python < 3.13: 映射期间屏蔽登记
+    # (fork的子进程与父进程共用resource_tracker, 映射后再unregister会把创建者的登记也删掉)
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class ReportBroker(object):
+    """
+    把Base解析后的上报数据发布到共享内存, 由上报线程在每帧数据处理完后调用publish
+    """
+    def __init__(self, name):
+        if shared_memory is None:
+            raise Exception('multiprocessing.shared_memory is not available (Python 3.8+ is required)')
+        self.name = name
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=REPORT_SHM_SIZE)
+        except FileExistsError:
+            # 上一次异常退出没有清理, 直接复用
+            logger.warning('report shared memory {} already exists, reuse it'.format(name))
+            self._shm = _attach(name)
+            if self._shm.size < REPORT_SHM_SIZE:
+                self._shm.close()
+                raise Exception('report shared memory {} is too small'.format(name))
+        self._buf = self._shm.buf
+        self._seq_view = _seq_view(self._buf)
+        self._seq = 0
+        self._seq_view[0] = self._seq
+        _HEADER.pack_into(self._buf, 0, REPORT_SHM_MAGIC, REPORT_SHM_VERSION, 0, 0)
+
+    def publish(self, arm):
+        values = [time.time()]
+        for _, _, count, attr in REPORT_SHM_FIELDS[1:]:
+            val = getattr(arm, attr)
+            if attr == '_tcp_load':
+                val = [val[0]] + list(val[1])
+            if count == 1:
+                values.append(val)
+            else:
+                values.extend(_fit(val, count))
+        self._seq += 1
+        self._seq_view[0] = self._seq
+        try:
+            _PAYLOAD.pack_into(self._buf, _PAYLOAD_OFFSET, *values)
+        finally:
+            self._seq += 1
+            self._seq_view[0] = self._seq
+
+    def close(self):
+        if self._shm is None:
+            return
+        self._buf[_CLOSED_OFFSET] = 1
+        self._seq_view.release()
+        self._buf = None
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except Exception:
+            pass
+        self._shm = None
+
+
+class ReportSubscriber(object):
+    """
+    只读映射ReportBroker发布的上报数据
+
+    Example:
+        sub = ReportSubscriber('xarm_report_192_168_1_185')
+        report = sub.wait(timeout=1)  # wait for the next report
+        print(report['state'], report['angles'])
+    """
+    def __init__(self, name):
+        """
+        :param name: the name of the shared memory, the return value of XArmAPI.start_report_broker
+        """
+        if shared_memory is None:
+            raise Exception('multiprocessing.shared_memory is not available (Python 3.8+ is required)')
+        self.name = name
+        self._shm = _attach(name)
+        self._buf = self._shm.buf.toreadonly()
+        self._seq_view = _seq_view(self._buf)
+        magic, version, _, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != REPORT_SHM_MAGIC or version != REPORT_SHM_VERSION:
+            self.close()
+            raise Exception('{} is not a report shared memory (version {})'.format(name, REPORT_SHM_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    @property
+    def seq(self):
+        """the sequence number of the latest report, increase by 2 for each report, 0 means no report yet"""
+        return self._seq_view[0]
+
+    @property
+    def closed(self):
+        """whether the broker has been stopped"""
+        return self._buf is None or self._buf[_CLOSED_OFFSET] == 1
+
+    def read_raw(self):
+        """
+        :return: (seq, values), values is the flat tuple in the order of REPORT_SHM_FIELDS, (0, None) if no report yet
+        """
+        buf = self._buf
+        seq_view = self._seq_view
+        while True:
+            seq1 = seq_view[0]
+            if seq1 == 0:
+                return 0, None
+            if seq1 & 1:
+                # 正在写
+                time.sleep(0)
+                continue
+            data = bytes(buf[_PAYLOAD_OFFSET:_PAYLOAD_OFFSET + _PAYLOAD.size])
+            if seq_view[0] == seq1:
+                return seq1, _PAYLOAD.unpack(data)
+
+    def read(self):
+        """
+        Read the latest report
+
+        :return: dict of {field: value} (see REPORT_SHM_FIELDS) with the 'seq', None if no report yet
+        """
+        seq, values = self.read_raw()
+        if values is None:
+            return None
+        report = {'seq': seq}
+        index = 0
+        for name, _, count, _ in REPORT_SHM_FIELDS:
+            report[name] = values[index] if count == 1 else list(values[index:index + count])
+            index += count
+        return report
+
+    def wait(self, seq=None, timeout=None, interval=0.001):
+        """
+        Wait for a report newer than seq
+
+        :param seq: default is the current seq
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :param interval: polling interval (unit: second)
+        :return: the report dict, None if timeout or the broker is stopped
+        """
+        seq = self.seq if seq is None else seq
+        expired = None if timeout is None else time.monotonic() + timeout
+        while self.seq == seq:
+            if self.closed or (expired is not None and time.monotonic() >= expired):
+                return None
+            time.sleep(interval)
+        return self.read()
+
+    def close(self):
+        if self._shm is None:
+            return
+        self._seq_view.release()
+        self._buf.release()
+        self._buf = None
+        self._shm.close()
+        self._shm = None
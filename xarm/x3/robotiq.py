@@ -6,11 +6,11 @@
 #
 # Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
 
-import time
 from ..core.utils.log import logger
 from .code import APIState
 from .base import Base
 from .decorator import xarm_is_connected, xarm_is_not_simulation_mode
+from .ee_poller import PollFuture
 
 
 class RobotIQ(Base):
@@ -99,15 +99,16 @@ class RobotIQ(Base):
 
     @xarm_is_connected(_type='get')
     def robotiq_set_position(self, pos, speed=0xFF, force=0xFF, wait=True, timeout=5, **kwargs):
+        return_future = not wait and kwargs.get('return_future', False)
         if kwargs.get('wait_motion', True):
             has_error = self.error_code != 0
             is_stop = self.is_stop
             code = self.wait_move()
             if not (code == 0 or (is_stop and code == APIState.EMERGENCY_STOP)
                     or (has_error and code == APIState.HAS_ERROR)):
-                return code, 0
+                return (PollFuture.finished(code) if return_future else code), 0
         if self.check_is_simulation_robot():
-            return 0, 0
+            return (PollFuture.finished(0) if return_future else 0), 0
         if kwargs.get('auto_enable') and not self.robotiq_is_activated:
             self.robotiq_reset()
             self.robotiq_set_activate(wait=True)
@@ -116,6 +117,8 @@ class RobotIQ(Base):
         if wait and code == 0:
             code = self.robotiq_wait_motion_completed(timeout, **kwargs)
         self.log_api_info('API -> robotiq_set_position ->code={}, response={}'.format(code, ret), code=code)
+        if return_future:
+            return (self.__watch_robotiq_motion(timeout, **kwargs) if code == 0 else PollFuture.finished(code)), ret
         return code, ret
 
     def robotiq_open(self, speed=0xFF, force=0xFF, wait=True, timeout=5, **kwargs):
@@ -133,50 +136,43 @@ class RobotIQ(Base):
         # params = [0x07, 0xD0, 0x00, 0x03]
         return self.__robotiq_get(params)
 
+    def __robotiq_read_status(self):
+        code, _ = self.robotiq_get_status(number_of_registers=3)
+        return code, dict(self._robotiq_status)
+
     def robotiq_wait_activation_completed(self, timeout=3):
-        failed_cnt = 0
-        expired = time.monotonic() + timeout if timeout is not None and timeout > 0 else 0
-        code = APIState.WAIT_FINISH_TIMEOUT
-        while expired == 0 or time.monotonic() < expired:
-            _, ret = self.robotiq_get_status(number_of_registers=3)
-            failed_cnt = 0 if _ == 0 else failed_cnt + 1
-            if _ == 0:
-                gFLT = self._robotiq_status['gFLT']
-                gSTA = self._robotiq_status['gSTA']
-                code = APIState.END_EFFECTOR_HAS_FAULT if gFLT != 0 and not (gFLT == 5 and gSTA == 1) \
-                    else 0 if gSTA == 3 else code
-            else:
-                code = APIState.NOT_CONNECTED if _ == APIState.NOT_CONNECTED else APIState.CHECK_FAILED if failed_cnt > 10 else code
-            if code != APIState.WAIT_FINISH_TIMEOUT:
-                break
-            time.sleep(0.05)
-        return code
+        def _check(status):
+            gFLT = status['gFLT']
+            gSTA = status['gSTA']
+            return APIState.END_EFFECTOR_HAS_FAULT if gFLT != 0 and not (gFLT == 5 and gSTA == 1) \
+                else 0 if gSTA == 3 else None
 
-    def robotiq_wait_motion_completed(self, timeout=5, **kwargs):
-        failed_cnt = 0
-        expired = time.monotonic() + timeout if timeout is not None and timeout > 0 else 0
-        code = APIState.WAIT_FINISH_TIMEOUT
+        timeout = timeout if timeout is not None and timeout > 0 else None
+        return self._ee_poller.wait('robotiq', self.__robotiq_read_status, _check, timeout=timeout)
+
+    def __watch_robotiq_motion(self, timeout=5, **kwargs):
         check_detected = kwargs.get('check_detected', False)
-        while expired == 0 or time.monotonic() < expired:
-            _, ret = self.robotiq_get_status(number_of_registers=3)
-            failed_cnt = 0 if _ == 0 else failed_cnt + 1
-            if _ == 0:
-                gFLT = self._robotiq_status['gFLT']
-                gSTA = self._robotiq_status['gSTA']
-                gOBJ = self._robotiq_status['gOBJ']
-                code = APIState.END_EFFECTOR_HAS_FAULT if gFLT != 0 and not (gFLT == 5 and gSTA == 1) \
-                    else 0 if (check_detected and (gOBJ == 1 or gOBJ == 2)) or (gOBJ == 1 or gOBJ == 2 or gOBJ == 3) \
-                    else code
-            else:
-                code = APIState.NOT_CONNECTED if _ == APIState.NOT_CONNECTED else APIState.CHECK_FAILED if failed_cnt > 10 else code
-            if code != APIState.WAIT_FINISH_TIMEOUT:
-                break
-            time.sleep(0.05)
-        if self.robotiq_error_code != 0:
-            print('ROBOTIQ Gripper ErrorCode: {}'.format(self.robotiq_error_code))
-        if code == 0 and not self.robotiq_is_activated:
-            code = APIState.END_EFFECTOR_NOT_ENABLED
-        return code
+
+        def _check(status):
+            gFLT = status['gFLT']
+            gSTA = status['gSTA']
+            gOBJ = status['gOBJ']
+            code = APIState.END_EFFECTOR_HAS_FAULT if gFLT != 0 and not (gFLT == 5 and gSTA == 1) \
+                else 0 if (check_detected and (gOBJ == 1 or gOBJ == 2)) or (gOBJ == 1 or gOBJ == 2 or gOBJ == 3) \
+                else None
+            if code is not None:
+                if self.robotiq_error_code != 0:
+                    print('ROBOTIQ Gripper ErrorCode: {}'.format(self.robotiq_error_code))
+                if code == 0 and not self.robotiq_is_activated:
+                    code = APIState.END_EFFECTOR_NOT_ENABLED
+            return code
+
+        timeout = timeout if timeout is not None and timeout > 0 else None
+        return self._ee_poller.watch('robotiq', self.__robotiq_read_status, _check, timeout=timeout,
+                                     moving=lambda status: status['gOBJ'] == 0)
+
+    def robotiq_wait_motion_completed(self, timeout=5, **kwargs):
+        return self.__watch_robotiq_motion(timeout=timeout, **kwargs).wait()
 
     @xarm_is_connected(_type='set')
     @xarm_is_not_simulation_mode(ret=False)
@@ -127,6 +127,40 @@ class Servo(Base):
         ret = self.arm_cmd.servo_addr_r32(servo_id, addr)
         return ret[0], ret[1]
 
+    @xarm_is_connected(_type='get')
+    def get_servo_addrs(self, items, window=8):
+        """
+        Danger, do not use, just for debugging
+        批量读取伺服寄存器, tcp连接时多个请求同时在途, 不需要每个寄存器等待一次往返
+        :param items: [(servo_id, addr, width), ...] or [(servo_id, addr), ...], width is 16(default) or 32
+        :param window: the maximum number of requests in flight
+        :return: code, [[code, value], ...]
+            code: the last non-zero code of the items, 0 if all succeed
+        """
+        items = [(item[0], item[1], item[2] if len(item) > 2 else 16) for item in items]
+        rets = self.arm_cmd.servo_addr_r_batch(items, window=window)
+        code = 0
+        for ret in rets:
+            if ret[0] != 0:
+                code = ret[0]
+        return code, rets
+
+    @xarm_is_connected(_type='get')
+    def get_servo_addr_table(self, servo_ids, addrs, width=16, default=None, window=8):
+        """
+        Danger, do not use, just for debugging
+        批量读取多个伺服的多个寄存器
+        :param servo_ids: [servo_id, ...]
+        :param addrs: [addr, ...]
+        :param width: 16 or 32
+        :param default: the value of the failed item, default is None (the value returned by the failed read)
+        :return: code, [[value of addrs[0], ...] of servo_ids[0], ...]
+        """
+        items = [(servo_id, addr, width) for servo_id in servo_ids for addr in addrs]
+        code, rets = self.get_servo_addrs(items, window=window)
+        values = [ret[1] if ret[0] == 0 or default is None else default for ret in rets]
+        return code, [values[i * len(addrs):(i + 1) * len(addrs)] for i in range(len(servo_ids))]
+
     @xarm_is_connected(_type='set')
     def clean_servo_error(self, servo_id=None):
         """
@@ -345,11 +379,11 @@ class Servo(Base):
         """
         assert isinstance(servo_id, int) and 1 <= servo_id <= 8, 'The value of parameter servo_id can only be 1-8.'
 
-        def _get_servo_version(id_num):
+        def _get_servo_version(id_num, rets=None):
             versions = ['*', '*', '*']
-            ret1 = self.get_servo_addr_16(id_num, 0x0801)
-            ret2 = self.get_servo_addr_16(id_num, 0x0802)
-            ret3 = self.get_servo_addr_16(id_num, 0x0803)
+            if rets is None:
+                _, rets = self.get_servo_addrs([(id_num, 0x0801), (id_num, 0x0802), (id_num, 0x0803)])
+            ret1, ret2, ret3 = rets
             code = 0
             if ret1[0] == 0:
                 versions[0] = ret1[1]
@@ -373,8 +407,9 @@ class Servo(Base):
         if servo_id > self.axis:
             code = 0
             versions = []
+            _, rets = self.get_servo_addrs([(i, addr) for i in range(1, self.axis + 1) for addr in [0x0801, 0x0802, 0x0803]])
             for i in range(1, self.axis + 1):
-                ret = _get_servo_version(i)
+                ret = _get_servo_version(i, rets[(i - 1) * 3:i * 3])
                 if ret[0] != 0:
                     code = ret[0]
                 versions.append(ret[1])
@@ -394,8 +429,8 @@ class Servo(Base):
         if servo_id > self.axis:
             code = 0
             types = []
-            for i in range(1, self.axis + 1):
-                ret = self.get_servo_addr_16(i, 0x081F)
+            _, rets = self.get_servo_addrs([(i, 0x081F) for i in range(1, self.axis + 1)])
+            for ret in rets:
                 if ret[0] != 0:
                     code = ret[0]
                 types.append(ret[1])
@@ -471,15 +506,8 @@ class Servo(Base):
         ]
         if servo_id is None or servo_id > self.axis:
             count = 7 if servo_id == 8 else self.axis
-            pids = [[9999] * len(addrs) for _ in range(count)]
-            for i in range(count):
-                for j, addr in enumerate(addrs):
-                    _, data = self.get_servo_addr_16(i + 1, addr)
-                    if _ == 0:
-                        pids[i][j] = data
+            _, pids = self.get_servo_addr_table(range(1, count + 1), addrs, default=9999)
         else:
-            pids = [9999] * len(addrs)
-            for j, addr in enumerate(addrs):
-                _, data = self.get_servo_addr_16(servo_id, addr)
-                pids[j] = data
+            _, pids = self.get_servo_addr_table([servo_id], addrs)
+            pids = pids[0]
         return 0, pids
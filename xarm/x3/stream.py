@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import threading
+from ..core.utils.log import logger
+from .code import APIState
+from .utils import to_radian
+
+
+class ServoStream(object):
+    """
+    Send servo_j / servo_cartesian setpoints at a fixed rate
+    Note: the arm must be in servo motion mode (mode 1) before running
+
+    Each setpoint has a deadline of start + n * period. The stream sleeps until
+    the deadline and sends the setpoint. If the iterator or the send falls more
+    than one period behind, the missed deadlines are skipped instead of sending
+    a burst to catch up.
+
+    By default the setpoints are sent without waiting for the response
+    (fire-and-forget). The error/state of the arm is checked from the report data
+    before every send. Set wait_response=True to check every response instead.
+    """
+    def __init__(self, arm, rate=100, is_cartesian=False, speed=0, mvacc=0, mvtime=0,
+                 is_radian=None, is_tool_coord=False, wait_response=False, spin_time=0.0005):
+        self._arm = arm
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.is_cartesian = is_cartesian
+        self.is_radian = arm.default_is_radian if is_radian is None else is_radian
+        self.is_tool_coord = is_tool_coord
+        self.wait_response = wait_response or arm._stream_type != 'socket'
+        self._spin_time = spin_time
+        self._speed = speed
+        self._mvacc = mvacc
+        self._mvtime = mvtime
+        self._thread = None
+        self._alive = False
+        self._code = 0
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def alive(self):
+        return self._alive
+
+    @property
+    def code(self):
+        """the code of the last send, See the [API Code Documentation](./xarm_api_code.md#api-code) for details."""
+        return self._code
+
+    @property
+    def stats(self):
+        """
+        count: number of setpoints sent
+        missed: number of deadlines skipped because the stream was more than one period late
+        late: number of setpoints sent after their deadline + period / 2
+        jitter_max / jitter_avg: send time - deadline (unit: second)
+        rate: the actual send rate (unit: Hz)
+        """
+        with self._stats_lock:
+            count = self._count
+            elapsed = self._last_send_time - self._first_send_time
+            return {
+                'count': count,
+                'missed': self._missed,
+                'late': self._late,
+                'jitter_max': self._jitter_max,
+                'jitter_avg': self._jitter_sum / count if count else 0,
+                'rate': (count - 1) / elapsed if count > 1 and elapsed > 0 else 0,
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._count = 0
+            self._missed = 0
+            self._late = 0
+            self._jitter_max = 0
+            self._jitter_sum = 0
+            self._first_send_time = 0
+            self._last_send_time = 0
+
+    def _update_stats(self, send_time, jitter):
+        with self._stats_lock:
+            if self._count == 0:
+                self._first_send_time = send_time
+            self._last_send_time = send_time
+            self._count += 1
+            self._jitter_sum += jitter
+            if jitter > self._jitter_max:
+                self._jitter_max = jitter
+            if jitter > self.period / 2:
+                self._late += 1
+
+    def _wait_until(self, deadline):
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            if remaining > self._spin_time:
+                time.sleep(remaining - self._spin_time)
+            else:
+                time.sleep(0)
+
+    def _send(self, setpoint):
+        arm = self._arm
+        if not arm.connected:
+            return APIState.NOT_CONNECTED
+        if arm._error_code != 0:
+            return APIState.HAS_ERROR
+        if arm._state >= 4:
+            return APIState.NOT_READY
+        if self.is_cartesian:
+            pose = [to_radian(setpoint[i], self.is_radian or i <= 2) for i in range(6)]
+            ret = arm.arm_cmd.move_servo_cartesian(pose, self._speed, self._mvacc, int(self.is_tool_coord),
+                                                   no_wait=not self.wait_response)
+        else:
+            angles = [to_radian(angle, self.is_radian) for angle in setpoint]
+            while len(angles) < 7:
+                angles.append(0)
+            for i in range(arm.axis):
+                if arm._is_out_of_joint_range(angles[i], i):
+                    return APIState.OUT_OF_RANGE
+            ret = arm.arm_cmd.move_servoj(angles, self._speed, self._mvacc, self._mvtime,
+                                          no_wait=not self.wait_response)
+        arm._has_motion_cmd = True
+        arm._is_set_move = True
+        if self.wait_response:
+            return arm._check_code(ret[0], is_move_cmd=True, mode=1)
+        return ret[0]
+
+    def run(self, setpoints):
+        """
+        Send the setpoints until the iterator is exhausted, stop() is called or an error occurs (blocking)
+
+        :param setpoints: iterable of joint angles or cartesian poses
+        :return: code
+        """
+        self._alive = True
+        return self._run(setpoints)
+
+    def _run(self, setpoints):
+        self._code = 0
+        period = self.period
+        index = 0
+        start = time.perf_counter()
+        try:
+            for setpoint in setpoints:
+                if not self._alive:
+                    break
+                deadline = start + index * period
+                now = time.perf_counter()
+                if now - deadline > period:
+                    # 已经落后超过一个周期, 跳过错过的周期, 不补发
+                    missed = int((now - deadline) / period)
+                    with self._stats_lock:
+                        self._missed += missed
+                    index += missed
+                    deadline = start + index * period
+                self._wait_until(deadline)
+                send_time = time.perf_counter()
+                self._code = self._send(setpoint)
+                self._update_stats(send_time, send_time - deadline)
+                if self._code != 0:
+                    logger.error('ServoStream stopped, code={}, count={}'.format(self._code, self._count))
+                    break
+                index += 1
+        except Exception as e:
+            logger.error('ServoStream exception: {}'.format(e))
+            self._code = APIState.API_EXCEPTION
+        finally:
+            self._alive = False
+        return self._code
+
+    def start(self, setpoints):
+        """
+        Send the setpoints in a background thread
+
+        :param setpoints: iterable of joint angles or cartesian poses
+        """
+        if self._thread and self._thread.is_alive():
+            logger.warning('ServoStream is already running')
+            return
+        self._alive = True
+        self._thread = threading.Thread(target=self._run, args=(setpoints,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._alive = False
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+        return self._code
@@ -9,6 +9,7 @@ from ..core.utils import convert
 from .code import APIState
 from .gpio import GPIO
 from .decorator import xarm_is_connected, xarm_wait_until_not_pause, xarm_is_not_simulation_mode
+from .track_monitor import LinearTrackMonitor, LinearTrackFuture, check_linear_track_stop, check_linear_track_back_origin
 
 
 class Track(GPIO):
@@ -24,11 +25,16 @@ class Track(GPIO):
             'sci': 1,
             'sco': [0, 0],
         }
+        self._linear_track_monitor = None
 
     @property
     def linear_track_status(self):
         return self._linear_track_status
 
+    @property
+    def _linear_track_monitor_alive(self):
+        return self._linear_track_monitor is not None and self._linear_track_monitor.alive
+
     @property
     def linear_track_error_code(self):
         return self._linear_track_status['error']
@@ -107,6 +113,33 @@ class Track(GPIO):
         code, _ = self.get_linear_track_registers(addr=0x0A27, number_of_registers=1)
         return code, self._linear_track_status['sco']
 
+    @xarm_is_connected(_type='get')
+    @xarm_is_not_simulation_mode(ret=0)
+    def start_linear_track_monitor(self, fast_interval=0.02, slow_interval=0.2):
+        if self._linear_track_monitor_alive:
+            self._linear_track_monitor.fast_interval = fast_interval
+            self._linear_track_monitor.slow_interval = slow_interval
+        else:
+            self._linear_track_monitor = LinearTrackMonitor(self, fast_interval=fast_interval, slow_interval=slow_interval)
+        return 0
+
+    def stop_linear_track_monitor(self):
+        if self._linear_track_monitor is not None:
+            self._linear_track_monitor.close()
+            self._linear_track_monitor = None
+        return 0
+
+    def get_linear_track_cache(self):
+        if not self._linear_track_monitor_alive:
+            return APIState.NOT_READY, None
+        snapshot = self._linear_track_monitor.get()
+        return (0, snapshot) if snapshot is not None else (APIState.NOT_READY, None)
+
+    def wait_linear_track(self, predicate, timeout=None):
+        if not self._linear_track_monitor_alive:
+            return APIState.NOT_READY
+        return 0 if self._linear_track_monitor.wait(predicate, timeout=timeout) else APIState.WAIT_FINISH_TIMEOUT
+
     @xarm_is_connected(_type='set')
     @xarm_is_not_simulation_mode(ret=(0, []))
     def set_linear_track_enable(self, enable):
@@ -154,11 +187,12 @@ class Track(GPIO):
         if code != 0:
             return code
         auto_enable = kwargs.get('auto_enable', True)
+        return_future = kwargs.get('return_future', False) and not wait
         # get_status: error, is_enable, on_zero
         code, status = self.get_linear_track_registers(addr=0x0A23, number_of_registers=3)
         if code == 0 and status['on_zero'] != 1:
             logger.warn('linear track is not on zero, please set linear track back to origin')
-            return APIState.LINEAR_TRACK_NOT_INIT
+            return LinearTrackFuture.finished(APIState.LINEAR_TRACK_NOT_INIT) if return_future else APIState.LINEAR_TRACK_NOT_INIT
         if auto_enable and (code != 0 or status['is_enabled'] != 1):
             self.set_linear_track_enable(auto_enable)
         if speed is not None and self.linear_track_speed != speed:
@@ -172,7 +206,16 @@ class Track(GPIO):
             self._linear_track_status['is_enabled'], self._linear_track_status['on_zero']), code=ret[0])
         if ret[0] == 0 and wait:
             return self.__wait_linear_track_stop(timeout)
-        return ret[0] if self.linear_track_error_code == 0 else APIState.LINEAR_TRACK_HAS_FAULT
+        code = ret[0] if self.linear_track_error_code == 0 else APIState.LINEAR_TRACK_HAS_FAULT
+        if return_future:
+            if code != 0:
+                return LinearTrackFuture.finished(code)
+            if not self._linear_track_monitor_alive:
+                self.start_linear_track_monitor()
+            return self._linear_track_monitor.track(check_linear_track_stop, timeout=timeout)
+        if self._linear_track_monitor_alive:
+            self._linear_track_monitor.kick()
+        return code
 
     @xarm_is_connected(_type='set')
     @xarm_is_not_simulation_mode(ret=(0, []))
@@ -197,6 +240,8 @@ class Track(GPIO):
         value = convert.u16_to_bytes(int(1))
         ret = self.arm_cmd.track_modbus_w16s(XCONF.ServoConf.STOP_TRACK, value, 1)
         ret[0] = self._check_modbus_code(ret, length=8, host_id=XCONF.LINEER_TRACK_HOST_ID)
+        if self._linear_track_monitor_alive:
+            self._linear_track_monitor.kick()
         # get_status: error, is_enable, on_zero
         code2, status = self.get_linear_track_registers(addr=0x0A22, number_of_registers=2)
         self.log_api_info('API -> set_linear_track_stop() -> code={}, code2={}, status={}, err={}'.format(
@@ -222,6 +267,8 @@ class Track(GPIO):
         failed_cnt = 0
         if not timeout or not isinstance(timeout, (int, float)) or timeout <= 0:
             timeout = 100
+        if self._linear_track_monitor_alive:
+            return self._linear_track_monitor.track(check_linear_track_stop, timeout=timeout).wait()
         expired = time.monotonic() + timeout
         code = APIState.WAIT_FINISH_TIMEOUT
         while self.connected and time.monotonic() < expired:
@@ -243,6 +290,8 @@ class Track(GPIO):
         failed_cnt = 0
         if not timeout or not isinstance(timeout, (int, float)) or timeout <= 0:
             timeout = 10
+        if self._linear_track_monitor_alive:
+            return self._linear_track_monitor.track(check_linear_track_back_origin, timeout=timeout).wait()
         expired = time.monotonic() + timeout
         code = APIState.WAIT_FINISH_TIMEOUT
         while self.connected and time.monotonic() < expired:
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2023, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import threading
+from ..core.utils.log import logger
+from .code import APIState
+from .ee_poller import PollFuture
+
+# 连续读取失败超过该次数时, 等待中的运动按CHECK_FAILED结束(与原来的轮询等待一致)
+_MAX_FAILED_CNT = 10
+
+
+def check_linear_track_stop(status):
+    if status['sci'] == 0:
+        return APIState.LINEAR_TRACK_SCI_IS_LOW
+    if status['error'] != 0:
+        return APIState.LINEAR_TRACK_HAS_FAULT
+    if status['status'] & 0x01 == 0:
+        return 0
+    return None
+
+
+def check_linear_track_back_origin(status):
+    if status['sci'] == 0:
+        return APIState.LINEAR_TRACK_SCI_IS_LOW
+    if status['error'] != 0:
+        return APIState.LINEAR_TRACK_HAS_FAULT
+    if status['on_zero'] == 1:
+        return 0
+    return None
+
+
+class LinearTrackFuture(PollFuture):
+    """
+    The handle of a linear track motion, done when the track stops (or back to origin)
+    """
+
+
+class LinearTrackMonitor(object):
+    """
+    滑轨状态后台轮询, 每次读取0x0A20开始的8个寄存器(位置/状态/错误/使能/回零/sci/sco), 发布到缓存快照
+    滑轨运动中或者有等待中的future时按fast_interval轮询, 否则按slow_interval轮询, 发送运动指令后调用kick立即轮询
+    future只用登记之后才开始读取的快照判断, 运动指令之前(或者正在进行中)的读取结果不会让future立即结束
+    """
+    def __init__(self, arm, fast_interval=0.02, slow_interval=0.2):
+        self._arm = arm
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+        self._cond = threading.Condition()
+        self._kick = threading.Event()
+        self._futures = []
+        self._snapshot = None
+        self._seq = 0
+        self._failed_cnt = 0
+        self._alive = True
+        self._thread = threading.Thread(target=self._run, name='LinearTrackMonitor', daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self):
+        return self._alive
+
+    @property
+    def seq(self):
+        """the number of successful reads"""
+        return self._seq
+
+    def get(self):
+        """
+        :return: the latest snapshot, None if no successful read yet
+            {'pos', 'status', 'error', 'is_enabled', 'on_zero', 'sci', 'sco', 'timestamp', 'read_time', 'seq'}
+            read_time: the time (time.monotonic()) when the read started
+        """
+        return self._snapshot
+
+    def kick(self):
+        """poll at once (after a command is sent)"""
+        self._kick.set()
+
+    def track(self, check, timeout=None):
+        """
+        :param check: check(status) returns the code to finish the future or None to continue
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :return: LinearTrackFuture
+        """
+        future = LinearTrackFuture(check, timeout)
+        future._registered = time.monotonic()
+        with self._cond:
+            if not self._alive:
+                future._finish(APIState.NOT_CONNECTED)
+                return future
+            self._futures.append(future)
+        self.kick()
+        return future
+
+    def wait(self, predicate, timeout=None):
+        """
+        Wait until predicate(snapshot) is True
+
+        :param timeout: maximum waiting time(unit: second), default is None(no timeout)
+        :return: True if matched else False
+        """
+        expired = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._alive and not (self._snapshot is not None and predicate(self._snapshot)):
+                remaining = 0.1 if expired is None else min(expired - time.monotonic(), 0.1)
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return self._alive
+
+    def close(self):
+        if not self._alive:
+            return
+        self._alive = False
+        self._kick.set()
+        if threading.current_thread() != self._thread:
+            self._thread.join()
+
+    def _run(self):
+        arm = self._arm
+        moving = False
+        while self._alive and arm.connected:
+            self._kick.clear()
+            read_time = time.monotonic()
+            try:
+                code, status = arm.get_linear_track_registers(addr=0x0A20, number_of_registers=8)
+            except Exception as e:
+                logger.error('linear track monitor exception: {}'.format(e))
+                code, status = APIState.API_EXCEPTION, None
+            if code == 0 and isinstance(status, dict):
+                snapshot = dict(status, sco=list(status['sco']), timestamp=time.monotonic(),
+                                read_time=read_time, seq=self._seq + 1)
+                moving = snapshot['status'] & 0x01 == 1
+                self._failed_cnt = 0
+            else:
+                snapshot = None
+                self._failed_cnt += 1
+            self._publish(snapshot)
+            self._kick.wait(self.fast_interval if moving or self._futures else self.slow_interval)
+        with self._cond:
+            self._alive = False
+            futures = self._futures
+            self._futures = []
+            self._cond.notify_all()
+        for future in futures:
+            future._finish(APIState.NOT_CONNECTED)
+
+    def _publish(self, snapshot):
+        finished = []
+        now = time.monotonic()
+        with self._cond:
+            if snapshot is not None:
+                self._snapshot = snapshot
+                self._seq = snapshot['seq']
+                self._cond.notify_all()
+            pending = []
+            for future in self._futures:
+                code = None
+                if snapshot is not None:
+                    if snapshot['read_time'] >= future._registered:
+                        code = future._check(snapshot)
+                elif self._failed_cnt > _MAX_FAILED_CNT:
+                    code = APIState.CHECK_FAILED
+                if code is None and future._expired is not None and now >= future._expired:
+                    code = APIState.WAIT_FINISH_TIMEOUT
+                if code is None:
+                    pending.append(future)
+                else:
+                    finished.append((future, code))
+            self._futures = pending
+        for future, code in finished:
+            future._finish(code)
@@ -9,8 +9,8 @@
 import os
 import math
 import time
-import uuid
 import warnings
+import collections
 from collections.abc import Iterable
 from ..core.config.x_config import XCONF
 from ..core.utils.log import logger
@@ -23,26 +23,47 @@ from .record import Record
 from .robotiq import RobotIQ
 from .ft_sensor import FtSensor
 from .modbus_tcp import ModbusTcp
-from .parse import GcodeParser
+from .parse import GcodeParser, GcodeCompiler, GCODE_MOTION_OPS
+from .parse import GCODE_OP_MOVE_LINE, GCODE_OP_MOVE_CIRCLE, GCODE_OP_PAUSE, GCODE_OP_MOVE_JOINT, GCODE_OP_MOVE_GOHOME
+from .parse import GCODE_OP_MOVE_ARC_LINE, GCODE_OP_SERVO_ANGLE_J, GCODE_OP_SLEEP
+from .gcode_queue import GcodeQueue
+from .stream import ServoStream
+from .arc_path import compact_arc_path
+from .kinematics import KinematicsModel
+from .kinematics_cache import KinematicsCache, KINE_IK, KINE_FK, KINE_TCP_LIMIT, KINE_JOINT_LIMIT
 from .code import APIState
 from .decorator import xarm_is_connected, xarm_is_ready, xarm_wait_until_not_pause, xarm_wait_until_cmdnum_lt_max
 from .utils import to_radian
-try:
-    # from ..tools.blockly_tool import BlocklyTool
-    from ..tools.blockly import BlocklyTool
-except:
-    print('import BlocklyTool module failed')
-    BlocklyTool = None
 
 gcode_p = GcodeParser()
+gcode_compiler = GcodeCompiler()
+blockly_cache = None
+
+
+def _import_blockly():
+    # blockly转换工具只在运行blockly应用时才导入, 不影响import xarm的耗时
+    try:
+        # from ..tools.blockly_tool import BlocklyTool
+        from ..tools.blockly import BlocklyTool, BlocklyCompileCache
+        return BlocklyTool, BlocklyCompileCache
+    except:
+        print('import BlocklyTool module failed')
+        return None, None
 
 
 class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTcp):
+    # 运动学缓存中缩减模式的TCP边界/关节范围的有效时间(秒), 本连接修改时立即失效
+    KINEMATICS_REDUCED_TTL = 1.0
 
     def __init__(self, port=None, is_radian=False, do_not_open=False, instance=None, **kwargs):
         super(XArm, self).__init__()
         kwargs['init'] = True
         self._api_instance = instance
+        self._gcode_queue = None
+        self._kinematics_cache = KinematicsCache()
+        self._kinematics_model = None
+        self._kinematics_dh_params = None  # (arm_cmd, dh_params), 每个连接只查询一次
+        self._kinematics_reduced = None  # (expired, states)
         Base.__init__(self, port, is_radian, do_not_open, **kwargs)
 
     def _is_out_of_tcp_range(self, value, i):
@@ -504,6 +525,16 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
         self._is_set_move = True
         return ret[0]
 
+    def servo_stream(self, rate=100, is_cartesian=False, speed=None, mvacc=None, mvtime=None, is_radian=None,
+                     is_tool_coord=False, wait_response=False, **kwargs):
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        if is_cartesian:
+            spd, acc, mvt = self.__get_tcp_motion_params(speed, mvacc, mvtime, **kwargs)
+        else:
+            spd, acc, mvt = self.__get_joint_motion_params(speed, mvacc, mvtime, is_radian=is_radian, **kwargs)
+        return ServoStream(self, rate=rate, is_cartesian=is_cartesian, speed=spd, mvacc=acc, mvtime=mvt,
+                           is_radian=is_radian, is_tool_coord=is_tool_coord, wait_response=wait_response)
+
     @xarm_wait_until_not_pause
     @xarm_wait_until_cmdnum_lt_max
     @xarm_is_ready(_type='set')
@@ -575,13 +606,101 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             return code
         return ret[0]
 
+    def _check_arc_path(self, points, check=False):
+        """
+        发送前检查所有路径点, 与_set_position_absolute的检查一致
+        :return: code
+        """
+        for index, point in enumerate(points):
+            for i in range(3):
+                if self._is_out_of_tcp_range(point[i + 3], i + 3):
+                    logger.error('move_arc_lines, point {} is out of range'.format(index))
+                    return APIState.OUT_OF_RANGE
+        if check:
+            code, rets = self.is_tcp_limit_batch([point[:6] for point in points], is_radian=True)
+            if code == 0:
+                for index, ret in enumerate(rets):
+                    if ret[0] == 0 and ret[1] is True:
+                        logger.error('move_arc_lines, point {} is out of tcp limit'.format(index))
+                        return APIState.TCP_LIMIT
+        return 0
+
+    def _stream_arc_path(self, points, speed, mvacc, mvtime, lookahead=None, window=8, params=None):
+        """
+        按控制器指令缓存的空闲数量发送路径点, 不经过set_position
+        only_check_type > 0时不能使用(需要逐个等待检查结果), 由调用者逐个调用set_position
+        :param points: [[x, y, z, roll, pitch, yaw, radius], ...], unit: mm, rad, checked by _check_arc_path
+        :param params: [(speed, mvacc, mvtime), ...], the motion params of each point, default is the same for all points
+        :return: 0: success, -1: api failed, -2: error or stop
+        """
+        window = max(window, 1)
+        if lookahead is None:
+            # 上报的cmd_num可能还没包含刚发送的指令, 预留一个批次的余量
+            lookahead = max(self._max_cmd_num - window, 1)
+        else:
+            lookahead = min(max(lookahead, 1), self._max_cmd_num)
+        self._has_motion_cmd = True
+        seq = self._report_seq
+        sent = 0  # 最近一次上报之后发送的指令数
+        index = 0
+        while index < len(points):
+            if self.has_error or self.is_stop:
+                return -2
+            if not self.connected:
+                return -1
+            if not self._enable_report or self._report_seq != seq:
+                seq = self._report_seq
+                sent = 0
+            elif time.monotonic() - self._last_report_time > 0.4:
+                self.get_cmdnum()
+                sent = 0
+            free = lookahead - self.cmd_num - sent
+            if free <= 0:
+                seq = self._wait_report_notify(seq)
+                sent = 0
+                continue
+            chunk = points[index:index + min(free, window * 4)]
+            chunk_params = [(speed, mvacc, mvtime)] * len(chunk) if params is None else params[index:index + len(chunk)]
+            rets = self.arm_cmd.move_line_common_batch(
+                [(point[:6], ) + tuple(chunk_params[i]) + (point[6], ) for i, point in enumerate(chunk)],
+                only_check_type=self._only_check_type, window=window)
+            for i, ret in enumerate(rets):
+                code = self._check_code(ret[0], is_move_cmd=True)
+                if code != 0:
+                    logger.error('move_arc_lines, send point {} failed, code={}'.format(index + i, code))
+                    return -1
+            self._is_set_move = True
+            self.__update_tcp_motion_params(*chunk_params[-1], pose=chunk[-1][:6])
+            sent += len(chunk)
+            index += len(chunk)
+        return 0
+
     @xarm_is_ready(_type='set')
     def move_arc_lines(self, paths, is_radian=None, times=1, first_pause_time=0.1, repeat_pause_time=0,
-                       automatic_calibration=True, speed=None, mvacc=None, mvtime=None, wait=False):
+                       automatic_calibration=True, speed=None, mvacc=None, mvtime=None, wait=False, **kwargs):
         assert len(paths) > 0, 'parameter paths error'
         is_radian = self._default_is_radian if is_radian is None else is_radian
         spd, acc, mvt = self.__get_tcp_motion_params(speed, mvacc, mvtime)
         logger.info('move_arc_lines--begin')
+        points = None
+        if kwargs.get('preprocess', False):
+            rad_paths = [[float(path[i]) if i < 3 else to_radian(path[i], is_radian) for i in range(6)] + list(path[6:7])
+                         for path in paths]
+            options = {k: kwargs[k] for k in ('min_distance', 'tolerance', 'angle_tolerance', 'auto_radius',
+                                               'radius_ratio', 'max_radius', 'max_deviation') if k in kwargs}
+            points = compact_arc_path(rad_paths, **options)
+            logger.info('move_arc_lines, preprocess, points: {} -> {}'.format(len(paths), len(points)))
+            if not self.version_is_ge(1, 11, 100) or self._only_check_type > 0:
+                # 旧固件不支持通用直线指令, 只检查(only_check_type)需要逐个等待检查结果,
+                # 这两种情况仍然逐个调用set_position, 使用预处理后的路径
+                paths = points
+                is_radian = True
+                points = None
+            else:
+                code = self._check_arc_path(points, check=kwargs.get('check', False))
+                if code != 0:
+                    logger.error('quit, check path failed, code={}'.format(code))
+                    return
         if automatic_calibration:
             _ = self.set_position(*paths[0], is_radian=is_radian, speed=spd, mvacc=acc, mvtime=mvt, wait=True)
             if _ < 0:
@@ -598,6 +717,9 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
                 if ret < 0:
                     return -1
                 self._last_joint_speed = last_used_joint_speed
+            if points is not None:
+                return self._stream_arc_path(points, spd, acc, mvt,
+                                             lookahead=kwargs.get('lookahead', None), window=kwargs.get('window', 8))
             for path in paths:
                 if len(path) > 6 and path[6] >= 0:
                     radius = path[6]
@@ -688,6 +810,7 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
     @xarm_is_connected(_type='set')
     def set_reduced_mode(self, on_off):
         ret = self.arm_cmd.set_reduced_mode(int(on_off))
+        self._invalidate_kinematics()
         self.log_api_info('API -> set_reduced_mode -> code={}'.format(ret[0]), code=ret[0])
         return ret[0]
 
@@ -733,6 +856,7 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
         limits[2:4] = boundary[2:4] if boundary[2] >= boundary[3] else boundary[2:4][::-1]
         limits[4:6] = boundary[4:6] if boundary[4] >= boundary[5] else boundary[4:6][::-1]
         ret = self.arm_cmd.set_xyz_limits(limits)
+        self._invalidate_kinematics()
         self.log_api_info('API -> set_reduced_tcp_boundary -> code={}, boundary={}'.format(ret[0], limits), code=ret[0])
         return ret[0]
 
@@ -763,12 +887,14 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
                 if limits[i * 2 + 1] <= angle_range[0]:
                     return APIState.OUT_OF_RANGE
         ret = self.arm_cmd.set_reduced_jrange(limits)
+        self._invalidate_kinematics()
         self.log_api_info('API -> set_reduced_joint_range -> code={}, boundary={}'.format(ret[0], limits), code=ret[0])
         return ret[0]
 
     @xarm_is_connected(_type='set')
     def set_fense_mode(self, on_off):
         ret = self.arm_cmd.set_fense_on(int(on_off))
+        self._invalidate_kinematics()
         self.log_api_info('API -> set_fense_mode -> code={}, on={}'.format(ret[0], on_off), code=ret[0])
         return ret
 
@@ -802,6 +928,10 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             else:
                 self.wait_move()
         ret = self.arm_cmd.set_world_offset(world_offset)
+        if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            # 富上报才会更新_world_offset, 这里先更新, 运动学缓存的上下文随之变化
+            self._world_offset = world_offset
+        self._invalidate_kinematics()
         self.log_api_info('API -> set_world_offset -> code={}, offset={}'.format(ret[0], world_offset), code=ret[0])
         return ret[0]
 
@@ -885,6 +1015,9 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             else:
                 self.wait_move()
         ret = self.arm_cmd.set_tcp_offset(tcp_offset)
+        if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            self._position_offset = tcp_offset
+        self._invalidate_kinematics()
         self.log_api_info('API -> set_tcp_offset -> code={}, offset={}'.format(ret[0], tcp_offset), code=ret[0])
         return ret[0]
 
@@ -1072,6 +1205,158 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
         else:
             return ret[0], None
 
+    def _invalidate_kinematics(self):
+        self._kinematics_cache.clear()
+        self._kinematics_dh_params = None
+        self._kinematics_reduced = None
+
+    def _get_kinematics_context(self):
+        # 逆解/正解/限位检查的结果依赖的参数, 任何一个变化都会清空缓存
+        # DH参数每个连接查询一次, 上报中没有缩减模式的TCP边界和关节范围(可能被其它客户端修改), 按KINEMATICS_REDUCED_TTL查询
+        dh_cache = self._kinematics_dh_params
+        if dh_cache is None or dh_cache[0] is not self.arm_cmd:
+            code, dh_params = self.get_dh_params()
+            dh_cache = (self.arm_cmd, tuple(dh_params) if code == 0 else None)
+            if code == 0:
+                self._kinematics_dh_params = dh_cache
+        now = time.monotonic()
+        reduced = self._kinematics_reduced
+        if reduced is None or now >= reduced[0]:
+            code, states = self.get_reduced_states(is_radian=True)
+            reduced = (now + self.KINEMATICS_REDUCED_TTL,
+                       tuple(tuple(v) if isinstance(v, (list, tuple)) else v for v in states) if code == 0 else None)
+            if code == 0:
+                self._kinematics_reduced = reduced
+        return (
+            tuple(self._position_offset), tuple(self._world_offset), dh_cache[1],
+            self._is_reduced_mode, self._is_fence_mode, reduced[1],
+        )
+
+    def _kinematics_batch(self, kind, vectors, request, parse, window=8, use_cache=True):
+        """
+        :param vectors: the converted inputs (unit: mm/rad)
+        :param request: request(vectors, window) returns the list of the responses
+        :param parse: parse(ret) returns the result of a successful response
+        :return: code, [[code, result], ...]
+        """
+        cache = self._kinematics_cache
+        if use_cache:
+            cache.sync(self._get_kinematics_context())
+        results = [None] * len(vectors)
+        # 同一批中相同的输入只请求一次
+        misses = collections.OrderedDict()
+        for i, vec in enumerate(vectors):
+            key = cache.make_key(kind, vec) if use_cache else i
+            value = cache.get(key) if use_cache else None
+            if value is not None:
+                results[i] = [0, value]
+            else:
+                misses.setdefault(key, []).append(i)
+        if misses:
+            keys = list(misses.keys())
+            rets = request([vectors[misses[key][0]] for key in keys], window)
+            for key, ret in zip(keys, rets):
+                code = self._check_code(ret[0])
+                value = parse(ret) if code == 0 else None
+                if code == 0 and use_cache:
+                    cache.put(key, value)
+                for i in misses[key]:
+                    results[i] = [code, value]
+        code = 0
+        for ret in results:
+            if ret[0] != 0:
+                code = ret[0]
+        return code, results
+
+    @xarm_is_connected(_type='get')
+    def get_inverse_kinematics_batch(self, poses, input_is_radian=None, return_is_radian=None, window=8, use_cache=True):
+        input_is_radian = self._default_is_radian if input_is_radian is None else input_is_radian
+        return_is_radian = self._default_is_radian if return_is_radian is None else return_is_radian
+        assert all(len(pose) >= 6 for pose in poses)
+        vectors = [tuple(to_radian(pose[i], input_is_radian or i <= 2) for i in range(6)) for pose in poses]
+        code, results = self._kinematics_batch(KINE_IK, vectors, self.arm_cmd.get_ik_batch,
+                                               lambda ret: tuple(ret[1:8]), window=window, use_cache=use_cache)
+        for ret in results:
+            if ret[0] == 0:
+                ret[1] = list(ret[1]) if return_is_radian else [math.degrees(angle) for angle in ret[1]]
+            else:
+                ret[1] = []
+        return code, results
+
+    @xarm_is_connected(_type='get')
+    def get_forward_kinematics_batch(self, angles_list, input_is_radian=None, return_is_radian=None, window=8, use_cache=True):
+        input_is_radian = self._default_is_radian if input_is_radian is None else input_is_radian
+        return_is_radian = self._default_is_radian if return_is_radian is None else return_is_radian
+        assert all(isinstance(angles, Iterable) for angles in angles_list)
+        vectors = []
+        for angles in angles_list:
+            joints = [0] * 7
+            for i in range(min(len(angles), 7)):
+                joints[i] = to_radian(angles[i], input_is_radian)
+            vectors.append(tuple(joints))
+        code, results = self._kinematics_batch(KINE_FK, vectors, self.arm_cmd.get_fk_batch,
+                                               lambda ret: tuple(ret[1:7]), window=window, use_cache=use_cache)
+        for ret in results:
+            if ret[0] == 0:
+                ret[1] = list(ret[1]) if return_is_radian else [ret[1][i] if i < 3 else math.degrees(ret[1][i]) for i in range(6)]
+            else:
+                ret[1] = []
+        return code, results
+
+    @xarm_is_connected(_type='get')
+    def is_tcp_limit_batch(self, poses, is_radian=None, window=8, use_cache=True):
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        assert all(len(pose) >= 6 for pose in poses)
+        vectors = [tuple(to_radian(pose[i], is_radian or i <= 2, self._last_position[i]) for i in range(6)) for pose in poses]
+        return self._kinematics_batch(KINE_TCP_LIMIT, vectors, self.arm_cmd.is_tcp_limit_batch,
+                                      lambda ret: bool(ret[1]), window=window, use_cache=use_cache)
+
+    @xarm_is_connected(_type='get')
+    def is_joint_limit_batch(self, joints, is_radian=None, window=8, use_cache=True):
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        assert all(isinstance(joint, Iterable) for joint in joints)
+        vectors = []
+        for joint in joints:
+            values = [0] * 7
+            for i in range(min(len(joint), 7)):
+                values[i] = to_radian(joint[i], is_radian, self._last_angles[i])
+            vectors.append(tuple(values))
+        return self._kinematics_batch(KINE_JOINT_LIMIT, vectors, self.arm_cmd.is_joint_limit_batch,
+                                      lambda ret: bool(ret[1]), window=window, use_cache=use_cache)
+
+    def set_dh_params(self, dh_params, flag=0):
+        code = super(XArm, self).set_dh_params(dh_params, flag=flag)
+        self._invalidate_kinematics()
+        return code
+
+    def get_kinematics_model(self, refresh=False, validate=True):
+        model = self._kinematics_model
+        if model is not None and not refresh:
+            tcp_offset, world_offset = list(self._position_offset), list(self._world_offset)
+            if model.tcp_offset != tcp_offset or model.world_offset != world_offset:
+                # TCP偏移/用户坐标系偏移变化后沿用已选择的DH形式, 只更新偏移(不修改已经返回给用户的模型)
+                data = model.to_dict()
+                data['tcp_offset'], data['world_offset'] = tcp_offset, world_offset
+                self._kinematics_model = KinematicsModel.from_dict(data)
+            return 0, self._kinematics_model
+        if not self.connected:
+            return APIState.NOT_CONNECTED, self._kinematics_model
+        code, model = KinematicsModel.from_arm(self, validate=validate)
+        if code == 0:
+            self._kinematics_model = model
+        return code, model
+
+    def clear_kinematics_cache(self):
+        self._invalidate_kinematics()
+        return 0
+
+    def get_kinematics_cache_stats(self):
+        return 0, self._kinematics_cache.get_stats()
+
+    def _init_metrics(self):
+        Base._init_metrics(self)
+        self._metrics.register_gauge('kinematics_cache', self._kinematics_cache.get_stats, 'Kinematics result cache', 'stat')
+
     def emergency_stop(self):
         logger.info('emergency_stop--begin')
         self.set_state(4)
@@ -1084,7 +1369,15 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
         logger.info('emergency_stop--end')
 
     def send_cmd_async(self, command, timeout=None):
-        pass
+        if self._gcode_queue is None or not self._gcode_queue.alive:
+            self._gcode_queue = GcodeQueue(self)
+        return self._gcode_queue.submit(command, timeout=timeout)
+
+    def gcode_queue(self, maxsize=1024, lookahead=None):
+        if self._gcode_queue is not None and self._gcode_queue.alive:
+            self._gcode_queue.close(cancel=False)
+        self._gcode_queue = GcodeQueue(self, maxsize=maxsize, lookahead=lookahead)
+        return self._gcode_queue
 
     def send_cmd_sync(self, command=None):
         if command is None:
@@ -1394,13 +1687,13 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
         mode = kwargs.get('mode', 0)
         state = kwargs.get('state', 0)
         wait_seconds = kwargs.get('wait_seconds', 0)
+        lookahead = kwargs.get('lookahead', None)
+        window = kwargs.get('window', 8)
         try:
             abs_path = os.path.abspath(path)
             if not os.path.exists(abs_path):
                 raise FileNotFoundError
-            with open(abs_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            lines = [line.strip() for line in lines]
+            program = gcode_compiler.compile_file(abs_path)
             if init:
                 self.clean_error()
                 self.clean_warn()
@@ -1411,21 +1704,113 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
                 time.sleep(wait_seconds)
 
             for i in range(times):
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    if not self.connected:
-                        logger.error('xArm is disconnect')
-                        return APIState.NOT_CONNECTED
-                    ret = self.send_cmd_sync(line)
-                    if isinstance(ret, int) and ret < 0:
-                        return ret
+                ret = self._run_gcode_program(program, lookahead=lookahead, window=window)
+                if ret != 0:
+                    return ret
             return APIState.NORMAL
         except Exception as e:
             logger.error(e)
             return APIState.API_EXCEPTION
 
+    def _exec_gcode(self, op, args, line, **kwargs):
+        # kwargs(如feedback_key)只传给会进入控制器指令缓存的运动指令
+        if op == GCODE_OP_MOVE_LINE:
+            pose, speed, mvacc, mvtime = args
+            return self.set_position(*pose, radius=-1, speed=speed, mvacc=mvacc, mvtime=mvtime, **kwargs)
+        elif op == GCODE_OP_MOVE_CIRCLE:
+            pose1, pose2, percent, speed, mvacc, mvtime = args
+            return self.move_circle(pose1, pose2, percent=percent, speed=speed, mvacc=mvacc, mvtime=mvtime, **kwargs)
+        elif op == GCODE_OP_PAUSE:
+            return self.set_pause_time(args[0])
+        elif op == GCODE_OP_MOVE_JOINT:
+            angles, speed, mvacc, mvtime = args
+            return self.set_servo_angle(angle=list(angles), speed=speed, mvacc=mvacc, mvtime=mvtime, **kwargs)
+        elif op == GCODE_OP_MOVE_GOHOME:
+            speed, mvacc, mvtime = args
+            return self.move_gohome(speed=speed, mvacc=mvacc, mvtime=mvtime, **kwargs)
+        elif op == GCODE_OP_MOVE_ARC_LINE:
+            pose, radius, speed, mvacc, mvtime = args
+            return self.set_position(*pose, speed=speed, mvacc=mvacc, mvtime=mvtime, radius=radius, **kwargs)
+        elif op == GCODE_OP_SERVO_ANGLE_J:
+            angles, speed, mvacc, mvtime = args
+            return self.set_servo_angle_j(angles, speed=speed, mvacc=mvacc, mvtime=mvtime)
+        elif op == GCODE_OP_SLEEP:
+            time.sleep(args[0])
+            return 0
+        return self.send_cmd_sync(line)
+
+    def _stream_gcode_lines(self, insts, lookahead=None, window=8):
+        """
+        连续的直线运动(G1/G9)通过流水线批量发送, 只按控制器的cmd_num限流, 不再逐行等待set_position的回复
+        :param insts: [(op, args, line), ...], op is GCODE_OP_MOVE_LINE or GCODE_OP_MOVE_ARC_LINE
+        :return: code
+        """
+        self.wait_until_not_pause()
+        code = self.__wait_sync()
+        if code != 0:
+            return code
+        is_radian = self._default_is_radian
+        pose = list(self._last_position)
+        last_params = (self._last_tcp_speed, self._last_tcp_acc, self._mvtime)
+        points, params = [], []
+        for op, args, line in insts:
+            if op == GCODE_OP_MOVE_LINE:
+                target, speed, mvacc, mvtime = args
+                radius = -1
+            else:
+                target, radius, speed, mvacc, mvtime = args
+            # 与set_position一致: 没有给出的坐标和运动参数沿用上一条指令的值
+            pose = [pose[i] if target[i] is None else (float(target[i]) if i < 3 else to_radian(target[i], is_radian))
+                    for i in range(6)]
+            resolved = self.__get_tcp_motion_params(speed, mvacc, mvtime)
+            last_params = tuple(last_params[i] if value is None else resolved[i] for i, value in enumerate((speed, mvacc, mvtime)))
+            points.append(pose + [-1 if radius is None else radius])
+            params.append(last_params)
+        code = self._check_arc_path(points)
+        if code != 0:
+            return code
+        ret = self._stream_arc_path(points, None, None, None, lookahead=lookahead, window=window, params=params)
+        if ret == -2:
+            return APIState.HAS_ERROR if self.has_error else APIState.EMERGENCY_STOP
+        return APIState.API_EXCEPTION if ret != 0 else 0
+
+    def _run_gcode_program(self, program, lookahead=None, window=8):
+        """
+        连续的直线运动(G1/G9)批量发送, 让控制器的指令缓存保持在lookahead附近(见_stream_gcode_lines),
+        其它指令逐条执行
+        旧固件(不支持通用直线指令)或者only_check_type > 0时全部逐条执行
+        """
+        stream = self.version_is_ge(1, 11, 100) and self._only_check_type <= 0
+        index = 0
+        while index < len(program):
+            if not self.connected:
+                logger.error('xArm is disconnect')
+                return APIState.NOT_CONNECTED
+            op, args, line = program[index]
+            if stream and op in (GCODE_OP_MOVE_LINE, GCODE_OP_MOVE_ARC_LINE):
+                end = index + 1
+                while end < len(program) and program[end][0] in (GCODE_OP_MOVE_LINE, GCODE_OP_MOVE_ARC_LINE):
+                    end += 1
+                ret = self._stream_gcode_lines(program[index:end], lookahead=lookahead, window=window)
+                if ret != 0:
+                    return ret
+                index = end
+                continue
+            if op in GCODE_MOTION_OPS and lookahead is not None:
+                self.wait_until_cmdnum_lt_max(min(max(lookahead, 1), self._max_cmd_num))
+            ret = self._exec_gcode(op, args, line)
+            if isinstance(ret, int) and ret < 0:
+                return ret
+            index += 1
+        return 0
+
+    def compile_gcode_file(self, path):
+        try:
+            return 0, gcode_compiler.compile_file(path)
+        except Exception as e:
+            logger.error(e)
+            return APIState.API_EXCEPTION, []
+
     @xarm_is_connected(_type='set')
     def run_blockly_app(self, path, **kwargs):
         """
@@ -1439,8 +1824,16 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
                 path = os.path.join(path, 'app.xml')
             if not os.path.exists(path):
                 raise FileNotFoundError
-            blockly_tool = BlocklyTool(path)
-            succeed = blockly_tool.to_python(arm=self._api_instance, is_exec=True, **kwargs)
+            BlocklyTool, BlocklyCompileCache = _import_blockly()
+            if kwargs.get('use_cache', True) and BlocklyCompileCache is not None:
+                global blockly_cache
+                if blockly_cache is None:
+                    blockly_cache = BlocklyCompileCache()
+                succeed, codes, _ = blockly_cache.compile(path, arm=self._api_instance, is_exec=True, **kwargs)
+            else:
+                blockly_tool = BlocklyTool(path)
+                succeed = blockly_tool.to_python(arm=self._api_instance, is_exec=True, **kwargs)
+                codes = compile(blockly_tool.codes, path, 'exec') if succeed else None
             if succeed:
                 times = kwargs.get('times', 1)
                 highlight_callback = kwargs.get('highlight_callback', None)
@@ -1452,7 +1845,7 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
                 code = APIState.NORMAL
                 try:
                     for _ in range(times):
-                        exec(blockly_tool.codes, {'arm': self._api_instance, 'highlight_callback': highlight_callback, 'print': blockly_print})
+                        exec(codes, {'arm': self._api_instance, 'highlight_callback': highlight_callback, 'print': blockly_print})
                 except Exception as e:
                     code = APIState.RUN_BLOCKLY_EXCEPTION
                     blockly_print('run blockly app error: {}'.format(e))